@@ -1,12 +1,15 @@
 import numpy as np
-import string
-from math import isclose
-from PyQt5.QtCore import Qt, QPointF, QRectF, QLineF
-from PyQt5.QtGui import QPen, QPainter, QBrush
+from PyQt5.QtCore import Qt, QPointF, QRectF, QLineF, QSizeF
+from PyQt5.QtGui import QPen, QPainter, QBrush, QPainterPath, \
+    QPainterPathStroker, QPolygonF
 from PyQt5.QtWidgets import QGraphicsScene, QGraphicsItem, \
-    QGraphicsLineItem, QApplication, QGraphicsSceneHoverEvent, \
+    QApplication, QGraphicsSceneHoverEvent, \
     QGraphicsSceneMouseEvent, QGraphicsEllipseItem, QStyleOptionGraphicsItem,\
-    QGraphicsRectItem, QGraphicsTextItem
+    QGraphicsRectItem
+
+from grid_geometry import grid_points, cell_coordinates, column_label
+from redraw_throttle import RedrawThrottle
+from tracing import traced
 
 
 class ResizingSquare(QGraphicsRectItem):
@@ -51,6 +54,7 @@ class MovableDisk(QGraphicsEllipseItem):
         super().__init__(parent=parent_grid)
         self.setBrush(color)
         self.setAcceptHoverEvents(True)  # mouse cursor entering/exiting item
+        self.last_pos = QPointF()  # cursor position of the last rotation
 
     def hoverEnterEvent(self, event: 'QGraphicsSceneHoverEvent'):
         """Virtual function executed as the mouse cursor enters the disk."""
@@ -64,108 +68,52 @@ class MovableDisk(QGraphicsEllipseItem):
 
     def mouseMoveEvent(self, event: 'QGraphicsSceneMouseEvent'):
         """Virtual function called when a mouse button is pressed and the
-        mouse cursor is moved"""
-        """Compute old and new mouse coordinates in scene coordinates"""
-        new_cursor_pos = event.scenePos()
-        old_cursor_pos = event.lastScenePos()
-        """Call the parent to rotate the grid """
-        self.parentItem().rotate_grid(old_pos=old_cursor_pos,
-                                      new_pos=new_cursor_pos,
+        mouse cursor is moved. The grid is rotated at most once per frame,
+        to the latest cursor position."""
+        self.parentItem().redraw_throttle.request(self._rotate_to,
+                                                  event.scenePos())
+
+    def _rotate_to(self, cursor_pos: QPointF):
+        """Rotate the grid by the cursor displacement since the last
+        rotation"""
+        self.parentItem().rotate_grid(old_pos=self.last_pos,
+                                      new_pos=cursor_pos,
                                       caller=self)
+        self.last_pos = cursor_pos
 
-    """This method needs to be reimplemented"""
-    def mousePressEvent(self, event: 'QGraphicsSceneMouseEvent'): pass
-
-    """This method needs to be reimplemented"""
-    def mouseDoubleClickEvent(self, event: 'QGraphicsSceneMouseEvent'): pass
-
-    """This method needs to be reimplemented"""
-    def mouseReleaseEvent(self, event: 'QGraphicsSceneMouseEvent'): pass
-
-
-class MovableLine(QGraphicsLineItem):
-    """Movable grid line. Mouse cursor changes according to permissible
-    movements"""
-    def __init__(self, *,
-                 parent_grid: QGraphicsItem,
-                 allow_horizontal_movement: bool=False,
-                 allow_vertical_movement: bool=False,
-                 move_all: bool=False,
-                 color: Qt.GlobalColor=Qt.red):
-        """Initialize line w initial_color `initial_color` and QT parent
-        `parent_grid`.
-        The line can be dragged by the mouse according if flags
-        `allow_horizontal/vertical_movement` are `True`.
-        If `move_all=True`, moving the line moves the whole grid."""
-        super().__init__(parent=parent_grid)
-        self.setPen(QPen(color, 2))
-        self.setAcceptHoverEvents(True)  # mouse cursor entering/exiting item
-        self.allow_h_mov = allow_horizontal_movement
-        self.allow_v_mov = allow_vertical_movement
-        self.move_all = move_all
-
-    def hoverEnterEvent(self, event: 'QGraphicsSceneHoverEvent'):
-        """Virtual function called when mouse cursor enters a movable line."""
-        """Change mouse cursor according to permissible movements"""
-        if self.move_all is True:
-            QApplication.setOverrideCursor(Qt.OpenHandCursor)
-        elif self.allow_h_mov is False and self.allow_v_mov is True:
-            QApplication.setOverrideCursor(Qt.SizeVerCursor)
-        elif self.allow_h_mov is True and self.allow_v_mov is False:
-            QApplication.setOverrideCursor(Qt.SizeHorCursor)
-        elif self.allow_h_mov is True and self.allow_v_mov is True:
-            QApplication.setOverrideCursor(Qt.SizeAllCursor)
-        elif self.allow_h_mov is False and self.allow_v_mov is False:
-            QApplication.setOverrideCursor(Qt.ForbiddenCursor)
-        return super().hoverEnterEvent(event)
-
-    def hoverLeaveEvent(self, event: 'QGraphicsSceneHoverEvent'):
-        """Virtual function called when mouse leaves object"""
-        QApplication.setOverrideCursor(Qt.ArrowCursor)
-        return super().hoverLeaveEvent(event)
-
-    def mouseMoveEvent(self, event: 'QGraphicsSceneMouseEvent'):
-        """Virtual function called when a mouse button is pressed and the mouse
-         cursor is moved. Move the single lines or the whole grid."""
-        """Compute old and new mouse coordinates in scene coordinates"""
-        new_cursor_position = event.scenePos()
-        old_cursor_position = event.lastScenePos()
-        """Compute mouse displacement"""
-        offset_x = new_cursor_position.x() - old_cursor_position.x()
-        offset_y = new_cursor_position.y() - old_cursor_position.y()
-        if self.move_all is False:  # if it's not a grid edge
-            line_current_position = self.scenePos()
-            if self.allow_v_mov is True:
-                line_new_position_y = offset_y + line_current_position.y()
-            else:  # allow vertical movement is False
-                line_new_position_y = line_current_position.y()
-            if self.allow_h_mov is True:
-                line_new_position_x = offset_x + line_current_position.x()
-            else:  # allow horizontal movement is False
-                line_new_position_x = line_current_position.x()
-            """Update line position accordingly"""
-            self.setPos(QPointF(line_new_position_x, line_new_position_y))
-        elif self.move_all is True:
-            """Line is an edge. Update whole grid position."""
-            self.parentItem().move_grid(offset_x, offset_y)
-
-    """This method needs to be reimplemented"""
-    def mousePressEvent(self, event: 'QGraphicsSceneMouseEvent'): pass
+    def mousePressEvent(self, event: 'QGraphicsSceneMouseEvent'):
+        """Virtual function called when a mouse button is pressed on the
+        disk. Rotation starts from the cursor position."""
+        self.last_pos = event.scenePos()
 
     """This method needs to be reimplemented"""
     def mouseDoubleClickEvent(self, event: 'QGraphicsSceneMouseEvent'): pass
 
-    """This method needs to be reimplemented"""
-    def mouseReleaseEvent(self, event: 'QGraphicsSceneMouseEvent'): pass
+    def mouseReleaseEvent(self, event: 'QGraphicsSceneMouseEvent'):
+        """Virtual function called when a mouse button is released. The
+        pending rotation is applied."""
+        self.parentItem().redraw_throttle.flush()
 
 
 class AdjustableGrid(QGraphicsItem):
-    """A 12 x 8 movable/resizable grid. Grid is an abstract QT object: adding
-    it to scene automatically adds the children objects (lines, disks, etc.)"""
+    """A 12 x 8 movable/resizable grid. Grid lines and labels are painted by
+    the grid item itself, all lines with one `QPainter.drawLines` call, so
+    the number of scene items does not grow with the number of cells. Only
+    the corner disks and the resizing square are children items. The grid
+    is dragged by its edges.
+
+    Geometry is kept in grid-local coordinates, where the grid is not
+    rotated and its top left corner is the origin: the item position is the
+    top left corner and the item rotation is `phi`, so that rotating the
+    grid does not touch lines, labels or children."""
     """Class attributes"""
     font_dist = 15  # distance (pxs) from labels to grid edge
     disk_radius = 4  # corner disk radius in pixels
     default_line_thickness = .5  # line thickness
+    edge_hit_width = 6  # width (pxs) of the band around lines under mouse
+    label_size = QSizeF(60, 30)  # box each label is centered in
+    selected_color = Qt.red  # color and thickness of the selected grid
+    selected_thickness = 3.
 
     def __init__(self, *,
                  scene: QGraphicsScene,
@@ -179,6 +127,7 @@ class AdjustableGrid(QGraphicsItem):
         super().__init__()
         self.def_color = color
         self.scene = scene
+        self.setAcceptHoverEvents(True)  # mouse cursor entering/exiting grid
 
         """Grid attributes"""
         self.tl_br_qpointf = []  # top left and bottom right corners coord.
@@ -188,17 +137,35 @@ class AdjustableGrid(QGraphicsItem):
         self.num_cols = num_cols  # grid cols
         self.num_rows = num_rows  # grid rows
         self.label_enabled = True   # show grid label
+        self.interactive = True  # False once the grid is placed
+        self.selected = False  # selected in the grid list
+
+        """Painted grid, in item coordinates"""
+        self.l1 = 0.  # top edge length, negative if drawn right to left
+        self.l2 = 0.  # left edge length, negative if drawn bottom to top
+        self.grid_pts = None  # grid points, see `generate_grid_pts`
+        self.lines = []  # QLineF of every grid line, edges included
+        self.label_centers = np.empty((0, 2))  # label centers, rows first
+        self.labels = []  # (QRectF, text) of every label, painted upright
+        self.labels_rotation = None  # item rotation `labels` are placed for
+        self.layout_key = None  # grid shape the painted grid was built for
+        self.numeral_texts = []  # row labels, '1', '2', ...
+        self.letter_texts = []  # column labels, 'A', 'B', ...
+        self.edge_polygon = QPolygonF()  # closed polygon of the grid edges
+        self.rect = QRectF()  # bounding rect of lines and labels
+        self.line_shape = None  # hit-testing paths, built when needed
+        self.edge_shape = None
+        self.pen = QPen(color, 2)
+        self.selected_pen = QPen(AdjustableGrid.selected_color,
+                                 AdjustableGrid.selected_thickness)
+        self.label_color = color
+        self.dragging = False  # True while the grid is dragged by an edge
+        self.drag_pos = QPointF()  # cursor position of the last move
+        """Drags and rotations applied at most once per frame"""
+        self.redraw_throttle = RedrawThrottle()
 
         """Grid graphical objects"""
-        self.horizontal_lines = []
-        self.vertical_lines = []
-        self.top_edge = None
-        self.bottom_edge = None
-        self.left_edge = None
-        self.right_edge = None
         self.square = None
-        self.row_labels = []
-        self.col_labels = []
         self.tl_disk = None
         self.tr_disk = None
         self.bl_disk = None
@@ -207,29 +174,22 @@ class AdjustableGrid(QGraphicsItem):
         """Coordinates of the images to be cropped"""
         self.image_coordinates = None
 
+        self._update_label_texts()
         self.init_grid_graphics()
 
+    @property
+    def phi(self):
+        """CW angle between top edge and x-axis (rads) [-pi, pi], the
+        rotation of the grid item"""
+        return self._angle_mod(np.radians(self.rotation()))
+
+    @phi.setter
+    def phi(self, angle: float):
+        self.setRotation(np.degrees(angle))
+
     def init_grid_graphics(self):
         """Initialize grid graphical objects w/o displaying them."""
-        """Init grid line w/o edges"""
-        self.horizontal_lines = [
-            MovableLine(allow_vertical_movement=False,
-                        color=self.def_color,
-                        parent_grid=self)
-            for _ in range(self.num_rows - 1)
-        ]
-        self.vertical_lines = [
-            MovableLine(allow_horizontal_movement=False,
-                        color=self.def_color,
-                        parent_grid=self)
-            for _ in range(self.num_cols - 1)
-        ]
-
-        """"Grid edges (nomenclature assumes signs_x,y = 1)"""
-        self.top_edge, self.bottom_edge, self.left_edge, self.right_edge = [
-            MovableLine(move_all=True, parent_grid=self, color=self.def_color)
-            for _ in range(4)
-        ]
+        self._remove_children()
 
         """Corner disks (used to rotate the grid)"""
         self.tl_disk, self.tr_disk, self.bl_disk, self.br_disk = [
@@ -239,37 +199,148 @@ class AdjustableGrid(QGraphicsItem):
 
         """Resizing square"""
         self.square = ResizingSquare(parent_grid=self, color=self.def_color)
+        self.layout_key = None  # new children must be placed
+
+    @traced('grid.set_shape')
+    def set_shape(self, num_rows: int, num_cols: int):
+        """
+        Change grid rows and columns in place. Corners, angle and children
+        items are kept; only the label texts of added or removed rows and
+        columns change. A drawn grid is redrawn.
 
-        """Column labels (numerals)"""
-        self.col_labels = [QGraphicsTextItem(parent=self)
-                           for _ in range(self.num_rows)]
-        for idx, label in enumerate(self.col_labels):
-            label.setPos(0, 0)
-            label.setPlainText(str(idx + 1))
-            label.setDefaultTextColor(self.def_color)
-            label.setVisible(False)
-
-        """Row labels (letters)"""
-        self.row_labels = [QGraphicsTextItem(parent=self)
-                           for _ in range(self.num_cols)]
-        alphabet = string.ascii_uppercase
-        for idx, label in enumerate(self.row_labels):
-            label.setPos(0, 0)
-            label.setPlainText(alphabet[idx])
-            label.setDefaultTextColor(self.def_color)
-            label.setVisible(False)
+        Parameters
+        ----------
+        num_rows: int
+            grid rows
+        num_cols: int
+            grid cols
+
+        Returns
+        -------
 
+        """
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self._update_label_texts()
+        if len(self.tl_br_qpointf) == 2 and self.grid_pts is not None:
+            tl, br = self.tl_br_qpointf
+            self._layout(tl.x(), tl.y(), br.x(), br.y(), self.phi)
+
+    def _update_label_texts(self):
+        """Add or drop label texts to match `num_rows` and `num_cols`"""
+        del self.numeral_texts[self.num_rows:]
+        self.numeral_texts.extend(
+            str(row + 1)
+            for row in range(len(self.numeral_texts), self.num_rows))
+        del self.letter_texts[self.num_cols:]
+        self.letter_texts.extend(
+            column_label(col)
+            for col in range(len(self.letter_texts), self.num_cols))
+
+    def _remove_children(self):
+        """Remove disks and square, from the scene too"""
+        for item in self.childItems():
+            if item.scene() is not None:
+                item.scene().removeItem(item)
+            item.setParentItem(None)
+
+    @traced('grid.paint')
     def paint(self, painter: QPainter,
               option: 'QStyleOptionGraphicsItem',
               widget=None):
-        """Virtual function needs to be reimplemented because object is
-        abstract"""
-        pass
+        """Virtual function painting grid lines and labels"""
+        painter.setPen(self.selected_pen if self.selected else self.pen)
+        painter.drawLines(self.lines)
+        if len(self.label_centers) > 0:
+            if self.labels_rotation != self.rotation():
+                self._place_labels()
+            """Undo the grid rotation, labels stay upright"""
+            painter.save()
+            painter.rotate(-self.rotation())
+            painter.setPen(self.label_color)
+            for rect, text in self.labels:
+                painter.drawText(rect, Qt.AlignCenter, text)
+            painter.restore()
 
     def boundingRect(self):
-        """Virtual function needs to be reimplemented because the object is
-         abstract"""
-        return QRectF()
+        """Virtual function returning the area painted by `paint`"""
+        return self.rect
+
+    def shape(self):
+        """Virtual function returning the area sensitive to the mouse: a band
+        `edge_hit_width` wide around every grid line"""
+        if self.line_shape is None:
+            path = QPainterPath()
+            for line in self.lines:
+                path.moveTo(line.p1())
+                path.lineTo(line.p2())
+            self.line_shape = self._stroke(path)
+        return self.line_shape
+
+    def _on_edge(self, pos: QPointF):
+        """Return `True` if `pos` (item coordinates) is on a grid edge"""
+        if self.edge_shape is None:
+            path = QPainterPath()
+            path.addPolygon(self.edge_polygon)
+            self.edge_shape = self._stroke(path)
+        return self.edge_shape.contains(pos)
+
+    @staticmethod
+    def _stroke(path: QPainterPath):
+        """Helper returning the band `edge_hit_width` wide around `path`"""
+        stroker = QPainterPathStroker()
+        stroker.setWidth(AdjustableGrid.edge_hit_width)
+        return stroker.createStroke(path)
+
+    def _cursor(self, pos: QPointF):
+        """Mouse cursor over `pos`: edges move the whole grid, inner lines
+        cannot be moved"""
+        return Qt.OpenHandCursor if self._on_edge(pos) else Qt.ForbiddenCursor
+
+    def hoverEnterEvent(self, event: 'QGraphicsSceneHoverEvent'):
+        """Virtual function called when mouse cursor enters a grid line."""
+        QApplication.setOverrideCursor(self._cursor(event.pos()))
+        return super().hoverEnterEvent(event)
+
+    def hoverMoveEvent(self, event: 'QGraphicsSceneHoverEvent'):
+        """Virtual function called when mouse cursor moves over grid lines.
+        Change mouse cursor according to permissible movements"""
+        QApplication.changeOverrideCursor(self._cursor(event.pos()))
+        return super().hoverMoveEvent(event)
+
+    def hoverLeaveEvent(self, event: 'QGraphicsSceneHoverEvent'):
+        """Virtual function called when mouse leaves grid lines"""
+        QApplication.setOverrideCursor(Qt.ArrowCursor)
+        return super().hoverLeaveEvent(event)
+
+    def mousePressEvent(self, event: 'QGraphicsSceneMouseEvent'):
+        """Virtual function called when a mouse button is pressed on a grid
+        line. Dragging starts if the line is an edge."""
+        self.dragging = self._on_edge(event.pos())
+        self.drag_pos = event.scenePos()
+
+    def mouseMoveEvent(self, event: 'QGraphicsSceneMouseEvent'):
+        """Virtual function called when a mouse button is pressed and the mouse
+         cursor is moved. Move the whole grid if dragged by an edge, at most
+         once per frame, to the latest cursor position."""
+        if self.dragging:
+            self.redraw_throttle.request(self._drag_to, event.scenePos())
+
+    def _drag_to(self, cursor_pos: QPointF):
+        """Move the grid by the cursor displacement since the last move"""
+        if self.dragging:
+            offset = cursor_pos - self.drag_pos
+            self.move_grid(offset.x(), offset.y())
+            self.drag_pos = cursor_pos
+
+    def mouseReleaseEvent(self, event: 'QGraphicsSceneMouseEvent'):
+        """Virtual function called when a mouse button is released. The
+        pending move is applied."""
+        self.redraw_throttle.flush()
+        self.dragging = False
+
+    """This method needs to be reimplemented"""
+    def mouseDoubleClickEvent(self, event: 'QGraphicsSceneMouseEvent'): pass
 
     @staticmethod
     def _angle_mod(angle):
@@ -280,66 +351,40 @@ class AdjustableGrid(QGraphicsItem):
         angle -= np.pi
         return angle
 
-    def _get_phi(self):
-        """Debug helper. Return an angle that should be equal to self.phi."""
-        edge = self.top_edge.line()
-        delta_x = edge.x2() - edge.x1()
-        delta_y = edge.y2() - edge.y1()
-        angle = np.arctan2(delta_y, delta_x)
-        return angle
-
     def clear_grid(self):
         """Remove grid from scene and reset items."""
-        line_list = self.horizontal_lines + self.vertical_lines + \
-                    [self.right_edge, self.left_edge] + \
-                    [self.top_edge, self.bottom_edge]
-
-        disk_list = [self.tl_disk, self.tr_disk, self.br_disk, self.bl_disk]
-
-        label_list = self.row_labels + self.col_labels
-
         try:
             self.scene.removeItem(self)
-            for line in line_list:
-                line.setLine(0, 0, 0, 0)
-                line.setPos(0, 0)
-                line.setVisible(False)
-            for disk in disk_list:
-                disk.setRect(0, 0, 0, 0)
-                disk.setPos(0, 0)
-            for label in label_list:
-                label.setPos(0, 0)
-                label.setVisible(False)
-            self.square.setRect(0, 0, 0, 0)
-            self.square.setPos(0, 0)
         finally:
-            """Reset graphical objects"""
-            self.horizontal_lines = []
-            self.vertical_lines = []
-            self.top_edge = None
-            self.bottom_edge = None
-            self.left_edge = None
-            self.right_edge = None
+            """Drop graphical objects"""
+            self._remove_children()
             self.square = None
-            self.row_labels = []
-            self.col_labels = []
             self.tl_disk = None
             self.tr_disk = None
             self.bl_disk = None
             self.br_disk = None
+            """Reset painted grid"""
+            self.prepareGeometryChange()
+            self.l1 = 0.
+            self.l2 = 0.
+            self.grid_pts = None
+            self.lines = []
+            self.label_centers = np.empty((0, 2))
+            self.labels = []
+            self.labels_rotation = None
+            self.layout_key = None
+            self.edge_polygon = QPolygonF()
+            self.rect = QRectF()
+            self.line_shape = None
+            self.edge_shape = None
+            self.redraw_throttle.cancel()
+            self.dragging = False
             """Reset grid location"""
             self.tl_br_qpointf = []
             self.sign_x = 1
             self.sign_y = 1
             self.phi = 0
-
-    @staticmethod
-    def _set_line(line: QGraphicsLineItem, x1, y1, x2, y2):
-        """Helper to set `line` ends to (x1, y1) and (x2, y2)"""
-        """setLine should set to 0,0 first, then call setPos. 
-        Otherwise it messes the scene coordinate system."""
-        line.setLine(0, 0, x2 - x1, y2 - y1)
-        line.setPos(QPointF(x1, y1))
+            self.setPos(0, 0)
 
     @staticmethod
     def _set_disk(disk: QGraphicsEllipseItem, x0, y0, r):
@@ -353,6 +398,7 @@ class AdjustableGrid(QGraphicsItem):
         disk.setRect(0, 0, 2*r, 2*r)
         disk.setPos(x0 - r, y0 - r)
 
+    @traced('grid.points')
     def generate_grid_pts(
             self, tl_x=None, tl_y=None, br_x=None, br_y=None, angle=None
     ):
@@ -361,6 +407,7 @@ class AdjustableGrid(QGraphicsItem):
         left corner `(tl_x, tl_y)` and bottom right corner `(br_x, br_y)`,
         angled `angle` (`angle` follows same notation of `self.phi`).
         Default parameters are current grid coordinates.
+        See `grid_geometry.grid_points`.
         grid_pts has shape (rows+1, cols+1, 2) and is read as
         (n-th, m-th, (x, y)). Refer to the attached PDF for the notation
         used in the code.
@@ -384,40 +431,17 @@ class AdjustableGrid(QGraphicsItem):
         """
 
         """If no arguments are given use current grid position"""
-        r = AdjustableGrid.disk_radius
-        tl_x = self.tl_disk.x() + r if tl_x is None else tl_x
-        tl_y = self.tl_disk.y() + r if tl_y is None else tl_y
-        br_x = self.br_disk.x() + r if br_x is None else br_x
-        br_y = self.br_disk.y() + r if br_y is None else br_y
+        tl, br = self.pos(), self.mapToScene(QPointF(self.l1, self.l2))
+        tl_x = tl.x() if tl_x is None else tl_x
+        tl_y = tl.y() if tl_y is None else tl_y
+        br_x = br.x() if br_x is None else br_x
+        br_y = br.y() if br_y is None else br_y
         angle = self.phi if angle is None else angle
 
-        """Compute angles and edge lengths"""
-        tl_br_line = QLineF(tl_x, tl_y, br_x, br_y)
-        tl_br_length = tl_br_line.length()
-        tl_br_angle_deg = 360 - tl_br_line.angle()  # angle() is CCW in deg
-        tl_br_angle_rad = tl_br_angle_deg * 2 * np.pi / 360  # convert to rad
-        theta = tl_br_angle_rad - angle
-        cos_angle = np.cos(angle)
-        sin_angle = np.sin(angle)
-        l1 = tl_br_length * np.cos(theta)
-        l2 = tl_br_length * np.sin(theta)
-
-        """Generate grid points"""
-        xs = np.array(
-            [[n * l1 * cos_angle / self.num_cols -
-              m * l2 * sin_angle / self.num_rows + tl_x
-              for m in range(self.num_rows + 1)]
-             for n in range(self.num_cols + 1)]
-        )  # TODO rewrite clearly
-        ys = np.array(
-            [[n * l1 * sin_angle / self.num_cols +
-              m * l2 * cos_angle / self.num_rows + tl_y
-              for m in range(self.num_rows + 1)]
-             for n in range(self.num_cols + 1)]
-        )  # TODO rewrite clearly
-        grid_pts = np.dstack((xs, ys))
-        return grid_pts
+        return grid_points((tl_x, tl_y), (br_x, br_y), angle,
+                           self.num_rows, self.num_cols)
 
+    @traced('grid.draw')
     def draw_grid(self,
                   tl_x: float=None,
                   tl_y: float=None,
@@ -432,115 +456,149 @@ class AdjustableGrid(QGraphicsItem):
 
         This function draw graphical objects but do not make direct changes
         to `QGraphicsScene`. To visualize a grid, use  method
-        `add_grid_to_scene()`. Also, this method does not update the instance
-        properties assigned in the constructor, like signs, phi and tl br
-        coordinates.
+        `add_grid_to_scene()`. Also, this method does not update
+        `tl_br_qpointf`; the grid item is rotated by `angle`, which becomes
+        `self.phi`.
 
         Refer to the attached PDF for the notation used in the code."""
-        """Debug: phi difference must be zero or AssertionError"""
-        phi_difference = (self.phi - self._get_phi()) % np.pi
-        assert isclose(phi_difference, 0,  abs_tol=1e-4, rel_tol=1),\
-            str(self.phi) + ', measured: ' + str(self._get_phi())
-
         """If arguments are not given, use current grid coordinates"""
-        r = AdjustableGrid.disk_radius
-        tl_x = self.tl_disk.x() + r if tl_x is None else tl_x
-        tl_y = self.tl_disk.y() + r if tl_y is None else tl_y
-        br_x = self.br_disk.x() + r if br_x is None else br_x
-        br_y = self.br_disk.y() + r if br_y is None else br_y
+        tl, br = self.pos(), self.mapToScene(QPointF(self.l1, self.l2))
+        tl_x = tl.x() if tl_x is None else tl_x
+        tl_y = tl.y() if tl_y is None else tl_y
+        br_x = br.x() if br_x is None else br_x
+        br_y = br.y() if br_y is None else br_y
         angle = self.phi if angle is None else angle
 
+        self._layout(tl_x, tl_y, br_x, br_y, angle)
+
+    @traced('grid.layout')
+    def _layout(self, tl_x, tl_y, br_x, br_y, angle):
+        """Place the grid item at `(tl_x, tl_y)`, rotate it by `angle`, and
+        compute the painted lines and labels, and place disks and square, in
+        grid-local coordinates for bottom right corner `(br_x, br_y)`.
+        Lines, labels and children are left alone if the grid only moved or
+        rotated."""
+        """Edge lengths (see `grid_geometry.grid_points`)"""
+        tl_br_length = np.hypot(br_x - tl_x, br_y - tl_y)
+        theta = np.arctan2(br_y - tl_y, br_x - tl_x) - angle
+        l1 = tl_br_length * np.cos(theta)
+        l2 = tl_br_length * np.sin(theta)
+
+        """Top left corner is the item origin, top edge the item x-axis"""
+        self.setPos(tl_x, tl_y)
+        self.phi = angle
+
+        layout_key = (l1, l2, self.num_rows, self.num_cols,
+                      self.label_enabled)
+        if layout_key == self.layout_key:
+            return
+        self.prepareGeometryChange()
+        self.layout_key = layout_key
+        self.l1 = l1
+        self.l2 = l2
+
         """Generate horizontal and vertical lines"""
-        grid_pts = self.generate_grid_pts(tl_x, tl_y, br_x, br_y, angle)
+        grid_pts = grid_points((0, 0), (self.l1, self.l2), 0,
+                               self.num_rows, self.num_cols)
         h_lines_pts = \
             np.transpose([grid_pts[0, :], grid_pts[-1, :]], (1, 0, 2))
         v_lines_pts = \
             np.transpose([grid_pts[:, 0], grid_pts[:, -1]], (1, 0, 2))
+        self.grid_pts = grid_pts
 
-        """Draw grid lines (except edges)"""
-        for line, coordinates in zip(self.horizontal_lines, h_lines_pts[1:-1]):
-            self._set_line(line, *coordinates.flatten())
-        for line, coordinates in zip(self.vertical_lines, v_lines_pts[1:-1]):
-            self._set_line(line, *coordinates.flatten())
-
-        """Draw edges"""
-        self._set_line(self.top_edge, *h_lines_pts[0].flatten())
-        self._set_line(self.bottom_edge, *h_lines_pts[-1].flatten())
-        self._set_line(self.left_edge, *v_lines_pts[0].flatten())
-        self._set_line(self.right_edge, *v_lines_pts[-1].flatten())
+        """Grid lines and edges, painted at once"""
+        self.lines = [QLineF(*coordinates) for coordinates in
+                      np.concatenate((h_lines_pts, v_lines_pts))
+                      .reshape(-1, 4).tolist()]
+        self.edge_polygon = QPolygonF(QRectF(0, 0, self.l1, self.l2))
+        self.line_shape = None
+        self.edge_shape = None
 
         """Draw disks"""
         r = AdjustableGrid.disk_radius
-        self._set_disk(self.tl_disk, *h_lines_pts[0, 0], r)
-        self._set_disk(self.tr_disk, *h_lines_pts[0, 1], r)
-        self._set_disk(self.bl_disk, *v_lines_pts[0, 1], r)
-        self._set_disk(self.br_disk, *v_lines_pts[-1, 1], r)
+        self._set_disk(self.tl_disk, 0, 0, r)
+        self._set_disk(self.tr_disk, self.l1, 0, r)
+        self._set_disk(self.bl_disk, 0, self.l2, r)
+        self._set_disk(self.br_disk, self.l1, self.l2, r)
 
         """Draw resizing square"""
-        r = AdjustableGrid.disk_radius
-        x_square, y_square = v_lines_pts[-1, 1]
-        x_square += 2 * r
-        y_square -= r
-        self._set_square(self.square, x_square, y_square, r)
+        self._set_square(self.square, self.l1 + 2 * r, self.l2 - r, r)
 
         """sign_x,y account for grid flips. e.g. if sign_y < 0, then 
-        `self.top_edge` is the bottom edge. Signs account for how the user 
+        the top edge is the bottom edge. Signs account for how the user 
         places/resize grid, and do not change by rotating the grid.
         Signs are used to draw labels outside the grid."""
-        if - np.pi / 2 < self.phi < np.pi / 2:
-            self.sign_y = np.sign(self.bl_disk.y() - self.tl_disk.y())
-            self.sign_x = np.sign(self.tr_disk.x() - self.tl_disk.x())
-        else:
-            self.sign_y = - np.sign(self.bl_disk.y() - self.tl_disk.y())
-            self.sign_x = - np.sign(self.tr_disk.x() - self.tl_disk.x())
+        self.sign_x = np.sign(self.l1)
+        self.sign_y = np.sign(self.l2)
+
+        """Labels"""
+        self.label_centers = self._layout_labels(grid_pts) \
+            if self.label_enabled else np.empty((0, 2))
+        self.labels_rotation = None
+
+        self._update_rect()
+        self.update()
+
+    def _update_rect(self):
+        """Set the bounding rect around the edges, with room for labels and
+        for the mouse-sensitive band if needed"""
+        margin = AdjustableGrid.selected_thickness
+        if self.interactive:
+            margin += AdjustableGrid.edge_hit_width
+        if len(self.label_centers) > 0:
+            margin += AdjustableGrid.font_dist + np.hypot(
+                AdjustableGrid.label_size.width(),
+                AdjustableGrid.label_size.height()) / 2
+        self.rect = QRectF(0, 0, self.l1, self.l2).normalized().adjusted(
+            -margin, -margin, margin, margin)
+
+    def _layout_labels(self, grid_pts: np.ndarray):
+        """
+        Return the label centers of grid points `grid_pts` (grid-local
+        coordinates): numerals next to the left edge, one per row, and
+        letters above the top edge, one per column. Labels are centered
+        `font_dist` outside the edges.
 
-        """Convenience variables"""
+        Returns
+        -------
+        Array of shape (rows + cols, 2), numerals first
+        """
+        along_top = np.array([1., 0.])
+        along_left = np.array([0., 1.])
+
+        """Numbers, half a row below each horizontal line"""
+        v_edge_offset = abs(self.l2) / (self.num_rows * 2)
+        numeral_centers = grid_pts[0, :-1] \
+            + self.sign_y * v_edge_offset * along_left \
+            - self.sign_x * AdjustableGrid.font_dist * along_top
+
+        """Letters, half a column right of each vertical line"""
+        h_edge_offset = abs(self.l1) / (self.num_cols * 2)
+        letter_centers = grid_pts[:-1, 0] \
+            + self.sign_x * h_edge_offset * along_top \
+            - self.sign_y * AdjustableGrid.font_dist * along_left
+        return np.concatenate((numeral_centers, letter_centers))
+
+    def _place_labels(self):
+        """Set `labels` to the label boxes in the grid frame rotated back by
+        `phi`, where labels are painted upright"""
+        angle = np.radians(self.rotation())
         cos_phi = np.cos(angle)
         sin_phi = np.sin(angle)
-
-        """Draw numbers"""
-        v_edge_offset = self.left_edge.line().length() / (self.num_rows * 2)
-        # assert v_edge_offset >= 0, v_edge_offset
-        for label, coord, in zip(self.col_labels, h_lines_pts):
-            x_c = coord[0, 0]
-            y_c = coord[0, 1]
-            x_b = x_c - self.sign_y * v_edge_offset * sin_phi
-            y_b = y_c + self.sign_y * v_edge_offset * cos_phi
-            x_d = x_b - self.sign_x * AdjustableGrid.font_dist * cos_phi
-            y_d = y_b - self.sign_x * AdjustableGrid.font_dist * sin_phi
-            font_offset_y = label.boundingRect().height() / 2
-            font_offset_x = label.boundingRect().width() / 2
-            label_y = y_d - font_offset_y
-            label_x = x_d - font_offset_x
-            label.setPos(label_x, label_y)  # don't need helper for these
-            if self.label_enabled is True:
-                label.setVisible(True)
-            else:
-                label.setVisible(False)
-
-        """Draw letters"""
-        h_edge_offset = self.top_edge.line().length() / (self.num_cols * 2)
-        # assert h_edge_offset >= 0, h_edge_offset
-        for label, coord, in zip(self.row_labels, v_lines_pts):
-            x_c = coord[0, 0]
-            y_c = coord[0, 1]
-            x_f = x_c + self.sign_x * h_edge_offset * cos_phi
-            y_f = y_c + self.sign_x * h_edge_offset * sin_phi
-            x_e = x_f + self.sign_y * AdjustableGrid.font_dist * sin_phi
-            y_e = y_f - self.sign_y * AdjustableGrid.font_dist * cos_phi
-            font_offset_y = label.boundingRect().height() / 2
-            font_offset_x = label.boundingRect().width() / 2
-            label_y = y_e - font_offset_y
-            label_x = x_e - font_offset_x
-            label.setPos(label_x, label_y)
-            if self.label_enabled is True:
-                label.setVisible(True)
-            else:
-                label.setVisible(False)
+        x, y = self.label_centers.T
+        centers = np.stack((x * cos_phi - y * sin_phi,
+                            x * sin_phi + y * cos_phi), axis=1)
+        width = AdjustableGrid.label_size.width()
+        height = AdjustableGrid.label_size.height()
+        self.labels = [
+            (QRectF(x - width / 2, y - height / 2, width, height), text)
+            for (x, y), text in zip(centers.tolist(),
+                                    self.numeral_texts + self.letter_texts)]
+        self.labels_rotation = self.rotation()
 
     def add_grid_to_scene(self):
         """
-        Display grid by adding all children of `AdjustableGrid` to scene.
+        Display grid by adding it, with its children, to scene.
 
         Returns
         -------
@@ -567,23 +625,23 @@ class AdjustableGrid(QGraphicsItem):
         if thickness is None:
             thickness = AdjustableGrid.default_line_thickness
 
-        """The whole grid"""
-        line_list = self.horizontal_lines + self.vertical_lines \
-                    + [self.right_edge, self.left_edge] \
-                    + [self.top_edge, self.bottom_edge]
-
-        disk_list = [self.tl_disk, self.tr_disk, self.br_disk, self.bl_disk]
-
-        label_list = self.row_labels + self.col_labels
-
-        for line in line_list:
-            line.setPen(QPen(color, thickness))
-
-        for disk in disk_list:
+        self.pen = QPen(color, thickness)
+        self.label_color = color
+        for disk in [self.tl_disk, self.tr_disk, self.br_disk, self.bl_disk]:
             disk.setBrush(QBrush(color))
+        self.update()
+
+    def set_selected(self, selected: bool):
+        """Show the grid as selected or not, repainting it only if the
+        selection changed"""
+        if selected != self.selected:
+            self.selected = selected
+            self.update()
 
-        for label in label_list:
-            label.setDefaultTextColor(color)
+    def contains_scene_point(self, pos: QPointF):
+        """Return `True` if scene point `pos` is inside the grid edges"""
+        return self.edge_polygon.containsPoint(self.mapFromScene(pos),
+                                               Qt.OddEvenFill)
 
     def make_grid_non_interactive(self):
         """
@@ -593,41 +651,26 @@ class AdjustableGrid(QGraphicsItem):
         -------
 
         """
-        """The whole grid"""
-        line_list = self.horizontal_lines + self.vertical_lines \
-                    + [self.right_edge, self.left_edge] \
-                    + [self.top_edge, self.bottom_edge]
-
-        disk_list = [self.tl_disk, self.tr_disk, self.br_disk, self.bl_disk]
-
-        label_list = self.row_labels + self.col_labels
-
         self.set_color_and_thickness(color=Qt.blue)
-
-        for line in line_list:
-            # line.setPen(QPen(Qt.blue, .5))
-            line.setFlag(QGraphicsLineItem.ItemSendsGeometryChanges,
-                         enabled=False)
-            line.setAcceptHoverEvents(False)
-
-        for disk in disk_list:
-            # disk.setBrush(Qt.blue)
-            disk.setFlag(QGraphicsEllipseItem.ItemSendsGeometryChanges,
-                         enabled=False)
-            disk.setAcceptHoverEvents(False)
-            disk.setPos(0, 0)
-            disk.setRect(0, 0, 0, 0)
-
-        """Remove labels and square"""
-        for label in label_list:
-            label.setPos(0, 0)
-            label.setPlainText('')
-
-        self.square.setFlag(QGraphicsRectItem.ItemSendsGeometryChanges,
-                            enabled=False)
-        self.square.setAcceptHoverEvents(False)
-        self.square.setRect(0, 0, 0, 0)
-
+        self.setAcceptHoverEvents(False)
+        self.setAcceptedMouseButtons(Qt.NoButton)
+
+        self.interactive = False
+
+        """Remove labels, disks and square"""
+        self.label_enabled = False
+        self.label_centers = np.empty((0, 2))
+        self.labels = []
+        self.layout_key = None
+        self.prepareGeometryChange()
+        self._update_rect()
+        for item in [self.tl_disk, self.tr_disk, self.br_disk, self.bl_disk,
+                     self.square]:
+            item.setAcceptHoverEvents(False)
+            item.setVisible(False)
+        self.update()
+
+    @traced('grid.move')
     def move_grid(self, offset_x, offset_y):
         """
         Move the whole grid (lines, disks, square, etc.) by spatial
@@ -644,38 +687,14 @@ class AdjustableGrid(QGraphicsItem):
         -------
 
         """
-        line_list = self.horizontal_lines + self.vertical_lines \
-                    + [self.right_edge, self.left_edge] \
-                    + [self.top_edge, self.bottom_edge]
-
-        disk_list = [self.tl_disk, self.tr_disk, self.br_disk, self.bl_disk]
-
-        label_list = self.row_labels + self.col_labels
-
-        """Update lines, disks labels, and square positions"""
-        for line in line_list:
-            curr_pos = line.scenePos()
-            line.setTransformOriginPoint(0, 0)
-            line.setPos(curr_pos.x() + offset_x, curr_pos.y() + offset_y)
-
-        for disk in disk_list:
-            curr_pos = disk.scenePos()
-            disk.setTransformOriginPoint(0, 0)
-            disk.setPos(curr_pos.x() + offset_x, curr_pos.y() + offset_y)
-
-        for label in label_list:
-            curr_pos = label.scenePos()
-            label.setTransformOriginPoint(0, 0)
-            label.setPos(curr_pos.x() + offset_x, curr_pos.y() + offset_y)
-
-        curr_pos = self.square.scenePos()
-        self.square.setTransformOriginPoint(0, 0)
-        self.square.setPos(curr_pos.x() + offset_x, curr_pos.y() + offset_y)
+        """Lines, disks, labels and square follow the grid item"""
+        self.setPos(self.pos() + QPointF(offset_x, offset_y))
 
         """Update corners position"""
         self.tl_br_qpointf = [QPointF(pt.x() + offset_x, pt.y() + offset_y)
                               for pt in self.tl_br_qpointf]
 
+    @traced('grid.rotate')
     def rotate_grid(self, *,
                     old_pos: QPointF,
                     new_pos: QPointF,
@@ -702,32 +721,20 @@ class AdjustableGrid(QGraphicsItem):
 
         """
 
-        line_list = self.horizontal_lines + self.vertical_lines \
-                    + [self.right_edge, self.left_edge] \
-                    + [self.top_edge, self.bottom_edge]
-
-        disk_list = [self.tl_disk, self.tr_disk, self.br_disk, self.bl_disk]
-
-        label_list = self.row_labels + self.col_labels
-
-        """Choose pivoting disk as opposite corner to caller disk"""
-        if caller.scenePos() == self.tl_disk.scenePos():
-            pivot_disk = self.br_disk
-        elif caller.scenePos() == self.tr_disk.scenePos():
-            pivot_disk = self.bl_disk
-        elif caller.scenePos() == self.bl_disk.scenePos():
-            pivot_disk = self.tr_disk
-        elif caller.scenePos() == self.br_disk.scenePos():
-            pivot_disk = self.tl_disk
+        """Choose pivoting corner (grid-local coordinates) as opposite corner
+        to caller disk"""
+        if caller is self.tl_disk:
+            pivot_local = QPointF(self.l1, self.l2)
+        elif caller is self.tr_disk:
+            pivot_local = QPointF(0, self.l2)
+        elif caller is self.bl_disk:
+            pivot_local = QPointF(self.l1, 0)
+        elif caller is self.br_disk:
+            pivot_local = QPointF(0, 0)
         else:
-            pivot_disk = None
             print('error')
-
-        """Pivoting pt is the center of the pivoting disk. 
-        scenePos() yields top left of bounding rect"""
-        r = AdjustableGrid.disk_radius
-        pivoting_pt = \
-            pivot_disk.scenePos() + QPointF(r, r)
+            return
+        pivoting_pt = self.mapToScene(pivot_local)
         pivot_x = pivoting_pt.x()
         pivot_y = pivoting_pt.y()
 
@@ -741,127 +748,22 @@ class AdjustableGrid(QGraphicsItem):
         new_alpha = np.arctan2(new_offset_y, new_offset_x)  # 0 is // to x-axis
         delta_alpha = self._angle_mod(new_alpha - old_alpha)  # CW
 
-        """Update grid angle"""
+        """Rotate the grid item, then move it back so that the pivoting
+        point stays in place. Lines, labels and children follow the item."""
         self.phi = self._angle_mod(self.phi + delta_alpha)
+        self.setPos(self.pos() + pivoting_pt - self.mapToScene(pivot_local))
 
         """Update corners coordinates"""
-        tl_x_pv = self.tl_br_qpointf[0].x() - pivot_x
-        tl_y_pv = self.tl_br_qpointf[0].y() - pivot_y
-        br_x_pv = self.tl_br_qpointf[1].x() - pivot_x
-        br_y_pv = self.tl_br_qpointf[1].y() - pivot_y
-        cos_delta_alpha = np.cos(delta_alpha)
-        sin_delta_alpha = np.sin(delta_alpha)
-        rotation_matrix = \
-            np.array([[cos_delta_alpha, -sin_delta_alpha],
-                      [sin_delta_alpha, cos_delta_alpha]])
-        tl_x_new, tl_y_new = \
-            np.dot(rotation_matrix, [tl_x_pv, tl_y_pv]) + [pivot_x, pivot_y]
-        br_x_new, br_y_new = \
-            np.dot(rotation_matrix, [br_x_pv, br_y_pv]) + [pivot_x, pivot_y]
-        self.tl_br_qpointf = [QPointF(tl_x_new, tl_y_new),
-                              QPointF(br_x_new, br_y_new)]
-
-        """Update disks positions"""
-        r = AdjustableGrid.disk_radius
-        for disk in disk_list:
-            curr_disk_pos = disk.scenePos() + QPointF(r, r)
-            delta_x = curr_disk_pos.x() - pivoting_pt.x()
-            delta_y = curr_disk_pos.y() - pivoting_pt.y()
-            disk_current_angle = np.arctan2(delta_y, delta_x)
-            disk_new_angle = disk_current_angle + delta_alpha
-            length_to_pv_pt = QLineF(pivoting_pt, curr_disk_pos).length()
-            disk_new_tl_x = length_to_pv_pt * np.cos(disk_new_angle) \
-                            + pivoting_pt.x() - r
-            disk_new_tl_y = length_to_pv_pt * np.sin(disk_new_angle) \
-                            + pivoting_pt.y() - r
-            disk.setPos(QPointF(disk_new_tl_x, disk_new_tl_y))
-
-        """Update resizing square position"""
-        r = AdjustableGrid.disk_radius
-        curr_square_pos = self.square.scenePos() + QPointF(r, r)
-        delta_x = curr_square_pos.x() - pivot_x
-        delta_y = curr_square_pos.y() - pivot_y
-        square_current_angle = np.arctan2(delta_y, delta_x)
-        square_new_angle = square_current_angle + delta_alpha
-        length_to_pv_pt = QLineF(pivoting_pt, curr_square_pos).length()
-        square_new_tl_x = length_to_pv_pt * np.cos(square_new_angle) \
-                          + pivot_x - r
-        square_new_tl_y = length_to_pv_pt * np.sin(square_new_angle) \
-                          + pivot_y - r
-        self.square.setPos(QPointF(square_new_tl_x, square_new_tl_y))
-
-        """Update lines positions"""
-        for line in line_list:
-            line_loc = line.line()  # in local coordinates
-            line_offset = line.scenePos()
-            line_pt1 = line_loc.p1() + line_offset
-            line_pt2 = line_loc.p2() + line_offset
-            delta_y1 = line_pt1.y() - pivot_y
-            delta_x1 = line_pt1.x() - pivot_x
-            delta_y2 = line_pt2.y() - pivot_y
-            delta_x2 = line_pt2.x() - pivot_x
-            line_angle1_new = np.arctan2(delta_y1, delta_x1) + delta_alpha
-            line_angle2_new = np.arctan2(delta_y2, delta_x2) + delta_alpha
-            length_to_pv_pt_1 = QLineF(pivoting_pt, line_pt1).length()
-            length_to_pv_pt_2 = QLineF(pivoting_pt, line_pt2).length()
-            line_x1 = length_to_pv_pt_1 * np.cos(line_angle1_new) + pivot_x
-            line_y1 = length_to_pv_pt_1 * np.sin(line_angle1_new) + pivot_y
-            line_x2 = length_to_pv_pt_2 * np.cos(line_angle2_new) + pivot_x
-            line_y2 = length_to_pv_pt_2 * np.sin(line_angle2_new) + pivot_y
-            self._set_line(line, line_x1, line_y1, line_x2, line_y2)
-
-        """Update labels positions"""
-        for label in label_list:
-            """The label center coordinates are x_d, y_d (see fig.)"""
-            curr_label_pos = label.scenePos()
-            font_offset_y = label.boundingRect().height() / 2
-            font_offset_x = label.boundingRect().width() / 2
-            assert(font_offset_x > 0 and font_offset_y > 0)
-            x_d = curr_label_pos.x() + font_offset_x
-            y_d = curr_label_pos.y() + font_offset_y
-            """delta is the vector from pivoting pt to font center"""
-            delta_x = x_d - pivot_x
-            delta_y = y_d - pivot_y
-            delta = np.sqrt((delta_x ** 2) + (delta_y ** 2))
-            label_curr_angle = np.arctan2(delta_y, delta_x)
-            label_new_angle = label_curr_angle + delta_alpha
-            x_d = delta * np.cos(label_new_angle) + pivot_x
-            y_d = delta * np.sin(label_new_angle) + pivot_y
-            label_new_tl_x = x_d - font_offset_x
-            label_new_tl_y = y_d - font_offset_y
-            label.setPos(QPointF(label_new_tl_x, label_new_tl_y))
+        self.tl_br_qpointf = [self.pos(),
+                              self.mapToScene(QPointF(self.l1, self.l2))]
 
+    @traced('grid.resize')
     def resize_grid(self):
         """Take out coordinate of bottom right corner. This calls virtual function
         mouseMoveEvent from GridWindow"""
         self.tl_br_qpointf = self.tl_br_qpointf[:-1]
 
-    @staticmethod
-    def _duplicate_array(array: np.ndarray):
-        """
-        Helper that takes a NumPy array and duplicates each element except
-        the endpoint. *e.g.*  if `array  = [1, 2, 3, 4]`, the helper returns
-        `[1, 2, 2, 3, 3, 4]`. The method only process the first array
-        dimension.
-
-        Parameters
-        ----------
-        array: NumPy Array
-            Array to be duplicated
-
-        Returns
-        -------
-        Duplicated Numpy array
-        """
-
-        mask = np.repeat(2, len(array) - 2)
-        mask = np.insert(mask, 0, 1)
-        mask = np.append(mask, 1)
-        """Mask is [1, 2, 2....2, 1]"""
-        assert len(mask) == len(array)
-        duplicated_array = np.repeat(array, mask, axis=0)
-        return duplicated_array
-
+    @traced('grid.cell_coordinates')
     def set_image_coordinates(self, grid_pts=None):
         """
         Use grid coordinates `grid_pts` to set `self.image_coordinates`
@@ -880,32 +782,8 @@ class AdjustableGrid(QGraphicsItem):
         -------
 
         """
-        n_rows = self.num_rows  # 12
-        n_cols = self.num_cols   # 8
-        assert grid_pts.shape == (n_cols + 1, n_rows + 1, 2)
-
-        """Duplicate columns and rows except end point to cast grid coordinates
-        into bg_image coordinates."""
-        pts_2x_cols = self._duplicate_array(grid_pts)
-        new_n_cols = (n_cols-1) * 2 + 2
-        assert pts_2x_cols.shape == (new_n_cols, n_rows + 1, 2)
-        pts_2x_cols_t = np.transpose(pts_2x_cols, (1, 0, 2))
-        pts_2x_cols_rows_t = self._duplicate_array(pts_2x_cols_t)
-        pts_2x_cols_rows = np.transpose(pts_2x_cols_rows_t, (1, 0, 2))
-        assert pts_2x_cols_rows.shape == (n_cols * 2, n_rows * 2, 2), \
-            'shape found {}'.format(pts_2x_cols_rows.shape)
-
-        """Generate bg_image coordinates"""
-        cols = int(pts_2x_cols_rows.shape[0] / 2)  # 8
-        rows = int(pts_2x_cols_rows.shape[1] / 2)  # 12
-        img_coordinates = np.array([
-            pts_2x_cols_rows[2*n:2*n+2, 2*m:2*m+2]  # could use list(zip(...))
-            for n in range(cols) for m in range(rows)
-        ])
-        assert img_coordinates.shape == (n_rows * n_cols, 2, 2, 2)
-        self.image_coordinates = img_coordinates
-
-        # print(self.image_coordinates)
+        self.image_coordinates = cell_coordinates(grid_pts, self.num_rows,
+                                                  self.num_cols)
 
     def set_line_thickness(self):
         pass
\ No newline at end of file
@@ -0,0 +1,255 @@
+import numpy as np
+
+from tiff_reader import ImageReader
+from tracing import traced
+
+
+def upright_corners(corners, tol: float=1e-6):
+    """
+    Reorder the corners of a grid cell so that the cropped image is neither
+    mirrored nor upside down, whatever the direction the grid was drawn
+    in. When the cell basis is mirrored (a grid drawn right to left or
+    bottom to top), its top and bottom corners are swapped. The tl -> tr
+    edge then stays the x axis of the crop, turned by half a turn if it
+    points left, so that it is within 90 degrees of the image x axis.
+
+    Parameters
+    ----------
+    corners: array_like
+        `[tl, bl, br, tr]` corner coordinates in image pixels, shape (4, 2)
+    tol: float
+        edges within `tol` pixels of vertical count as vertical
+
+    Returns
+    -------
+    NumPy array `[tl, bl, br, tr]` of shape (4, 2)
+    """
+    tl, bl, br, tr = np.asarray(corners, dtype=np.float64)
+    edge_x = tr - tl
+    edge_y = bl - tl
+    if edge_x[0] * edge_y[1] - edge_x[1] * edge_y[0] < 0:
+        """Mirrored basis: swap top and bottom"""
+        tl, bl, br, tr = bl, tl, tr, br
+    edge_x = tr - tl
+    if edge_x[0] < -tol or (edge_x[0] <= tol and edge_x[1] < 0):
+        """x axis pointing left, or up: half a turn"""
+        tl, bl, br, tr = br, tr, tl, bl
+    return np.array([tl, bl, br, tr])
+
+
+def cell_size(corners):
+    """Output size `(width, height)` in pixels of the cell with corners
+    `[tl, bl, br, tr]`"""
+    tl, bl, br, tr = corners
+    width = max(1, int(round(np.hypot(*(tr - tl)))))
+    height = max(1, int(round(np.hypot(*(bl - tl)))))
+    return width, height
+
+
+def is_axis_aligned(corners, tol: float=1e-6):
+    """`True` if the edges of the cell are parallel to the image axes"""
+    tl, bl, br, tr = corners
+    return abs(tr[1] - tl[1]) < tol and abs(bl[0] - tl[0]) < tol
+
+
+def source_rect(corners):
+    """
+    Integer bounding rectangle `(x, y, width, height)` of the source pixels
+    needed to sample a cell, with a one pixel margin for interpolation.
+    """
+    corners = np.asarray(corners)
+    x0, y0 = np.floor(corners.min(axis=0)).astype(int) - 1
+    x1, y1 = np.ceil(corners.max(axis=0)).astype(int) + 1
+    return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
+
+def read_rect(corners):
+    """
+    Integer rectangle `(x, y, width, height)` read from the image to crop
+    the cell with corners `[tl, bl, br, tr]`: the cell itself when it is
+    axis-aligned, whatever the order of its corners, else its
+    `source_rect`.
+    """
+    corners = np.asarray(corners)
+    if not is_axis_aligned(corners):
+        return source_rect(corners)
+    width, height = cell_size(corners)
+    x, y = np.rint(corners.min(axis=0)).astype(int)
+    return int(x), int(y), width, height
+
+
+@traced('crop.sample')
+def sample_cell(source: np.ndarray, origin, corners):
+    """
+    Sample the cell with corners `[tl, bl, br, tr]` from `source` using the
+    affine map that sends the output rectangle onto the cell. Values are
+    bilinearly interpolated and keep the dtype of `source`.
+
+    Parameters
+    ----------
+    source: NumPy Array
+        image region, shape (height, width) or (height, width, samples)
+    origin: tuple
+        (x, y) image coordinates of `source[0, 0]`
+    corners: NumPy Array
+        cell corners in image pixels, shape (4, 2)
+
+    Returns
+    -------
+    NumPy array of shape (cell height, cell width[, samples])
+    """
+    tl, bl, br, tr = corners
+    width, height = cell_size(corners)
+    """Centres of output pixels mapped to source pixel indices"""
+    u = (np.arange(width) + .5) / width
+    v = (np.arange(height) + .5) / height
+    edge_x = tr - tl
+    edge_y = bl - tl
+    xs = tl[0] - origin[0] - .5 + \
+        np.add.outer(v * edge_y[0], u * edge_x[0])
+    ys = tl[1] - origin[1] - .5 + \
+        np.add.outer(v * edge_y[1], u * edge_x[1])
+
+    x0 = np.floor(xs)
+    y0 = np.floor(ys)
+    wx = (xs - x0).astype(np.float32)
+    wy = (ys - y0).astype(np.float32)
+    max_x = source.shape[1] - 1
+    max_y = source.shape[0] - 1
+    x0 = np.clip(x0.astype(np.intp), 0, max_x)
+    y0 = np.clip(y0.astype(np.intp), 0, max_y)
+    x1 = np.minimum(x0 + 1, max_x)
+    y1 = np.minimum(y0 + 1, max_y)
+    if source.ndim == 3:
+        wx = wx[..., np.newaxis]
+        wy = wy[..., np.newaxis]
+    top = source[y0, x0] * (1 - wx) + source[y0, x1] * wx
+    bottom = source[y1, x0] * (1 - wx) + source[y1, x1] * wx
+    cell = top * (1 - wy) + bottom * wy
+    if source.dtype.kind in 'ui':
+        info = np.iinfo(source.dtype)
+        cell = np.clip(np.rint(cell), info.min, info.max)
+    return cell.astype(source.dtype)
+
+
+def crop_cell(reader: ImageReader, corners):
+    """
+    Crop one grid cell from the image behind `reader`, decoding only the
+    pixels under the cell bounding box.
+
+    Parameters
+    ----------
+    reader: ImageReader
+        source image
+    corners: array_like
+        `[tl, bl, br, tr]` corner coordinates in full-resolution pixels
+
+    Returns
+    -------
+    NumPy array with the dtype of `reader`
+    """
+    corners = upright_corners(corners)
+    x, y, width, height = read_rect(corners)
+    source = reader.read_region(x, y, width, height)
+    return sample_source(source, (x, y), corners)
+
+
+def iter_cell_sources(reader: ImageReader, cells, x_range=None):
+    """
+    Walk the image behind `reader` once, top to bottom, and gather the
+    source pixels of every cell in `cells`. Cells are sorted by their top
+    edge; each band of strips or tiles is decoded once and copied into the
+    buffers of all the cells it overlaps. A cell is yielded as soon as the
+    walk has passed its bottom edge, so only the cells crossing the current
+    band are held in memory.
+
+    Parameters
+    ----------
+    reader: ImageReader
+        source image
+    cells: list
+        `[tl, bl, br, tr]` corners of each cell, in full-resolution pixels
+    x_range: tuple
+        columns (x_start, x_stop) to decode. Default: union of the cells.
+
+    Returns
+    -------
+    Generator of `(index, source, origin, corners)` tuples, where `source`
+    is the region of the image with top left corner `origin` that
+    `sample_source` turns into the cell image
+    """
+    corners = [upright_corners(cell) for cell in cells]
+    rects = [read_rect(cell) for cell in corners]
+    if not rects:
+        return
+    if x_range is None:
+        x_range = (min(rect[0] for rect in rects),
+                   max(rect[0] + rect[2] for rect in rects))
+    x_start = max(0, x_range[0])
+    x_stop = min(reader.width, x_range[1])
+
+    order = sorted(range(len(rects)), key=lambda ix: rects[ix][1])
+    buffers = {}  # cell index -> source buffer
+    next_cell = 0
+
+    def finished_cells(y_done):
+        """Cells whose bottom edge is above `y_done`"""
+        for ix in list(buffers):
+            x, y, width, height = rects[ix]
+            if y + height <= y_done:
+                yield ix, buffers.pop(ix), (x, y), corners[ix]
+
+    y_first = max(0, rects[order[0]][1])
+    y_last = min(reader.height, max(rect[1] + rect[3] for rect in rects))
+    if x_start < x_stop and y_first < y_last:
+        for band_y, band in reader.iter_bands(y_first, y_last,
+                                              x_start=x_start,
+                                              x_stop=x_stop):
+            band_stop = band_y + band.shape[0]
+            """Allocate buffers of the cells starting in this band"""
+            while next_cell < len(order) and \
+                    rects[order[next_cell]][1] < band_stop:
+                ix = order[next_cell]
+                x, y, width, height = rects[ix]
+                buffers[ix] = np.zeros((height, width) + reader.shape[2:],
+                                       reader.dtype)
+                next_cell += 1
+            """Copy the band into every cell it overlaps"""
+            for ix, buffer in buffers.items():
+                x, y, width, height = rects[ix]
+                y0, y1 = max(y, band_y), min(y + height, band_stop)
+                x0, x1 = max(x, x_start), min(x + width, x_stop)
+                if y0 < y1 and x0 < x1:
+                    buffer[y0 - y:y1 - y, x0 - x:x1 - x] = \
+                        band[y0 - band_y:y1 - band_y,
+                             x0 - x_start:x1 - x_start]
+            yield from finished_cells(band_stop)
+    """Cells outside the image, or reaching past its bottom edge"""
+    for ix in order[next_cell:]:
+        x, y, width, height = rects[ix]
+        buffers[ix] = np.zeros((height, width) + reader.shape[2:],
+                               reader.dtype)
+    yield from finished_cells(float('inf'))
+
+
+def sample_source(source: np.ndarray, origin, corners):
+    """Turn a source buffer yielded by `iter_cell_sources` or read from
+    `read_rect(corners)` into the cell image"""
+    if is_axis_aligned(corners):
+        """Plain copy, no interpolation"""
+        return source
+    return sample_cell(source, origin, corners)
+
+
+def batch_crop(reader: ImageReader, cells):
+    """
+    Crop all `cells` in a single top-to-bottom pass over the image. See
+    `iter_cell_sources`.
+
+    Returns
+    -------
+    Generator of `(index, cell image)` tuples, in the order cells are
+    completed
+    """
+    for ix, source, origin, corners in iter_cell_sources(reader, cells):
+        yield ix, sample_source(source, origin, corners)
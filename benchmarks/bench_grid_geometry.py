@@ -0,0 +1,50 @@
+"""
+Time the grid geometry computed on every mouse move while a grid is drawn,
+dragged or resized, for plate formats up to 1536 wells and larger custom
+grids:
+
+    python benchmarks/bench_grid_geometry.py
+
+Times are the best of several runs, in microseconds per call.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from grid_geometry import grid_points, cell_coordinates, cell_corners
+
+
+GRIDS = [(8, 12), (16, 24), (32, 48), (64, 96), (100, 100), (128, 192)]
+
+
+def best_time(function, repeat: int=5, budget: float=0.05):
+    """Best time of `function` in seconds, looping it for about `budget`
+    seconds per run"""
+    number = max(1, int(budget / max(timeit.timeit(function, number=1),
+                                     1e-7)))
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main():
+    tl, br, angle = (120., 80.), (2300., 1640.), 0.01
+    print('{:>8} {:>14} {:>18} {:>14} {:>12}'.format(
+        'cells', 'grid_points', 'cell_coordinates', 'cell_corners',
+        'ns / cell'))
+    for num_rows, num_cols in GRIDS:
+        grid_pts = grid_points(tl, br, angle, num_rows, num_cols)
+        cells = cell_coordinates(grid_pts, num_rows, num_cols)
+        times = [best_time(lambda: grid_points(tl, br, angle, num_rows,
+                                               num_cols)),
+                 best_time(lambda: cell_coordinates(grid_pts, num_rows,
+                                                    num_cols)),
+                 best_time(lambda: cell_corners(cells))]
+        print('{:>8} {:>12.1f}us {:>16.1f}us {:>12.1f}us {:>12.1f}'.format(
+            num_rows * num_cols, *(t * 1e6 for t in times),
+            sum(times) * 1e9 / (num_rows * num_cols)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+Time opening, showing and cropping an image and laying out a grid on it,
+without a display:
+
+    python benchmarks/bench_suite.py --width 20000 --height 15000 \
+        --bits 16 --compression deflate --output results.json
+
+A synthetic TIFF with the given size, bit depth and compression is written
+to a temporary directory first (see `synthetic_tiff.py`), unless an image is
+given with `--image`. Results are printed as a table and, with `--output`,
+saved as JSON together with the versions and parameters they were measured
+with. With `--baseline`, results are compared to an earlier JSON file and
+the exit status is 1 if an operation got slower than `--tolerance` times
+its baseline.
+
+The preview cache is disabled so that every run decodes the image; the
+operating system file cache is warm after the first run.
+
+`BackgroundImage.rotate_image` is not timed: cells are sampled through an
+affine map by `crop_region`, which replaced rotating the whole image, and
+its time includes what rotating used to cost.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import numpy as np
+from PyQt5.QtCore import QPointF, QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt5.QtWidgets import QApplication
+
+from synthetic_tiff import add_image_arguments, write_synthetic_tiff
+
+
+def measure(function, *, setup=None, teardown=None, repeat: int=5):
+    """
+    Time `function(state)`, where `state` is returned by `setup()` before
+    each run and passed to `teardown(state)` after it. Neither is timed.
+
+    Returns
+    -------
+    List of `repeat` run times in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(state)
+        times.append(time.perf_counter() - start)
+        if teardown is not None:
+            teardown(state)
+    return times
+
+
+def summary(name: str, times: list, **info):
+    """Result entry of operation `name` run `times`"""
+    return dict(name=name,
+                runs=len(times),
+                best_s=min(times),
+                median_s=statistics.median(times),
+                mean_s=statistics.mean(times),
+                **info)
+
+
+def run_suite(image: str, *,
+              rows: int=8,
+              cols: int=12,
+              angle: float=.05,
+              repeat: int=5,
+              work_dir: str):
+    """
+    Run every benchmark on `image`.
+
+    Parameters
+    ----------
+    image: str
+        TIFF file
+    rows: int
+        grid rows
+    cols: int
+        grid columns
+    angle: float
+        grid angle in radians
+    repeat: int
+        runs of each benchmark
+    work_dir: str
+        directory receiving cropped cells
+
+    Returns
+    -------
+    List of result entries, see `summary`
+    """
+    from grid_geometry import cell_corners
+    from grid_window import GridWindow
+    from my_image import BackgroundImage
+    from preview_cache import PreviewCache
+
+    window = GridWindow()
+    view = window.view
+
+    def new_image():
+        bg_image = BackgroundImage()
+        bg_image.preview_cache = PreviewCache(max_bytes=0)
+        return bg_image
+
+    def opened_image():
+        bg_image = new_image()
+        bg_image.image_from_file(image)
+        return bg_image
+
+    def close(bg_image):
+        bg_image.reader.close()
+
+    results = [
+        summary('BackgroundImage.image_from_file', measure(
+            lambda bg_image: bg_image.image_from_file(image),
+            setup=new_image, teardown=close, repeat=repeat)),
+        summary('BackgroundImage.show_in_scene', measure(
+            lambda bg_image: bg_image.show_in_scene(view),
+            setup=opened_image, teardown=close, repeat=repeat))]
+    bg_image = opened_image()
+    bg_image.show_in_scene(view)
+
+    """Grid over the image shown, as drawn with the mouse"""
+    grid = view.current_grid
+    grid.num_rows, grid.num_cols = rows, cols
+    grid.init_grid_graphics()
+    grid.add_grid_to_scene()
+    width = bg_image.reader.width * bg_image.scaling_factor
+    height = bg_image.reader.height * bg_image.scaling_factor
+    tl = (.05 * width, .05 * height)
+    br = (.9 * width, .9 * height)
+    grid.tl_br_qpointf = [QPointF(*tl), QPointF(*br)]
+    grid.draw_grid(*tl, *br, angle)
+    cells = dict(cells=rows * cols)
+    results.append(summary('AdjustableGrid.generate_grid_pts', measure(
+        lambda _: grid.generate_grid_pts(*tl, *br, angle),
+        repeat=repeat), **cells))
+    grid_pts = grid.generate_grid_pts(*tl, *br, angle)
+    results.append(summary('AdjustableGrid.set_image_coordinates', measure(
+        lambda _: grid.set_image_coordinates(grid_pts),
+        repeat=repeat), **cells))
+    """Alternate between two sizes, as while resizing, so that the grid is
+    laid out again on every call"""
+    corners = itertools.cycle([(br[0] - 1, br[1] - 1), br])
+    results.append(summary('AdjustableGrid.draw_grid', measure(
+        lambda _: grid.draw_grid(*tl, *next(corners), angle),
+        repeat=repeat), **cells))
+
+    """Crop the middle cell of the rotated grid. This also covers the
+    rotation, done per cell since `rotate_image` was removed."""
+    grid.set_image_coordinates(grid_pts)
+    (cell_tl, cell_bl), (cell_tr, cell_br) = \
+        grid.image_coordinates[len(grid.image_coordinates) // 2]
+    coords = [QPointF(*point) for point in (cell_tl, cell_bl, cell_br,
+                                            cell_tr)]
+    cell_size = np.ptp(cell_corners(grid.image_coordinates[:1])[0], axis=0) \
+        / bg_image.scaling_factor
+    output = os.path.join(work_dir, 'cell')
+    results.append(summary('BackgroundImage.crop_region', measure(
+        lambda _: bg_image.crop_region(coords, angle, output),
+        repeat=repeat), cell_pixels=int(np.prod(cell_size))))
+    bg_image.reader.close()
+    window.close()
+    return results
+
+
+def environment():
+    """Versions and machine the results were measured with"""
+    return dict(python=platform.python_version(),
+                numpy=np.__version__,
+                qt=QT_VERSION_STR,
+                pyqt=PYQT_VERSION_STR,
+                platform=platform.platform(),
+                processor=platform.processor() or platform.machine(),
+                cpus=os.cpu_count())
+
+
+def compare(results: list, baseline: dict, tolerance: float):
+    """
+    Print the ratio of each best time to the one of `baseline`.
+    Return the names of the operations slower than `tolerance` times their
+    baseline.
+    """
+    before = {entry['name']: entry['best_s'] for entry in baseline['results']}
+    slower = []
+    for entry in results:
+        if entry['name'] not in before:
+            continue
+        ratio = entry['best_s'] / before[entry['name']]
+        print('{:<40} {:>8.2f}x baseline'.format(entry['name'], ratio))
+        if ratio > tolerance:
+            slower.append(entry['name'])
+    return slower
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark image and grid operations headless.')
+    parser.add_argument('--image',
+                        help='TIFF image to use instead of a synthetic one')
+    add_image_arguments(parser)
+    parser.add_argument('--rows', type=int, default=8,
+                        help='grid rows (default: 8)')
+    parser.add_argument('--cols', type=int, default=12,
+                        help='grid columns (default: 12)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs of each benchmark (default: 5)')
+    parser.add_argument('-o', '--output', help='JSON file of the results')
+    parser.add_argument('--baseline',
+                        help='JSON file of earlier results to compare to')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='slowdown over the baseline counted as a '
+                             'regression (default: 1.25)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Command-line entry point. Return the exit status."""
+    args = parse_args(argv)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    work_dir = tempfile.mkdtemp(prefix='alit_bench_')
+    try:
+        if args.image is None:
+            image = write_synthetic_tiff(
+                os.path.join(work_dir, 'synthetic'), args.width, args.height,
+                bits=args.bits, samples=args.samples,
+                compression=args.compression, seed=args.seed)
+            parameters = dict(width=args.width, height=args.height,
+                              bits=args.bits, samples=args.samples,
+                              compression=args.compression, seed=args.seed)
+        else:
+            image = args.image
+            parameters = dict(image=os.path.abspath(image))
+        parameters.update(rows=args.rows, cols=args.cols,
+                          repeat=args.repeat,
+                          file_bytes=os.path.getsize(image))
+        results = run_suite(image, rows=args.rows, cols=args.cols,
+                            repeat=args.repeat, work_dir=work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print('{:<40} {:>12} {:>12}'.format('operation', 'best ms', 'median ms'))
+    for entry in results:
+        print('{:<40} {:>12.3f} {:>12.3f}'.format(
+            entry['name'], entry['best_s'] * 1e3, entry['median_s'] * 1e3))
+    report = dict(created=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  environment=environment(),
+                  parameters=parameters,
+                  results=results)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['parameters'] != parameters:
+            print('Baseline measured with other parameters:',
+                  baseline['parameters'])
+        slower = compare(results, baseline, args.tolerance)
+        if slower:
+            print('Slower than baseline:', ', '.join(slower))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
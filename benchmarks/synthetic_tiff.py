@@ -0,0 +1,131 @@
+"""
+Write synthetic TIFF images of any size, bit depth and compression, so that
+benchmarks do not depend on lab images:
+
+    python benchmarks/synthetic_tiff.py plate.tif --width 20000 \
+        --height 15000 --bits 16 --compression deflate
+
+Images are smooth gradients with a regular pattern of bright disks (a
+plate of wells) and seeded noise, so that they compress about as well as
+microscopy scans and the same arguments always give the same file.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from tiff_writer import TiffWriter, COMPRESSIONS
+
+
+DTYPES = {8: np.uint8, 16: np.uint16}
+
+
+def synthetic_image(width: int, height: int, *,
+                    bits: int=8,
+                    samples: int=1,
+                    wells: tuple=(8, 12),
+                    seed: int=0,
+                    band_rows: int=1024):
+    """
+    Return a synthetic image.
+
+    Parameters
+    ----------
+    width: int
+        image width in pixels
+    height: int
+        image height in pixels
+    bits: int
+        bits per sample, 8 or 16
+    samples: int
+        samples per pixel: 1 (gray), 3 (RGB) or 4 (RGBA)
+    wells: tuple
+        rows and columns of the disk pattern
+    seed: int
+        seed of the noise
+    band_rows: int
+        rows computed at a time, bounding the temporary memory
+
+    Returns
+    -------
+    Array of shape (height, width) or (height, width, samples)
+    """
+    dtype = DTYPES[bits]
+    top = np.iinfo(dtype).max
+    image = np.empty((height, width, samples), dtype)
+    rng = np.random.default_rng(seed)
+    x = np.arange(width) / max(width - 1, 1)
+    well_x = (x * wells[1]) % 1 - .5
+    for y0 in range(0, height, band_rows):
+        y = np.arange(y0, min(y0 + band_rows, height))[:, None] \
+            / max(height - 1, 1)
+        well_y = (y * wells[0]) % 1 - .5
+        disk = (well_x ** 2 + well_y ** 2) < .35 ** 2
+        level = .2 + .3 * x * (1 - y) + .4 * disk
+        for sample in range(samples):
+            noise = rng.normal(0, .02, level.shape)
+            band = np.clip(level * (1 - .15 * sample) + noise, 0, 1)
+            image[y0:y0 + len(y), :, sample] = band * top
+    return image[:, :, 0] if samples == 1 else image
+
+
+def write_synthetic_tiff(path: str, width: int, height: int, *,
+                         bits: int=8,
+                         samples: int=1,
+                         compression: str='none',
+                         seed: int=0):
+    """
+    Write a `synthetic_image` to `path`. Return the path of the file.
+
+    Parameters
+    ----------
+    path: str
+        output path, with or without the .tif extension
+    width, height, bits, samples, seed:
+        see `synthetic_image`
+    compression: str
+        a key of `tiff_writer.COMPRESSIONS`
+    """
+    image = synthetic_image(width, height, bits=bits, samples=samples,
+                            seed=seed)
+    path = os.path.splitext(path)[0]
+    TiffWriter(compression=compression).write(image, path)
+    return path + '.tif'
+
+
+def add_image_arguments(parser):
+    """Add the image size, depth and compression options to `parser`"""
+    parser.add_argument('--width', type=int, default=8000,
+                        help='image width (default: 8000)')
+    parser.add_argument('--height', type=int, default=6000,
+                        help='image height (default: 6000)')
+    parser.add_argument('--bits', type=int, choices=sorted(DTYPES),
+                        default=8, help='bits per sample (default: 8)')
+    parser.add_argument('--samples', type=int, choices=(1, 3, 4),
+                        default=1, help='samples per pixel (default: 1)')
+    parser.add_argument('--compression', choices=sorted(COMPRESSIONS),
+                        default='none',
+                        help='TIFF compression (default: none)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='noise seed (default: 0)')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Write a synthetic TIFF image.')
+    parser.add_argument('output', help='output file')
+    add_image_arguments(parser)
+    args = parser.parse_args(argv)
+    print(write_synthetic_tiff(args.output, args.width, args.height,
+                               bits=args.bits,
+                               samples=args.samples,
+                               compression=args.compression,
+                               seed=args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, \
+    pyqtSlot
+
+from export_engine import export_cells
+from tiff_reader import open_reader
+from tiff_writer import TiffWriter
+
+
+class ExportSignals(QObject):
+    """Signals emitted by an `ExportTask`"""
+    sig_progress = pyqtSignal(int, int)  # cells written, total cells
+    sig_finished = pyqtSignal(int)  # cells written
+    sig_failed = pyqtSignal(str)  # error message
+
+
+class ExportTask(QRunnable):
+    """Run `export_cells` outside the GUI thread and report progress."""
+    def __init__(self, *,
+                 file_name: str,
+                 jobs: list,
+                 writer: TiffWriter,
+                 page: int=0,
+                 workers: int=None,
+                 executor: str=None):
+        super().__init__()
+        self.file_name = file_name
+        self.page = page
+        self.jobs = jobs
+        self.writer = writer
+        self.workers = workers
+        self.executor = executor
+        self.signals = ExportSignals()
+
+    def run(self):
+        """Executed by the thread pool"""
+        total = len(self.jobs)
+        done = 0
+        try:
+            for _ in export_cells(self.file_name, self.jobs,
+                                  save=self.writer.write,
+                                  workers=self.workers,
+                                  executor=self.executor,
+                                  open_reader=open_reader,
+                                  page=self.page):
+                done += 1
+                self.signals.sig_progress.emit(done, total)
+        except Exception as err:
+            self.signals.sig_failed.emit(str(err))
+        else:
+            self.signals.sig_finished.emit(done)
+
+
+class CropExporter(QObject):
+    """
+    Export grid cells to TIFF files on a pool of workers, one export at a
+    time.
+    """
+    sig_progress = pyqtSignal(int, int)  # cells written, total cells
+    sig_finished = pyqtSignal(int)  # cells written
+    sig_failed = pyqtSignal(str)  # error message
+
+    def __init__(self, *,
+                 parent: QObject=None,
+                 writer: TiffWriter=None,
+                 workers: int=None,
+                 executor: str=None):
+        """
+        Parameters
+        ----------
+        parent: QObject
+            Qt parent
+        writer: TiffWriter
+            compression of the exported files.
+            Default: `TiffWriter()`, configured by `settings`.
+        workers: int
+            pool size. Default `settings.EXPORT_WORKERS`.
+        executor: str
+            'thread' or 'process'. Default `settings.EXPORT_EXECUTOR`.
+        """
+        super().__init__(parent)
+        self.writer = TiffWriter() if writer is None else writer
+        self.workers = workers
+        self.executor = executor
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.busy = False
+
+    def export(self, file_name: str, jobs: list, page: int=0):
+        """Start exporting `jobs` (list of `CellJob`) from page `page` of
+        `file_name`"""
+        self.busy = True
+        task = ExportTask(file_name=file_name,
+                          jobs=jobs,
+                          writer=self.writer,
+                          page=page,
+                          workers=self.workers,
+                          executor=self.executor)
+        task.signals.sig_progress.connect(self.sig_progress)
+        task.signals.sig_finished.connect(self._on_finished)
+        task.signals.sig_failed.connect(self._on_failed)
+        self.pool.start(task)
+
+    @pyqtSlot(int)
+    def _on_finished(self, done):
+        self.busy = False
+        self.sig_finished.emit(done)
+
+    @pyqtSlot(str)
+    def _on_failed(self, error):
+        self.busy = False
+        self.sig_failed.emit(error)
@@ -0,0 +1,186 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, \
+    as_completed
+
+import settings
+from affine_crop import crop_cell, iter_cell_sources, sample_source
+from memory_budget import budget, CELLS
+from tiff_reader import TiffReader
+from tiff_writer import TiffWriter, EncodeQueue
+
+
+class CellJob:
+    """A grid cell to export: corners `[tl, bl, br, tr]` in full-resolution
+    pixels and output path without extension."""
+    __slots__ = ('corners', 'path')
+
+    def __init__(self, corners, path: str):
+        self.corners = corners
+        self.path = path
+
+
+"""Readers opened by the current process, shared by its threads"""
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def _get_reader(file_name: str, page: int, open_reader):
+    with _readers_lock:
+        key = (file_name, page, open_reader)
+        if key not in _readers:
+            _readers[key] = open_reader(file_name, page)
+        return _readers[key]
+
+
+def _release_readers():
+    with _readers_lock:
+        for reader in _readers.values():
+            reader.close()
+        _readers.clear()
+
+
+def export_cell(file_name: str, job: CellJob, save, open_reader=TiffReader,
+                page: int=0):
+    """
+    Crop one cell of page `page` of `file_name` and write it with
+    `save(array, path)`. Runs in pool workers, so every argument must be
+    picklable.
+
+    Returns
+    -------
+    Output path of the cell
+    """
+    reader = _get_reader(file_name, page, open_reader)
+    cell = crop_cell(reader, job.corners)
+    """Counted in this process only: the budget of the caller does not see
+    process pool workers"""
+    account = budget.account(CELLS)
+    account.add(cell.nbytes)
+    try:
+        save(cell, job.path)
+    finally:
+        account.close()
+    return job.path
+
+
+def num_workers(workers: int=None):
+    """Worker count: `workers`, `settings.EXPORT_WORKERS`, or one per
+    core."""
+    workers = settings.EXPORT_WORKERS if workers is None else workers
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def export_cells(file_name: str, jobs, *,
+                 save=None,
+                 workers: int=None,
+                 executor: str=None,
+                 mode: str=None,
+                 open_reader=TiffReader,
+                 page: int=0):
+    """
+    Crop and save `jobs` (a list of `CellJob`) from `file_name`, spreading
+    cells over a pool of workers.
+
+    In 'cell' mode every worker reads the pixels of its own cells. In
+    'batch' mode the image is read once, top to bottom, by the calling
+    thread (see `affine_crop.iter_cell_sources`) and completed cells go to
+    a bounded `EncodeQueue` whose threads interpolate, encode and write
+    them while the walk goes on. Batch mode decodes each strip or tile
+    once per export and always uses threads.
+
+    Parameters
+    ----------
+    file_name: str
+        source image
+    jobs: list
+        cells to export
+    save: callable
+        `save(array, path)` writes one cell.
+        Default: `TiffWriter().write`, configured by `settings`.
+    workers: int
+        pool size. Default `settings.EXPORT_WORKERS`.
+    executor: str
+        'thread' or 'process'. Default `settings.EXPORT_EXECUTOR`.
+    mode: str
+        'batch' or 'cell'. Default `settings.EXPORT_MODE`.
+    open_reader: callable
+        `open_reader(file_name, page)` returns an `ImageReader`
+    page: int
+        page of a multi-page file to crop
+
+    Returns
+    -------
+    Generator yielding output paths as cells are written. The peak memory
+    held is recorded in `budget.peaks['crop']`, except with process
+    workers, whose buffers are not accounted.
+    """
+    mode = settings.EXPORT_MODE if mode is None else mode
+    executor = settings.EXPORT_EXECUTOR if executor is None else executor
+    if mode == 'cell' and executor == 'process':
+        budget.peaks.pop('crop', None)
+        yield from _export_cells(file_name, jobs, save, workers, executor,
+                                 mode, open_reader, page)
+        return
+    with budget.operation('crop'):
+        yield from _export_cells(file_name, jobs, save, workers, executor,
+                                 mode, open_reader, page)
+
+
+def _export_cells(file_name: str, jobs, save, workers, executor, mode,
+                  open_reader, page):
+    """Body of `export_cells`"""
+    save = TiffWriter().write if save is None else save
+    if mode == 'batch':
+        yield from _export_batch(file_name, jobs, save, workers, open_reader,
+                                 page)
+        return
+    elif mode != 'cell':
+        raise ValueError('Unknown export mode ' + str(mode))
+    if executor == 'process':
+        """Spawn: forking a process running Qt threads is unsafe"""
+        pool = ProcessPoolExecutor(
+            max_workers=num_workers(workers),
+            mp_context=multiprocessing.get_context('spawn'))
+    elif executor == 'thread':
+        pool = ThreadPoolExecutor(max_workers=num_workers(workers))
+    else:
+        raise ValueError('Unknown executor ' + str(executor))
+    try:
+        futures = [pool.submit(export_cell, file_name, job, save, open_reader,
+                               page)
+                   for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if executor == 'thread':
+            _release_readers()
+
+
+def _sample_and_save(save, source, origin, corners, path: str, account):
+    try:
+        save(sample_source(source, origin, corners), path)
+    finally:
+        account.remove(source.nbytes)
+    return path
+
+
+def _export_batch(file_name: str, jobs, save, workers, open_reader, page):
+    """Batch mode of `export_cells`"""
+    reader = open_reader(file_name, page)
+    encoder = EncodeQueue(workers=num_workers(workers))
+    account = budget.account(CELLS)
+    try:
+        for ix, source, origin, corners in iter_cell_sources(
+                reader, [job.corners for job in jobs]):
+            account.add(source.nbytes)
+            encoder.submit(_sample_and_save, save, source, origin, corners,
+                           jobs[ix].path, account)
+            yield from encoder.completed()
+        yield from encoder.join()
+    finally:
+        encoder.close()
+        account.close()
+        reader.close()
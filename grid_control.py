@@ -6,7 +6,11 @@ from PyQt5.QtCore import Qt, pyqtSlot, pyqtSignal, QPointF, QRectF
 from PyQt5.QtGui import QMouseEvent, QPixmap, QIcon, QPolygonF, QPolygon
 from PyQt5.QtWidgets import QPushButton, QCheckBox, \
     QWidget, QSpinBox, QGridLayout, QLabel, QGroupBox, \
-    QListWidget, QAbstractItemView, QListWidgetItem
+    QListWidget, QAbstractItemView, QListWidgetItem, QProgressBar, \
+    QFileDialog
+
+from grid_geometry import cell_label
+from grid_template import GridTemplate, save_templates, load_templates
 
 
 class GridListWidgetItem(QListWidgetItem):
@@ -37,8 +41,8 @@ class GridControl(QGroupBox):
     """
     """Signals"""
     sig_place_grid = pyqtSignal()
-    sig_crop_region = pyqtSignal(list, float, str)
-    sig_generate_rotated_image = pyqtSignal(float)
+    """Cell coordinates (scene) of the grid to crop and output paths"""
+    sig_crop_grid = pyqtSignal(np.ndarray, list)
 
     def __init__(self, parent, title, num_rows, num_cols):
         super().__init__(parent=parent, title=title)
@@ -50,18 +54,23 @@ class GridControl(QGroupBox):
         self.row_label = QLabel('Rows: ', parent=self)
         self.col_spinbox = QSpinBox(parent=self,
                                        value=num_cols,
-                                       maximum=26,
+                                       maximum=999,
                                        minimum=1
                                     )
         self.row_spinbox = QSpinBox(parent=self,
                                        value=num_rows,
-                                       maximum=40,
+                                       maximum=999,
                                        minimum=1
                                     )
         self.btn_like_grid = QPushButton('I like this grid!', parent=self)
         self.grid_list = QListWidget(parent=self)
         self.btn_crop_grid = QPushButton('Crop', parent=self)
         self.btn_del_grid = QPushButton('Delete', parent=self)
+        self.crop_progress = QProgressBar(parent=self)
+        self.btn_save_template = QPushButton('Save template', parent=self)
+        self.btn_load_template = QPushButton('Load template', parent=self)
+        self.selected_grid = None  # grid of the selected list item
+        self.grid_items = {}  # placed grid -> GridListWidgetItem
 
         self.parent = self.parentWidget()
 
@@ -82,9 +91,12 @@ class GridControl(QGroupBox):
         self.layout.addWidget(self.grid_list, 4, 0, 1, 2)
         self.layout.addWidget(self.btn_crop_grid, 5, 0)
         self.layout.addWidget(self.btn_del_grid, 5, 1)
+        self.layout.addWidget(self.crop_progress, 6, 0, 1, 2)
+        self.layout.addWidget(self.btn_save_template, 7, 0, 1, 2)
+        self.layout.addWidget(self.btn_load_template, 8, 0, 1, 2)
         self.setLayout(self.layout)
-        self.setGeometry(0, 0, 150, 400)
-        self.move(520, 90)
+        self.setGeometry(0, 0, 210, 400)
+        self.move(520, 130)
         """Checkbox"""
         self.label_checkbox.resize(self.label_checkbox.sizeHint())
         self.label_checkbox.setCheckState(Qt.Unchecked)
@@ -106,35 +118,43 @@ class GridControl(QGroupBox):
         self.btn_crop_grid.clicked.connect(self.crop_grid_button_clicked)
         self.btn_del_grid.setEnabled(False)
         self.btn_del_grid.clicked.connect(self.del_grid_button_clicked)
+        """Crop progress"""
+        self.crop_progress.setTextVisible(True)
+        self.crop_progress.hide()
+        """Template buttons"""
+        self.btn_save_template.setToolTip(
+            'Save the placed grids, in image pixels')
+        self.btn_save_template.setEnabled(False)
+        self.btn_save_template.clicked.connect(
+            self.save_template_button_clicked)
+        self.btn_load_template.setToolTip(
+            'Place the grids of a template on the image')
+        self.btn_load_template.clicked.connect(
+            self.load_template_button_clicked)
 
     def configure_signals(self):
         self.sig_place_grid.connect(self.parent.place_grid)
-        self.sig_generate_rotated_image.connect(
-            self.parent.rotate_image)
 
     @pyqtSlot()
     def change_selected_grid(self):
         """
         Call when selected grid in `GridList` changes.
         `Crop` and `Del` are enabled, and selected grid
-        changes def_color.
+        changes def_color. Only the previously and the newly selected grids
+        are repainted.
 
         Returns
         -------
 
         """
-        grid_list = []
-        for i in range(self.grid_list.count()):
-            grid_list.append(self.grid_list.item(i))
-
         grid_list_selected = self.grid_list.selectedItems()
+        grid = grid_list_selected[0].grid if grid_list_selected else None
 
-        for grid_item in grid_list:
-            grid_item.grid.set_color_and_thickness(color=Qt.blue)
-
-        for grid_item in grid_list_selected:
-            grid_item.grid.set_color_and_thickness(color=Qt.red,
-                                                   thickness=3.)
+        if self.selected_grid is not None and self.selected_grid is not grid:
+            self.selected_grid.set_selected(False)
+        if grid is not None:
+            grid.set_selected(True)
+        self.selected_grid = grid
 
         if len(grid_list_selected) > 0:
             self.btn_crop_grid.setEnabled(True)
@@ -143,6 +163,12 @@ class GridControl(QGroupBox):
             self.btn_crop_grid.setEnabled(False)
             self.btn_del_grid.setEnabled(False)
 
+    def select_grid(self, grid):
+        """Select the list item of placed grid `grid`"""
+        item = self.grid_items.get(grid)
+        if item is not None:
+            self.grid_list.setCurrentItem(item)
+
     @pyqtSlot()
     def change_grid_name(self):
         item = self.grid_list.selectedItems()[0]
@@ -152,8 +178,8 @@ class GridControl(QGroupBox):
     def crop_grid_button_clicked(self):
         """
         Crop images using the selected grid in `GridList`.
-        For each grid square, emit signal `sig_crop_region`,
-        passing `QRectF` scaled coordinates of region to crop.
+        Emit `sig_crop_grid` with the cell coordinates of the grid and the
+        output path of each cell; cells are exported in the background.
 
         Returns
         -------
@@ -164,40 +190,35 @@ class GridControl(QGroupBox):
         grid_item = self.grid_list.selectedItems()[0]
         image_coordinates = grid_item.grid.image_coordinates
         num_rows = grid_item.grid.num_rows
-        num_cols = grid_item.grid.num_cols
-        angle = grid_item.grid.phi
-        alphabet = string.ascii_uppercase
 
         """Create directory and crop images"""
-        directory = grid_item.text()
+        directory = self.parent.output_directory(grid_item.text())
         if not os.path.exists(directory):
             os.makedirs(directory)
-            """generate counter-rotated_image for cropping"""
-            self.sig_generate_rotated_image.emit(-angle)
-
-            """Crop images"""
-            for ix, image_coordinate in enumerate(image_coordinates):
-                """Get bg_image coordinate"""
-                tl_x, tl_y = image_coordinate[0, 0]
-                tl = QPointF(tl_x, tl_y)  # top left
-                bl_x, bl_y = image_coordinate[0, 1]
-                bl = QPointF(bl_x, bl_y)  # top right
-                tr_x, tr_y = image_coordinate[1, 0]
-                tr = QPointF(tr_x, tr_y)  # bottom left
-                br_x, br_y = image_coordinate[1, 1]
-                br = QPointF(br_x, br_y)  # bottom right
-                """Find polygon to be cropped"""
-                coords = [tl, bl, br, tr]
-                # pol = QPolygonF(coords)
-                """Determine file name"""
-                col = (ix // num_rows)
-                row = (ix % num_rows) + 1
-                file_name = str(alphabet[col]) + str(row)
-                full_path = os.path.join(directory, file_name)
-                self.sig_crop_region.emit(coords, angle, full_path)
+
+            """Determine file names"""
+            paths = [os.path.join(directory, cell_label(ix, num_rows))
+                     for ix in range(len(image_coordinates))]
+            self.btn_crop_grid.setEnabled(False)
+            self.crop_progress.setRange(0, len(paths))
+            self.crop_progress.setValue(0)
+            self.crop_progress.show()
+            self.sig_crop_grid.emit(image_coordinates, paths)
         else:
             print('Can\'t crop bg_image: folder already exist')
 
+    @pyqtSlot(int, int)
+    def set_crop_progress(self, done: int, total: int):
+        """Show the number of cells exported so far"""
+        self.crop_progress.setValue(done)
+
+    @pyqtSlot()
+    def crop_done(self):
+        """Hide progress and allow a new crop"""
+        self.crop_progress.hide()
+        self.btn_crop_grid.setEnabled(
+            len(self.grid_list.selectedItems()) > 0)
+
     @pyqtSlot()
     def del_grid_button_clicked(self):
         """
@@ -213,9 +234,11 @@ class GridControl(QGroupBox):
         """Remove from GridList"""
         item_ix = self.grid_list.row(grid_item)
         self.grid_list.takeItem(item_ix)
+        del self.grid_items[grid_item.grid]
 
         """Remove from scene"""
         grid_item.grid.clear_grid()
+        self.btn_save_template.setEnabled(self.grid_list.count() > 0)
 
     @pyqtSlot()
     def like_grid_button_clicked(self):
@@ -230,14 +253,75 @@ class GridControl(QGroupBox):
         self.btn_like_grid.setEnabled(False)
 
         """Add grid to placed grid widget"""
-        item = GridListWidgetItem(parent=self.grid_list)
-        item.set_grid(self.parent.view.current_grid)
+        self.add_grid_item(self.parent.view.current_grid)
         # TODO ItemIsEditable does not work
         # item.setFlags(Qt.ItemIsEditable)
         # item.setFlags(Qt.ItemIsSelectable)
 
         self.sig_place_grid.emit()
 
+    def add_grid_item(self, grid, name: str=''):
+        """Add `grid` to `grid_list`, named `name` if given"""
+        item = GridListWidgetItem(parent=self.grid_list)
+        item.set_grid(grid)
+        self.grid_items[grid] = item
+        if name:
+            item.setText(name)
+        self.btn_save_template.setEnabled(True)
+
+    @pyqtSlot()
+    def save_template_button_clicked(self):
+        """
+        Save the grids in `grid_list` to a template file, in image pixels.
+
+        Returns
+        -------
+
+        """
+        scaling_factor = self.parent.bg_image.scaling_factor
+        if scaling_factor is None:
+            print('No bg_image loaded')
+            return
+        [file_name, _] = QFileDialog.getSaveFileName(
+            self, 'Save grid template', '', 'Grid templates (*.json)',
+            options=QFileDialog.DontUseNativeDialog)
+        if file_name == '':
+            return
+        if not file_name.endswith('.json'):
+            file_name += '.json'
+        items = [self.grid_list.item(ix)
+                 for ix in range(self.grid_list.count())]
+        templates = [GridTemplate.from_grid(item.grid, scaling_factor,
+                                            name=item.text())
+                     for item in items]
+        reader = self.parent.bg_image.reader
+        try:
+            save_templates(file_name, templates,
+                           image_size=(reader.width, reader.height))
+        except OSError as err:
+            print('Can\'t save template:', err)
+
+    @pyqtSlot()
+    def load_template_button_clicked(self):
+        """
+        Place the grids of a template file on the current image.
+
+        Returns
+        -------
+
+        """
+        [file_name, _] = QFileDialog.getOpenFileName(
+            self, 'Load grid template', '', 'Grid templates (*.json)',
+            options=QFileDialog.DontUseNativeDialog)
+        if file_name == '':
+            return
+        try:
+            templates, _ = load_templates(file_name)
+        except (OSError, ValueError) as err:
+            print('Can\'t load template:', err)
+        else:
+            self.parent.apply_templates(templates)
+
     @pyqtSlot()
     def label_checkbox_checked(self):
         """
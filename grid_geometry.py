@@ -0,0 +1,135 @@
+"""
+Grid geometry shared by `AdjustableGrid` and the command-line tiler. Free
+of Qt so that grids can be computed on machines without a display.
+"""
+import string
+import numpy as np
+
+
+def grid_points(tl, br, angle: float, num_rows: int, num_cols: int):
+    """
+    Return grid point coordinates of a grid with top left corner `tl` and
+    bottom right corner `br`, whose top edge forms a clockwise angle
+    `angle` (radians) with the x-axis, as `AdjustableGrid.phi`.
+    Refer to the attached PDF for the notation used in the code.
+
+    Parameters
+    ----------
+    tl: tuple
+        (x, y) coordinates of top left corner
+    br: tuple
+        (x, y) coordinates of bottom right corner
+    angle: float
+        phi angle
+    num_rows: int
+        grid rows
+    num_cols: int
+        grid cols
+
+    Returns
+    -------
+    Array of shape (cols+1, rows+1, 2), read as (n-th, m-th, (x, y))
+    """
+    tl_x, tl_y = tl
+    br_x, br_y = br
+
+    """Compute angles and edge lengths"""
+    tl_br_length = np.hypot(br_x - tl_x, br_y - tl_y)
+    tl_br_angle_rad = np.arctan2(br_y - tl_y, br_x - tl_x)  # CW, y down
+    theta = tl_br_angle_rad - angle
+    cos_angle = np.cos(angle)
+    sin_angle = np.sin(angle)
+    l1 = tl_br_length * np.cos(theta)
+    l2 = tl_br_length * np.sin(theta)
+
+    """Generate grid points as outer sums of the column steps (along the
+    top edge) and the row steps (along the left edge)"""
+    n = np.arange(num_cols + 1)[:, np.newaxis] / num_cols
+    m = np.arange(num_rows + 1)[np.newaxis, :] / num_rows
+    grid_pts = np.empty((num_cols + 1, num_rows + 1, 2))
+    grid_pts[..., 0] = n * (l1 * cos_angle) - m * (l2 * sin_angle) + tl_x
+    grid_pts[..., 1] = n * (l1 * sin_angle) + m * (l2 * cos_angle) + tl_y
+    return grid_pts
+
+
+def cell_quads(grid_pts: np.ndarray):
+    """
+    Read-only view of grid points `grid_pts`, shape (cols+1, rows+1, 2),
+    as cells: element `[n, m]` is the cell in column `n` and row `m`,
+    `[[tl, bl], [tr, br]]`. No point is copied, neighbouring cells share
+    the memory of their common corners.
+
+    Returns
+    -------
+    Array of shape (cols, rows, 2, 2, 2)
+    """
+    grid_pts = np.ascontiguousarray(grid_pts)
+    cols, rows = grid_pts.shape[0] - 1, grid_pts.shape[1] - 1
+    col_stride, row_stride, xy_stride = grid_pts.strides
+    return np.lib.stride_tricks.as_strided(
+        grid_pts,
+        shape=(cols, rows, 2, 2, 2),
+        strides=(col_stride, row_stride, col_stride, row_stride, xy_stride),
+        writeable=False)
+
+
+def cell_coordinates(grid_pts: np.ndarray, num_rows: int, num_cols: int):
+    """
+    Split grid points `grid_pts`, as returned by `grid_points`, into grid
+    cells. Each cell has coordinates in the form
+    `[[tl_x, tl_y], [bl_x, bl_y]], [[tr_x, tr_y], [br_x, br_y]]`. Cells are
+    ordered as in `cell_order_example.png` (fig. assumes phi = 0).
+
+    Parameters
+    ----------
+    grid_pts: NumPy Array
+        grid points, shape (cols+1, rows+1, 2)
+    num_rows: int
+        grid rows
+    num_cols: int
+        grid cols
+
+    Returns
+    -------
+    Array of shape (rows * cols, 2, 2, 2)
+    """
+    assert grid_pts.shape == (num_cols + 1, num_rows + 1, 2)
+    """Copy the cells out of the shared-corner view, in column order"""
+    cells = np.empty((num_cols, num_rows, 2, 2, 2))
+    np.copyto(cells, cell_quads(grid_pts))
+    return cells.reshape(num_rows * num_cols, 2, 2, 2)
+
+
+def cell_corners(image_coordinates: np.ndarray):
+    """
+    Convert cells as returned by `cell_coordinates` to corner lists.
+
+    Returns
+    -------
+    Array of shape (cells, 4, 2) with corners in `[tl, bl, br, tr]` order
+    """
+    return image_coordinates[:, (0, 0, 1, 1), (0, 1, 1, 0)]
+
+
+def column_label(index: int):
+    """
+    Letters of the `index`-th grid column (from 0), as spreadsheet
+    columns: A, ..., Z, AA, AB, ..., AZ, BA, ...
+    """
+    letters = ''
+    index += 1
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = string.ascii_uppercase[remainder] + letters
+    return letters
+
+
+def cell_label(index: int, num_rows: int):
+    """
+    Well label of the `index`-th cell of a grid with `num_rows` rows, in
+    the order of `cell_coordinates`: letters number columns and numerals
+    number rows (A1, A2, ..., B1, ...). Columns past Z are AA, AB, ...
+    """
+    col = index // num_rows
+    row = index % num_rows + 1
+    return column_label(col) + str(row)
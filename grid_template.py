@@ -0,0 +1,209 @@
+"""
+Grid templates: grid layouts saved in full-resolution image pixels, so that
+the grids drawn on one image can be applied to other images of the same
+plate layout, in the GUI or by `tile_cli.py`.
+
+A template file is JSON:
+
+    {"format": "alit-grid-template", "version": 1,
+     "image_size": [width, height],
+     "grids": [{"name": "Grid  (8x12)", "tl": [x, y], "br": [x, y],
+                "phi": 0.01, "sign_x": 1, "sign_y": 1,
+                "num_rows": 8, "num_cols": 12}]}
+"""
+import json
+import os
+
+from export_engine import CellJob
+from grid_geometry import grid_points, cell_coordinates, cell_corners, \
+    cell_label
+
+
+FORMAT = 'alit-grid-template'
+VERSION = 1
+"""Keys every grid of a template file must have"""
+REQUIRED_KEYS = ('tl', 'br', 'num_rows', 'num_cols')
+
+
+class GridTemplate:
+    """Layout of one grid, with corners in full-resolution image pixels."""
+    def __init__(self, *,
+                 tl,
+                 br,
+                 phi: float=0.,
+                 num_rows: int=1,
+                 num_cols: int=1,
+                 sign_x: int=1,
+                 sign_y: int=1,
+                 name: str=''):
+        """
+        Parameters
+        ----------
+        tl: tuple
+            (x, y) top left corner, as the first point of
+            `AdjustableGrid.tl_br_qpointf`
+        br: tuple
+            (x, y) bottom right corner
+        phi: float
+            CW angle between top edge and x-axis (rads), as
+            `AdjustableGrid.phi`
+        num_rows: int
+            grid rows
+        num_cols: int
+            grid cols
+        sign_x: int
+            -1 if the grid was drawn right to left
+        sign_y: int
+            -1 if the grid was drawn bottom to top
+        name: str
+            grid name, used as output directory
+        """
+        self.tl = (float(tl[0]), float(tl[1]))
+        self.br = (float(br[0]), float(br[1]))
+        self.phi = float(phi)
+        self.num_rows = int(num_rows)
+        self.num_cols = int(num_cols)
+        self.sign_x = int(sign_x)
+        self.sign_y = int(sign_y)
+        self.name = name
+
+    @classmethod
+    def from_grid(cls, grid, scaling_factor: float, name: str=''):
+        """
+        Template of `grid`, an `AdjustableGrid` drawn on an image shown with
+        `scaling_factor` (see `BackgroundImage.scaling_factor`).
+        """
+        tl, br = grid.tl_br_qpointf
+        return cls(tl=(tl.x() / scaling_factor, tl.y() / scaling_factor),
+                   br=(br.x() / scaling_factor, br.y() / scaling_factor),
+                   phi=grid.phi,
+                   num_rows=grid.num_rows,
+                   num_cols=grid.num_cols,
+                   sign_x=grid.sign_x,
+                   sign_y=grid.sign_y,
+                   name=name)
+
+    def scene_corners(self, scaling_factor: float):
+        """Top left and bottom right corners scaled by `scaling_factor`,
+        as `((tl_x, tl_y), (br_x, br_y))`"""
+        return ((self.tl[0] * scaling_factor, self.tl[1] * scaling_factor),
+                (self.br[0] * scaling_factor, self.br[1] * scaling_factor))
+
+    def cell_corners(self):
+        """`[tl, bl, br, tr]` corners of every cell in image pixels, shape
+        (cells, 4, 2), in `grid_geometry.cell_coordinates` order"""
+        grid_pts = grid_points(self.tl, self.br, self.phi, self.num_rows,
+                               self.num_cols)
+        return cell_corners(
+            cell_coordinates(grid_pts, self.num_rows, self.num_cols))
+
+    def jobs(self, directory: str):
+        """Export jobs writing the cells to `directory`/A1.tif, ..."""
+        return [CellJob(cell,
+                        os.path.join(directory, cell_label(ix, self.num_rows)))
+                for ix, cell in enumerate(self.cell_corners())]
+
+    def to_dict(self):
+        return {'name': self.name,
+                'tl': list(self.tl),
+                'br': list(self.br),
+                'phi': self.phi,
+                'sign_x': self.sign_x,
+                'sign_y': self.sign_y,
+                'num_rows': self.num_rows,
+                'num_cols': self.num_cols}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """
+        Template of a grid read from a template file.
+
+        Raises
+        ------
+        ValueError
+            if a key of `REQUIRED_KEYS` is missing or a value is not valid
+        """
+        if not isinstance(data, dict):
+            raise ValueError('Grid is not a JSON object: {!r}'.format(data))
+        name = data.get('name', '')
+        missing = [key for key in REQUIRED_KEYS if key not in data]
+        if missing:
+            raise ValueError('Grid {!r} has no {}'.format(
+                name, ', '.join(missing)))
+        for key in ('tl', 'br'):
+            if not isinstance(data[key], list) or len(data[key]) != 2:
+                raise ValueError('Grid {!r}: {} is not an (x, y) '
+                                 'point'.format(name, key))
+        try:
+            template = cls(**{key: data[key] for key in
+                              ('tl', 'br', 'phi', 'num_rows', 'num_cols',
+                               'sign_x', 'sign_y', 'name') if key in data})
+        except (TypeError, ValueError) as err:
+            raise ValueError('Grid {!r}: {}'.format(name, err)) from err
+        if not isinstance(template.name, str):
+            raise ValueError('Grid name {!r} is not a string'.format(name))
+        if template.num_rows <= 0 or template.num_cols <= 0:
+            raise ValueError('Grid {!r} must have at least one row and one '
+                             'column'.format(name))
+        return template
+
+
+def save_templates(file_name: str, templates, image_size=None):
+    """
+    Write `templates` (list of `GridTemplate`) to the JSON file
+    `file_name`.
+
+    Parameters
+    ----------
+    file_name: str
+        output file
+    templates: list
+        grids of the plate
+    image_size: tuple
+        (width, height) of the image the grids were drawn on, if known
+
+    Returns
+    -------
+
+    """
+    data = {'format': FORMAT,
+            'version': VERSION,
+            'image_size': None if image_size is None else list(image_size),
+            'grids': [template.to_dict() for template in templates]}
+    with open(file_name, 'w') as file:
+        json.dump(data, file)
+
+
+def load_templates(file_name: str):
+    """
+    Read a template file written by `save_templates`.
+
+    Returns
+    -------
+    `(templates, image_size)`: list of `GridTemplate` and (width, height)
+    of the image they were drawn on, or `None`
+
+    Raises
+    ------
+    OSError
+        if the file cannot be read
+    ValueError
+        if it is not a valid template file
+    """
+    with open(file_name) as file:
+        data = json.load(file)
+    if not isinstance(data, dict) or data.get('format') != FORMAT:
+        raise ValueError(file_name + ' is not a grid template')
+    version = data.get('version', VERSION)
+    if not isinstance(version, int) or version > VERSION:
+        raise ValueError('Unsupported grid template version {}'.format(
+            version))
+    if not isinstance(data.get('grids'), list):
+        raise ValueError(file_name + ' has no list of grids')
+    image_size = data.get('image_size')
+    if image_size is not None and (not isinstance(image_size, list) or
+                                   len(image_size) != 2):
+        raise ValueError('Image size {!r} is not (width, height)'.format(
+            image_size))
+    templates = [GridTemplate.from_dict(grid) for grid in data['grids']]
+    return templates, None if image_size is None else tuple(image_size)
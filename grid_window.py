@@ -1,15 +1,24 @@
+import os
 import sys
 import numpy as np
-from PyQt5.QtCore import Qt, pyqtSlot, pyqtSignal, QSize, QRectF, QRect
-from PyQt5.QtGui import QMouseEvent, QPixmap, QIcon
+from PyQt5.QtCore import Qt, pyqtSlot, pyqtSignal, QSize, QRectF, QRect, \
+    QPointF
+from PyQt5.QtGui import QMouseEvent, QPixmap, QIcon, QImage, QWheelEvent
 from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QPushButton, \
     QWidget, QSpinBox, QGridLayout, QLabel, QGroupBox, QApplication, \
     QRadioButton, QVBoxLayout, QListWidget, QAbstractItemView,\
-    QFileDialog
+    QFileDialog, QShortcut
+from PyQt5.QtGui import QKeySequence
 
 from adjustable_grid import AdjustableGrid
+from crop_exporter import CropExporter
 from grid_control import GridControl
+from grid_template import GridTemplate
+from image_conversion import value_range
+from image_loader import ImageLoader
+from image_series import ImageSeries, tiff_files
 from my_image import BackgroundImage
+from redraw_throttle import RedrawThrottle
 
 
 class GridView(QGraphicsView):
@@ -18,6 +27,7 @@ class GridView(QGraphicsView):
     a child of a `parent` widget. Contain default grid properties such as `
     def_color`, `num_cols` and `num_rows`.
     """
+    zoom_step = 1.25  # zoom factor per mouse wheel notch
 
     def __init__(self, *,
                  parent: QWidget,
@@ -62,6 +72,8 @@ class GridView(QGraphicsView):
             num_cols=self.num_cols,
             num_rows=self.num_rows
         )
+        """Grid drawn following the mouse at most once per frame"""
+        self.redraw_throttle = RedrawThrottle()
 
         self.parent = self.parentWidget()
 
@@ -69,6 +81,14 @@ class GridView(QGraphicsView):
         """Virtual function that handles mouse buttons click"""
         if self.parentWidget().mode == GridWindow.modes['grid']:
             if event.button() == Qt.LeftButton and \
+                    event.modifiers() & Qt.ControlModifier:
+                """Ctrl + left click selects the placed grid under the
+                cursor"""
+                grid = self.grid_at(self.mapToScene(event.pos()))
+                if grid is not None:
+                    self.parent.grid_control.select_grid(grid)
+                event.accept()
+            elif event.button() == Qt.LeftButton and \
                     len(self.current_grid.tl_br_qpointf) < 2:
                 """If left click and grid corners are not fully specified, append 
                 mouse coordinates to grid coordinates"""
@@ -81,6 +101,7 @@ class GridView(QGraphicsView):
                     self.current_grid.add_grid_to_scene()
                 elif len(self.current_grid.tl_br_qpointf) == 2:
                     """If two corners, draw grid"""
+                    self.redraw_throttle.cancel()
                     tl_x = self.current_grid.tl_br_qpointf[0].x()
                     tl_y = self.current_grid.tl_br_qpointf[0].y()
                     br_x = self.current_grid.tl_br_qpointf[1].x()
@@ -92,6 +113,7 @@ class GridView(QGraphicsView):
                 event.accept()  # prevent event propagation to parent widget
             elif event.button() == Qt.RightButton:
                 """Right click reset the current grid"""
+                self.redraw_throttle.cancel()
                 self.current_grid.clear_grid()
                 self.current_grid.init_grid_graphics()
                 self.setWindowTitle('Left click to top left grid corner')
@@ -112,11 +134,9 @@ class GridView(QGraphicsView):
                 """If only a grid corner is chosen, dynamically draw grid 
                 following mouse cursor"""
                 mouse_coordinates = self.mapToScene(event.pos())
-                mouse_x = mouse_coordinates.x()
-                mouse_y = mouse_coordinates.y()
-                tl_x = self.current_grid.tl_br_qpointf[0].x()
-                tl_y = self.current_grid.tl_br_qpointf[0].y()
-                self.current_grid.draw_grid(tl_x, tl_y, mouse_x, mouse_y)
+                self.redraw_throttle.request(self._draw_current_grid,
+                                             mouse_coordinates.x(),
+                                             mouse_coordinates.y())
                 event.accept()
             else:
                 return super().mouseMoveEvent(event)
@@ -127,6 +147,68 @@ class GridView(QGraphicsView):
     def mouseDoubleClickEvent(self, event: QMouseEvent):
         return super().mouseDoubleClickEvent(event)
 
+    def grid_at(self, pos: QPointF):
+        """
+        Return the topmost placed grid with scene point `pos` inside its
+        edges, or `None`. Only the items whose bounding rect contains `pos`
+        are looked up in the scene index; placed grids are not scanned.
+        """
+        for item in self.scene.items(pos, Qt.IntersectsItemBoundingRect):
+            if isinstance(item, AdjustableGrid) and not item.interactive \
+                    and item.contains_scene_point(pos):
+                return item
+        return None
+
+    def grid_from_template(self, template: GridTemplate,
+                           scaling_factor: float):
+        """
+        Draw a new `AdjustableGrid` with the layout of `template` on an
+        image shown with `scaling_factor`, and add it to the scene.
+
+        Parameters
+        ----------
+        template: GridTemplate
+            grid layout in image pixels
+        scaling_factor: float
+            `BackgroundImage.scaling_factor` of the image shown
+
+        Returns
+        -------
+        The new `AdjustableGrid`
+        """
+        grid = AdjustableGrid(scene=self.scene,
+                              color=self.color,
+                              num_rows=template.num_rows,
+                              num_cols=template.num_cols)
+        grid.label_enabled = self.current_grid.label_enabled
+        (tl_x, tl_y), (br_x, br_y) = template.scene_corners(scaling_factor)
+        grid.tl_br_qpointf = [QPointF(tl_x, tl_y), QPointF(br_x, br_y)]
+        grid.phi = template.phi
+        grid.add_grid_to_scene()
+        grid.draw_grid(tl_x, tl_y, br_x, br_y, template.phi)
+        return grid
+
+    def _draw_current_grid(self, mouse_x: float, mouse_y: float):
+        """Draw the grid from its first corner to the mouse cursor, unless
+        it was placed or cancelled since the mouse moved"""
+        if len(self.current_grid.tl_br_qpointf) == 1:
+            tl = self.current_grid.tl_br_qpointf[0]
+            self.current_grid.draw_grid(tl.x(), tl.y(), mouse_x, mouse_y)
+
+    def wheelEvent(self, event: QWheelEvent):
+        """Virtual function called when the mouse wheel is rotated.
+        Ctrl + wheel zooms in/out around the mouse cursor; the background
+        tiles follow the zoom level."""
+        if event.modifiers() & Qt.ControlModifier:
+            factor = GridView.zoom_step ** (event.angleDelta().y() / 120)
+            """Do not zoom out past the initial view"""
+            factor = max(factor, 1 / self.transform().m11())
+            self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+            self.scale(factor, factor)
+            event.accept()
+        else:
+            return super().wheelEvent(event)
+
     def mouseReleaseEvent(self, event: QMouseEvent):
         return super().mouseReleaseEvent(event)
 
@@ -158,7 +240,7 @@ class GridWindow(QWidget):
         Initialize the window widget.
         """
         super().__init__()
-        self.setGeometry(0, 0, 700, 500)
+        self.setGeometry(0, 0, 760, 530)
         self.setWindowTitle('ALIT')
 
         self.initial_color = Qt.darkGreen
@@ -184,6 +266,14 @@ class GridWindow(QWidget):
 
         """QImage visualized on background"""
         self.bg_image = BackgroundImage()
+        """Export crops on a worker pool"""
+        self.crop_exporter = CropExporter(parent=self)
+        """Decode images in a worker thread"""
+        self.image_loader = ImageLoader(parent=self,
+                                        cache=self.bg_image.preview_cache)
+        """Images of series mode, prefetched in the background"""
+        self.series = ImageSeries(parent=self,
+                                  cache=self.bg_image.preview_cache)
         # self.sig_change_mode.connect(self.view.change_mode)
 
         # """Mode select GUI"""
@@ -196,6 +286,13 @@ class GridWindow(QWidget):
         """Open bg_image/series buttons"""
         self.open_img_button = QPushButton('Load TIFF file', parent=self)
         self.open_series_button = QPushButton('Load TIFF series', parent=self)
+        self.prev_image_button = QPushButton('< Prev', parent=self)
+        self.next_image_button = QPushButton('Next >', parent=self)
+        self.page_spinbox = QSpinBox(parent=self, minimum=0, maximum=0)
+        """Display contrast: pixel values shown as black and white"""
+        self.window_low_spinbox = QSpinBox(parent=self)
+        self.window_high_spinbox = QSpinBox(parent=self)
+        self.auto_window_button = QPushButton('Auto', parent=self)
 
         self._configure_gui()
         self._configure_signals()
@@ -223,10 +320,51 @@ class GridWindow(QWidget):
         self.open_series_button.clicked.connect(self.open_series_button_clicked)
         self.open_series_button.resize(self.open_series_button.sizeHint())
         self.open_series_button.setToolTip(
-            'Load a TIFF bg_image series'
+            'Load a TIFF bg_image series: several files, or one file to '
+            'load its whole directory'
         )
         self.open_series_button.move(520, 40)
-        self.open_series_button.setEnabled(False)
+
+        """Configure series navigation (PageUp/PageDown)"""
+        self.prev_image_button.clicked.connect(self.prev_image)
+        self.prev_image_button.setToolTip('Previous image of the series')
+        self.prev_image_button.resize(70, 25)
+        self.prev_image_button.move(520, 70)
+        self.next_image_button.clicked.connect(self.next_image)
+        self.next_image_button.setToolTip('Next image of the series')
+        self.next_image_button.resize(70, 25)
+        self.next_image_button.move(595, 70)
+        """Configure page selection of multi-page images"""
+        self.page_spinbox.setPrefix('Page ')
+        self.page_spinbox.setToolTip('Page (channel, z-plane, timepoint) '
+                                     'shown and cropped')
+        self.page_spinbox.resize(85, 25)
+        self.page_spinbox.move(670, 70)
+        self.page_spinbox.setEnabled(False)
+        self.page_spinbox.valueChanged.connect(self.set_page)
+        """Configure display contrast. Only the screen image changes:
+        cells are cropped from the original pixels."""
+        self.window_low_spinbox.setPrefix('Min ')
+        self.window_low_spinbox.setToolTip('Pixel value shown as black')
+        self.window_low_spinbox.resize(85, 25)
+        self.window_low_spinbox.move(520, 100)
+        self.window_high_spinbox.setPrefix('Max ')
+        self.window_high_spinbox.setToolTip('Pixel value shown as white')
+        self.window_high_spinbox.resize(85, 25)
+        self.window_high_spinbox.move(610, 100)
+        for spinbox in (self.window_low_spinbox, self.window_high_spinbox):
+            spinbox.setKeyboardTracking(False)
+            spinbox.setEnabled(False)
+            spinbox.valueChanged.connect(self.set_window)
+        self.auto_window_button.setToolTip(
+            'Stretch the contrast to the pixel values of the image')
+        self.auto_window_button.resize(55, 25)
+        self.auto_window_button.move(700, 100)
+        self.auto_window_button.setEnabled(False)
+        self.auto_window_button.clicked.connect(self.auto_window)
+        QShortcut(QKeySequence(Qt.Key_PageUp), self, self.prev_image)
+        QShortcut(QKeySequence(Qt.Key_PageDown), self, self.next_image)
+        self._update_series_buttons()
 
         # """Config. mode selection"""
         # self.mode_layout.addWidget(self.mode_grid_button)
@@ -246,7 +384,16 @@ class GridWindow(QWidget):
         # self.pg_box.move(510, 240)
 
     def _configure_signals(self):
-        self.grid_control.sig_crop_region.connect(self.bg_image.crop_region)
+        self.grid_control.sig_crop_grid.connect(self.crop_grid)
+        self.crop_exporter.sig_progress.connect(
+            self.grid_control.set_crop_progress)
+        self.crop_exporter.sig_finished.connect(self.grid_control.crop_done)
+        self.crop_exporter.sig_failed.connect(self.crop_failed)
+        self.image_loader.sig_preview_ready.connect(self.show_preview)
+        self.image_loader.sig_image_loaded.connect(self.image_loaded)
+        self.image_loader.sig_load_failed.connect(self.image_load_failed)
+        self.series.sig_image_ready.connect(self.image_loaded)
+        self.series.sig_load_failed.connect(self.image_load_failed)
 
     @pyqtSlot()
     def place_grid(self):
@@ -259,16 +406,7 @@ class GridWindow(QWidget):
 
         """
 
-        """Extract grid coordinates and set cells (= images) coordinates"""
-        grid_pts = self.view.current_grid.generate_grid_pts()
-        self.view.current_grid.set_image_coordinates(grid_pts)
-        # self.sig_grid_placed.emit(grid_pts)
-
-        """Make grid not editable and turn it blue"""
-        self.view.current_grid.make_grid_non_interactive()
-
-        """Save grid in history"""
-        self.view.placed_grids.append(self.view.current_grid)
+        self._fix_grid(self.view.current_grid)
 
         """Initialize new grid using view settings"""
         self.view.current_grid = AdjustableGrid(
@@ -277,64 +415,60 @@ class GridWindow(QWidget):
             num_cols=self.view.num_cols,
             num_rows=self.view.num_rows)
 
+    def _fix_grid(self, grid: AdjustableGrid):
+        """Compute the cell coordinates of `grid`, make it non interactive
+        and add it to the placed grids"""
+        """Extract grid coordinates and set cells (= images) coordinates"""
+        grid_pts = grid.generate_grid_pts()
+        grid.set_image_coordinates(grid_pts)
+        # self.sig_grid_placed.emit(grid_pts)
+
+        """Make grid not editable and turn it blue"""
+        grid.make_grid_non_interactive()
+
+        """Save grid in history"""
+        self.view.placed_grids.append(grid)
+
+    def apply_templates(self, templates):
+        """
+        Place the grids of `templates` (list of `GridTemplate`) on the
+        background image and add them to the grid list.
+
+        Parameters
+        ----------
+        templates: list
+            grid layouts in image pixels
+
+        Returns
+        -------
+
+        """
+        if self.bg_image.scaling_factor is None:
+            print('No bg_image loaded')
+            return
+        for template in templates:
+            grid = self.view.grid_from_template(
+                template, self.bg_image.scaling_factor)
+            self._fix_grid(grid)
+            self.grid_control.add_grid_item(grid, template.name)
+
     @pyqtSlot(int)
     def set_num_cols(self, num_cols: int):
         """Change column number of grid. Dynamically update a grid if is
         drawn but not displaced."""
-        """Set default row number for future grids"""
+        """Set default column number for future grids"""
         self.view.num_cols = num_cols
-        if len(self.view.current_grid.tl_br_qpointf) == 2:
-            """Grid has been drawn but not placed"""
-            self.view.current_grid.num_cols = num_cols
-            """Save current grid location"""
-            phi = self.view.current_grid.phi
-            tl, br = self.view.current_grid.tl_br_qpointf
-            sign_x = self.view.current_grid.sign_x
-            sign_y = self.view.current_grid.sign_y
-            """Clear current grd"""
-            self.view.current_grid.clear_grid()
-            """Set previous location"""
-            self.view.current_grid.tl_br_qpointf = [tl, br]
-            self.view.current_grid.phi = phi
-            self.view.current_grid.sign_x = sign_x
-            self.view.current_grid.sign_y = sign_y
-            """Draw grid and add it to scene"""
-            self.view.current_grid.init_grid_graphics()
-            self.view.current_grid.draw_grid(tl.x(), tl.y(), br.x(), br.y(), phi)
-            self.view.current_grid.add_grid_to_scene()
-        elif len(self.view.current_grid.tl_br_qpointf) == 0:
-            """Grid has not been drawn"""
-            self.view.current_grid.num_cols = num_cols
-            self.view.current_grid.init_grid_graphics()
+        grid = self.view.current_grid
+        grid.set_shape(grid.num_rows, num_cols)
 
     @pyqtSlot(int)
     def set_num_rows(self, num_rows: int):
-        """"""
+        """Change row number of grid. Dynamically update a grid if is
+        drawn but not displaced."""
         """Set default row number for future grids"""
         self.view.num_rows = num_rows
-        if len(self.view.current_grid.tl_br_qpointf) == 2:
-            """Grid has been drawn but not placed"""
-            self.view.current_grid.num_rows = num_rows
-            """Save current grid location"""
-            phi = self.view.current_grid.phi
-            tl, br = self.view.current_grid.tl_br_qpointf
-            sign_x = self.view.current_grid.sign_x
-            sign_y = self.view.current_grid.sign_y
-            """Clear current grd"""
-            self.view.current_grid.clear_grid()
-            """Set previous location"""
-            self.view.current_grid.tl_br_qpointf = [tl, br]
-            self.view.current_grid.phi = phi
-            self.view.current_grid.sign_x = sign_x
-            self.view.current_grid.sign_y = sign_y
-            """Draw grid and add it to scene"""
-            self.view.current_grid.init_grid_graphics()
-            self.view.current_grid.draw_grid(tl.x(), tl.y(), br.x(), br.y(), phi)
-            self.view.current_grid.add_grid_to_scene()
-        elif len(self.view.current_grid.tl_br_qpointf) == 0:
-            """Grid has not been drawn"""
-            self.view.current_grid.num_rows = num_rows
-            self.view.current_grid.init_grid_graphics()
+        grid = self.view.current_grid
+        grid.set_shape(num_rows, grid.num_cols)
 
     @pyqtSlot()
     def change_mode(self):
@@ -375,15 +509,183 @@ class GridWindow(QWidget):
         file_dialog.close()
 
         if file_name != '':
-            # self.bg_image.pixmap_from_file(file_name)
-            self.bg_image.image_from_file(file_name)
-            self.bg_image.show_in_scene(self.view)
+            """Leave series mode"""
+            self.series.set_files([])
+            self._update_series_buttons()
+            """Decoding happens in `image_loader`, off the GUI thread"""
+            self.setWindowTitle('ALIT - loading ' + file_name)
+            self.image_loader.load(file_name, self.view.height())
+
+    @pyqtSlot(QImage, float, float, int)
+    def show_preview(self, preview, scale_x, scale_y, full_height):
+        """Show a (possibly coarse) preview of the image being loaded"""
+        self.bg_image.show_preview(self.view, preview, scale_x, scale_y,
+                                   full_height)
+
+    @pyqtSlot(str, object)
+    def image_loaded(self, file_name, pyramid):
+        """Make the loaded image the background image and replace the
+        preview by tiles"""
+        self.bg_image.set_pyramid(file_name, pyramid)
+        self.bg_image.show_in_scene(self.view)
+        self._update_page_spinbox()
+        self._update_window_spinboxes()
+        self.setWindowTitle('ALIT - ' + file_name + self._series_position())
+
+    @pyqtSlot(str, str)
+    def image_load_failed(self, file_name, error):
+        print('Could not load', file_name, error)
+        self.setWindowTitle('ALIT')
 
     @pyqtSlot()
     def open_series_button_clicked(self):
-        pass
+        """
+        Open a file dialog to choose the TIFF images of a series, and show
+        the first one. Choosing a single file makes a series of all the
+        TIFF files in its directory. Grids are kept while stepping through
+        the series.
+
+        Returns
+        -------
+
+        """
+        [file_names, _] = QFileDialog.getOpenFileNames(
+            self,
+            "Choose TIFF files",
+            "",
+            "TIFF Images (*.tiff *.tif)",
+            options=QFileDialog.DontUseNativeDialog
+        )
+        if len(file_names) == 1:
+            files = tiff_files(os.path.dirname(file_names[0]))
+            self.series.set_files(files)
+            self.show_series_image(files.index(file_names[0]))
+        elif file_names:
+            self.series.set_files(sorted(file_names))
+            self.show_series_image(0)
+
+    def show_series_image(self, index: int):
+        """Show image `index` of the series, at once if it was prefetched"""
+        self.image_loader.cancel()
+        file_name = self.series.files[index]
+        self.setWindowTitle('ALIT - loading ' + file_name)
+        self._update_series_buttons(index)
+        if not self.series.go_to(index, self.view.height()):
+            self.image_loader.load(file_name, self.view.height(),
+                                   self.series.page)
+
+    def _update_page_spinbox(self):
+        """Show the page count of the current image; pages are read from
+        the file directory, no pixel is decoded"""
+        reader = self.bg_image.reader
+        num_pages = reader.num_pages
+        self.page_spinbox.blockSignals(True)
+        self.page_spinbox.setMaximum(num_pages - 1)
+        self.page_spinbox.setValue(reader.page)
+        self.page_spinbox.blockSignals(False)
+        self.page_spinbox.setEnabled(num_pages > 1)
+        if hasattr(reader, 'describe_page'):
+            self.page_spinbox.setToolTip(
+                'Page {page} of {pages}: {width}x{height}, {samples} '
+                'samples of {bits} bits'.format(
+                    page=reader.page, pages=num_pages,
+                    **reader.describe_page(reader.page)))
+
+    @pyqtSlot(int)
+    def set_page(self, page: int):
+        """Show page `page` of the current image (and of the next images of
+        a series). Grids are kept."""
+        if self.bg_image.img_file is None or page == self.bg_image.page:
+            return
+        self.series.set_page(page)
+        self.setWindowTitle('ALIT - loading page {} of {}'.format(
+            page, self.bg_image.img_file))
+        self.image_loader.load(self.bg_image.img_file, self.view.height(),
+                               page)
+
+    def _update_window_spinboxes(self):
+        """Show the display window of the current image. Windows of
+        floating-point images can only be set automatically."""
+        values = value_range(self.bg_image.reader.dtype)
+        self.auto_window_button.setEnabled(True)
+        for spinbox, value in zip((self.window_low_spinbox,
+                                   self.window_high_spinbox),
+                                  self.bg_image.window):
+            spinbox.setEnabled(values is not None)
+            if values is None:
+                continue
+            spinbox.blockSignals(True)
+            """`QSpinBox` holds 32-bit signed integers"""
+            spinbox.setRange(max(values[0], -2 ** 31),
+                             min(values[1], 2 ** 31 - 1))
+            spinbox.setValue(int(round(value)))
+            spinbox.blockSignals(False)
+
+    @pyqtSlot(int)
+    def set_window(self, _value: int):
+        """Show the pixel values between the contrast spin boxes as black
+        and white, for this image and the next ones"""
+        low = self.window_low_spinbox.value()
+        high = self.window_high_spinbox.value()
+        if self.bg_image.pyramid is None or high <= low:
+            return
+        self.bg_image.set_window((low, high))
+        self.image_loader.window = self.bg_image.window
 
-    # TODO connect directly and avoid using pyqtSlot
-    @pyqtSlot(float)
-    def rotate_image(self, angle):
-        self.bg_image.rotate_image(angle)
+    @pyqtSlot()
+    def auto_window(self):
+        """Go back to the contrast computed from each image"""
+        if self.bg_image.pyramid is None:
+            return
+        self.bg_image.set_window(None)
+        self.image_loader.window = None
+        self._update_window_spinboxes()
+
+    @pyqtSlot()
+    def prev_image(self):
+        if self.series.index > 0:
+            self.show_series_image(self.series.index - 1)
+
+    @pyqtSlot()
+    def next_image(self):
+        if 0 <= self.series.index < len(self.series) - 1:
+            self.show_series_image(self.series.index + 1)
+
+    def _update_series_buttons(self, index: int=None):
+        index = self.series.index if index is None else index
+        self.prev_image_button.setEnabled(len(self.series) > 0 and index > 0)
+        self.next_image_button.setEnabled(index < len(self.series) - 1)
+
+    def _series_position(self):
+        """' (3/40)' in series mode, '' otherwise"""
+        if self.series.current_file is None:
+            return ''
+        return ' ({}/{})'.format(self.series.index + 1, len(self.series))
+
+    def output_directory(self, grid_name: str):
+        """Directory receiving the crops of grid `grid_name`: one
+        directory per image in series mode"""
+        if self.series.current_file is None:
+            return grid_name
+        image_name = os.path.splitext(
+            os.path.basename(self.series.current_file))[0]
+        return os.path.join(image_name, grid_name)
+
+    @pyqtSlot(np.ndarray, list)
+    def crop_grid(self, image_coordinates, paths):
+        """
+        Export the grid cells `image_coordinates` (scene coordinates, as in
+        `AdjustableGrid.image_coordinates`) to `paths`.
+        """
+        if self.bg_image.reader is None:
+            print('No bg_image loaded')
+            self.grid_control.crop_done()
+            return
+        jobs = self.bg_image.cell_jobs(image_coordinates, paths)
+        self.crop_exporter.export(self.bg_image.img_file, jobs,
+                                  self.bg_image.page)
+
+    @pyqtSlot(str)
+    def crop_failed(self, error):
+        print('Crop failed:', error)
+        self.grid_control.crop_done()
@@ -0,0 +1,175 @@
+from functools import lru_cache
+import numpy as np
+from PyQt5.QtGui import QImage
+
+
+def value_range(dtype):
+    """(min, max) of integer `dtype`, `None` for floating-point types"""
+    dtype = np.dtype(dtype)
+    if dtype.kind not in 'ui':
+        return None
+    info = np.iinfo(dtype)
+    return int(info.min), int(info.max)
+
+
+def auto_window(array: np.ndarray, saturated: float=0.35):
+    """
+    Display window spanning the values of `array` except the `saturated`
+    percent darkest and brightest, like ImageJ's auto contrast. Meant for
+    preview levels: the whole array is scanned.
+
+    Parameters
+    ----------
+    array: NumPy Array
+        pixels of any type, all samples share the window
+    saturated: float
+        percentage of values clipped at each end
+
+    Returns
+    -------
+    `(low, high)` with `low < high`
+    """
+    values = array.ravel()
+    if values.dtype.kind == 'u' and values.dtype.itemsize <= 2:
+        """Histogram of integer values, faster than sorting"""
+        cumulative = np.cumsum(np.bincount(values))
+        clipped = cumulative[-1] * saturated / 100.
+        low = int(np.searchsorted(cumulative, clipped, side='right'))
+        high = int(np.searchsorted(cumulative, cumulative[-1] - clipped))
+    else:
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return 0., 1.
+        low, high = np.percentile(values, [saturated, 100. - saturated])
+        low, high = values.dtype.type(low).item(), \
+            values.dtype.type(high).item()
+    if high <= low:
+        high = low + 1
+    return low, high
+
+
+def default_window(array: np.ndarray):
+    """Window shown until the user changes the contrast: 8-bit images
+    unchanged, deeper ones auto-contrasted"""
+    if array.dtype == np.uint8:
+        return 0, 255
+    return auto_window(array)
+
+
+@lru_cache(maxsize=16)
+def window_lut(low, high, dtype_name: str):
+    """
+    Lookup table mapping every value of an 8- or 16-bit unsigned
+    `dtype_name` to 8 bits, `low` to 0 and `high` to 255.
+    """
+    top = np.iinfo(dtype_name).max
+    values = np.arange(top + 1, dtype=np.float32)
+    return to_8_bits(values, (low, high))
+
+
+def to_8_bits(array: np.ndarray, window: tuple):
+    """Map `window` = (low, high) linearly onto 0..255, clipping outside"""
+    low, high = window
+    scale = 255. / (high - low)
+    mapped = (array.astype(np.float32) - np.float32(low)) * np.float32(scale)
+    return np.clip(mapped + .5, 0, 255).astype(np.uint8)
+
+
+def display_array(array: np.ndarray, window: tuple=None):
+    """
+    Reduce an array returned by an `ImageReader` to the 8-bit gray, RGB
+    or RGBA pixels shown on screen. The source array is not modified.
+
+    Parameters
+    ----------
+    array: NumPy Array
+        array of shape (height, width) or (height, width, samples)
+    window: tuple
+        `(low, high)` values shown as black and white. Default
+        `default_window(array)`.
+
+    Returns
+    -------
+    C-contiguous uint8 array of shape (height, width) or
+    (height, width, 3 or 4). 8-bit arrays shown unchanged are returned
+    without copy when contiguous.
+    """
+    if window is None:
+        window = default_window(array)
+    if array.ndim == 3 and array.shape[2] == 1:
+        array = array[..., 0]
+    elif array.ndim == 3 and array.shape[2] not in (3, 4):
+        """Multi-channel images: first three channels, or the first one"""
+        array = array[..., :3] if array.shape[2] > 4 else array[..., 0]
+    if array.dtype == np.uint8 and tuple(window) == (0, 255):
+        pass
+    elif array.dtype.kind == 'u' and array.dtype.itemsize <= 2:
+        """Vectorized lookup, one table per window"""
+        array = window_lut(window[0], window[1], array.dtype.name)[array]
+    else:
+        array = to_8_bits(array, window)
+    return np.ascontiguousarray(array)
+
+
+def qimage_view(array: np.ndarray):
+    """
+    `QImage` sharing the buffer of `array`, an array returned by
+    `display_array`, without copy. The image is valid as long as `array`
+    is: copy it, or convert it to a `QPixmap`, before `array` goes away.
+    """
+    height, width = array.shape[:2]
+    if array.ndim == 2:
+        image_format = QImage.Format_Grayscale8
+    elif array.shape[2] == 3:
+        image_format = QImage.Format_RGB888
+    else:
+        image_format = QImage.Format_RGBA8888
+    return QImage(array.data, width, height, array.strides[0], image_format)
+
+
+def array_to_qimage(array: np.ndarray, window: tuple=None):
+    """
+    Convert a NumPy array returned by an `ImageReader` to an 8-bit `QImage`.
+    Deeper images are reduced to 8 bits through the display `window`.
+
+    Parameters
+    ----------
+    array: NumPy Array
+        array of shape (height, width) or (height, width, samples)
+    window: tuple
+        `(low, high)` values shown as black and white. Default
+        `default_window(array)`.
+
+    Returns
+    -------
+    QImage owning a copy of the pixel data, safe to send to other threads
+    """
+    return qimage_view(display_array(array, window)).copy()
+
+
+def qimage_to_array(image: QImage):
+    """
+    Copy an 8-bit grayscale or RGBA `QImage` into a NumPy array.
+
+    Parameters
+    ----------
+    image: QImage
+
+    Returns
+    -------
+    NumPy array of shape (height, width) or (height, width, 4)
+    """
+    if image.format() == QImage.Format_Grayscale8:
+        channels = 1
+    else:
+        image = image.convertToFormat(QImage.Format_RGBA8888)
+        channels = 4
+    width, height = image.width(), image.height()
+    buffer = image.constBits()
+    buffer.setsize(image.byteCount())
+    array = np.frombuffer(buffer, np.uint8).reshape(
+        height, image.bytesPerLine())[:, :width * channels]
+    if channels == 1:
+        return array.copy()
+    return array.reshape(height, width, channels).copy()
+
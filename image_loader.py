@@ -0,0 +1,165 @@
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, \
+    pyqtSlot
+from PyQt5.QtGui import QImage
+
+from image_conversion import array_to_qimage
+from image_pyramid import BuildCancelled
+from memory_budget import budget
+from my_image import open_pyramid
+from preview_cache import PreviewCache
+
+
+class LoadSignals(QObject):
+    """Signals emitted by a `LoadImageTask`. Each carries the id of the
+    request that produced it."""
+    """id, preview, full-resolution pixels per preview pixel horizontally
+    and vertically, full-resolution height"""
+    sig_preview = pyqtSignal(int, QImage, float, float, int)
+    sig_loaded = pyqtSignal(int, str, object)  # id, file name, ImagePyramid
+    sig_failed = pyqtSignal(int, str, str)  # id, file name, error
+
+
+class LoadImageTask(QRunnable):
+    """
+    Open an image in a worker thread. A coarse preview, read by the decoder
+    at reduced resolution, is emitted first, then the box-filtered pyramid
+    level that fits the view.
+    Prefetching tasks skip the previews and only build the level.
+    """
+    coarse_levels = 2  # coarse preview is 2**coarse_levels times smaller
+
+    def __init__(self, *,
+                 request_id: int,
+                 file_name: str,
+                 view_height: int,
+                 cache: PreviewCache,
+                 cancel_event: threading.Event,
+                 preview: bool=True,
+                 page: int=0,
+                 window: tuple=None):
+        super().__init__()
+        self.request_id = request_id
+        self.file_name = file_name
+        self.view_height = view_height
+        self.cache = cache
+        self.cancel_event = cancel_event
+        self.preview = preview
+        self.page = page
+        self.window = window  # display window of the previews
+        self.signals = LoadSignals()
+
+    def run(self):
+        """Executed by the thread pool"""
+        with budget.operation('load'):
+            self._load()
+
+    def _load(self):
+        pyramid = None
+        try:
+            pyramid = open_pyramid(self.file_name, self.cache, self.page)
+            level = pyramid.level_for_height(self.view_height)
+            if self.preview and level not in pyramid.levels and \
+                    not self.cancel_event.is_set():
+                """Coarse preview while the display level is computed"""
+                coarse_level = level + LoadImageTask.coarse_levels
+                coarse, (scale_x, scale_y) = pyramid.reader.read_reduced(
+                    1 << coarse_level)
+                self.signals.sig_preview.emit(
+                    self.request_id, array_to_qimage(coarse, self.window),
+                    scale_x, scale_y, pyramid.reader.height)
+            level_array = pyramid.get_level(level,
+                                            self.cancel_event.is_set)
+            if self.cancel_event.is_set():
+                raise BuildCancelled()
+            if self.preview:
+                factor = 1 << level
+                self.signals.sig_preview.emit(
+                    self.request_id,
+                    array_to_qimage(level_array, self.window), factor,
+                    factor, pyramid.reader.height)
+            self.cache.store(self.file_name, pyramid.levels, self.page)
+        except Exception as err:
+            """Nobody else holds the reader: close its file now"""
+            if pyramid is not None:
+                pyramid.reader.close()
+            if not isinstance(err, BuildCancelled):
+                self.signals.sig_failed.emit(self.request_id, self.file_name,
+                                             str(err))
+        else:
+            self.signals.sig_loaded.emit(self.request_id, self.file_name,
+                                         pyramid)
+
+
+class ImageLoader(QObject):
+    """
+    Load images off the GUI thread. Only the most recent request is
+    forwarded: starting a new load cancels the previous one.
+    """
+    """Preview image ready to be shown, full-resolution pixels per preview
+    pixel horizontally and vertically, and full-resolution height"""
+    sig_preview_ready = pyqtSignal(QImage, float, float, int)
+    """Image fully loaded: file name and ImagePyramid"""
+    sig_image_loaded = pyqtSignal(str, object)
+    """Image could not be loaded: file name and error message"""
+    sig_load_failed = pyqtSignal(str, str)
+
+    def __init__(self, *,
+                 parent: QObject=None,
+                 cache: PreviewCache=None):
+        super().__init__(parent)
+        self.cache = PreviewCache() if cache is None else cache
+        self.pool = QThreadPool(self)
+        self.request_id = 0
+        self.cancel_event = None
+        """Display window of the previews, `None` for `default_window`"""
+        self.window = None
+
+    def load(self, file_name: str, view_height: int, page: int=0):
+        """
+        Start loading page `page` of `file_name` for a view `view_height`
+        pixels high, cancelling any load in progress.
+        """
+        self.cancel()
+        self.request_id += 1
+        self.cancel_event = threading.Event()
+        task = LoadImageTask(request_id=self.request_id,
+                             file_name=file_name,
+                             view_height=view_height,
+                             cache=self.cache,
+                             cancel_event=self.cancel_event,
+                             page=page,
+                             window=self.window)
+        task.signals.sig_preview.connect(self._on_preview)
+        task.signals.sig_loaded.connect(self._on_loaded)
+        task.signals.sig_failed.connect(self._on_failed)
+        self.pool.start(task)
+
+    def cancel(self):
+        """Stop the load in progress, if any. Results it may still send are
+        ignored."""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_event = None
+            self.request_id += 1
+
+    @pyqtSlot(int, QImage, float, float, int)
+    def _on_preview(self, request_id, preview, scale_x, scale_y,
+                    full_height):
+        if request_id == self.request_id:
+            self.sig_preview_ready.emit(preview, scale_x, scale_y,
+                                        full_height)
+
+    @pyqtSlot(int, str, object)
+    def _on_loaded(self, request_id, file_name, pyramid):
+        if request_id == self.request_id:
+            self.cancel_event = None
+            self.sig_image_loaded.emit(file_name, pyramid)
+        else:
+            pyramid.reader.close()
+
+    @pyqtSlot(int, str, str)
+    def _on_failed(self, request_id, file_name, error):
+        if request_id == self.request_id:
+            self.cancel_event = None
+            self.sig_load_failed.emit(file_name, error)
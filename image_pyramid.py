@@ -0,0 +1,225 @@
+import threading
+import numpy as np
+
+from memory_budget import budget, LEVELS
+from tiff_reader import ImageReader
+from tracing import traced
+
+
+class BuildCancelled(Exception):
+    """Raised when a pyramid level build is interrupted by its caller."""
+    pass
+
+
+def downsample(array: np.ndarray, factor: int):
+    """
+    Box-filter `array` by an integer `factor` along both axes. Edges that
+    are not a multiple of `factor` are padded by replication.
+
+    Parameters
+    ----------
+    array: NumPy Array
+        array of shape (height, width) or (height, width, samples)
+    factor: int
+        downsampling factor
+
+    Returns
+    -------
+    Downsampled array with the same dtype as `array`
+    """
+    if factor == 1:
+        return array
+    height, width = array.shape[:2]
+    pad_y = -height % factor
+    pad_x = -width % factor
+    if pad_y or pad_x:
+        pad = [(0, pad_y), (0, pad_x)] + [(0, 0)] * (array.ndim - 2)
+        array = np.pad(array, pad, mode='edge')
+    blocks = array.reshape((array.shape[0] // factor, factor,
+                            array.shape[1] // factor, factor)
+                           + array.shape[2:])
+    mean = blocks.mean(axis=(1, 3), dtype=np.float32)
+    if array.dtype.kind in 'ui':
+        mean = np.rint(mean)
+    return mean.astype(array.dtype)
+
+
+class ImagePyramid:
+    """
+    Power-of-two image pyramid on top of an `ImageReader`. Level `k` has
+    size `ceil(size / 2**k)`. Level 0 is the full-resolution image and is
+    never stored; coarser levels are built lazily, the first one from a
+    reduced-resolution image of the file or by streaming the reader band
+    by band, and the others from the closest finer level already in
+    memory.
+    """
+    min_level_size = 64  # coarsest level is at least this many pixels high
+
+    def __init__(self, reader: ImageReader):
+        self.reader = reader
+        """Level index -> NumPy array. Replaced, not modified, when levels
+        are added or released, so that other threads can iterate it."""
+        self.levels = {}
+        self._levels_lock = threading.Lock()  # held while replacing levels
+        self.last_level = None  # level read last, kept when releasing
+        self.account = budget.account(LEVELS, owner=self,
+                                      release=self.release_levels,
+                                      any_thread=True)
+        self.num_levels = 1
+        while min(reader.height, reader.width) >> self.num_levels >= \
+                ImagePyramid.min_level_size:
+            self.num_levels += 1
+
+    @staticmethod
+    def scale(level: int):
+        """Size of a level pixel relative to a full-resolution pixel"""
+        return 1. / (1 << level)
+
+    def level_shape(self, level: int):
+        """(height, width) of `level`"""
+        factor = 1 << level
+        return -(-self.reader.height // factor), \
+            -(-self.reader.width // factor)
+
+    def level_for_height(self, height: int):
+        """
+        Return the coarsest level that is at least `height` pixels high,
+        i.e. the level closest to a view of that height which does not
+        need to be upscaled.
+        """
+        level = 0
+        while level + 1 < self.num_levels and \
+                self.level_shape(level + 1)[0] >= height:
+            level += 1
+        return level
+
+    def in_memory(self, level: int):
+        """`True` if regions of `level` are cut from a level in memory,
+        without decoding the image"""
+        return any(ix <= level for ix in self.levels)
+
+    def get_level(self, level: int, is_cancelled=None):
+        """
+        Return the pixels of `level`, building it if needed.
+
+        Parameters
+        ----------
+        level: int
+            pyramid level, 0 being full resolution
+        is_cancelled: callable
+            polled between bands while reading the image. If it returns
+            `True`, the build stops with `BuildCancelled`.
+
+        Returns
+        -------
+        NumPy array
+        """
+        self.last_level = level
+        levels = self.levels
+        if level in levels:
+            return levels[level]
+        if level == 0:
+            return self.reader.read_region(0, 0, self.reader.width,
+                                           self.reader.height)
+        finer = [ix for ix in levels if ix < level]
+        if finer:
+            source_level = max(finer)
+            array = downsample(levels[source_level],
+                               1 << (level - source_level))
+        else:
+            array = self._build_from_reader(level, is_cancelled)
+        self.add_levels({level: array})
+        return array
+
+    def add_levels(self, levels: dict):
+        """Store `levels` (level index -> NumPy array), e.g. loaded from
+        the preview cache"""
+        with self._levels_lock:
+            added = dict(self.levels)
+            num_bytes = 0
+            for level, array in levels.items():
+                if level in added:
+                    num_bytes -= added[level].nbytes
+                added[level] = array
+                num_bytes += array.nbytes
+            self.levels = added
+        """Counted out of the lock: `add` may call `release_levels`, which
+        takes it"""
+        self.account.add(num_bytes)
+
+    def release_levels(self, num_bytes: int):
+        """Drop the finest levels, but the one read last, until about
+        `num_bytes` are freed. Dropped levels are built again when
+        needed."""
+        with self._levels_lock:
+            kept = dict(self.levels)
+            freed = 0
+            for level in sorted(kept):
+                if freed >= num_bytes:
+                    break
+                if level != self.last_level:
+                    freed += kept.pop(level).nbytes
+            self.levels = kept
+        self.account.remove(freed)
+
+    def read_region(self, level: int, x: int, y: int, width: int,
+                    height: int):
+        """
+        Return a region of `level` without building the whole level. The
+        region is cut from the closest finer level in memory, or read from
+        the full-resolution image.
+
+        Parameters
+        ----------
+        level: int
+            pyramid level
+        x: int
+            left edge in `level` pixels
+        y: int
+            top edge in `level` pixels
+        width: int
+            region width in `level` pixels
+        height: int
+            region height in `level` pixels
+
+        Returns
+        -------
+        NumPy array
+        """
+        levels = self.levels
+        finer = [ix for ix in levels if ix <= level]
+        if finer:
+            source_level = max(finer)
+            source = levels[source_level]
+            self.last_level = source_level
+        else:
+            source_level = 0
+            source = None
+        factor = 1 << (level - source_level)
+        if source is None:
+            region = self.reader.read_region(x * factor, y * factor,
+                                             width * factor, height * factor)
+        else:
+            region = source[y * factor:(y + height) * factor,
+                            x * factor:(x + width) * factor]
+        return downsample(region, factor)
+
+    @traced('display.build_level')
+    def _build_from_reader(self, level: int, is_cancelled=None):
+        """Take the level from the reduced-resolution images stored in the
+        file if it has one of that size, otherwise box-filter the
+        full-resolution image band by band"""
+        factor = 1 << level
+        height, width = self.level_shape(level)
+        stored = self.reader.reduced_image(height, width)
+        if stored is not None:
+            return stored
+        out = np.empty((height, width) + self.reader.shape[2:],
+                       self.reader.dtype)
+        for y, band in self.reader.iter_bands(min_rows=4 * factor,
+                                              align=factor):
+            if is_cancelled is not None and is_cancelled():
+                raise BuildCancelled()
+            reduced = downsample(band, factor)
+            out[y // factor:y // factor + reduced.shape[0]] = reduced
+        return out
@@ -0,0 +1,191 @@
+import os
+import threading
+from PyQt5.QtCore import QObject, QThreadPool, pyqtSignal, pyqtSlot
+
+import settings
+from image_loader import LoadImageTask
+from memory_budget import budget, LEVELS, PREFETCH
+from preview_cache import PreviewCache
+
+
+def tiff_files(directory: str):
+    """Sorted paths of the TIFF files in `directory`"""
+    return sorted(os.path.join(directory, name)
+                  for name in os.listdir(directory)
+                  if name.lower().endswith(('.tif', '.tiff')))
+
+
+class ImageSeries(QObject):
+    """
+    Ordered list of images stepped through in series mode. While an image is
+    shown, the `prefetch` images after it are opened and the pyramid level
+    fitting the view is built by background tasks, so that moving to the
+    next image does not wait for decoding.
+    """
+    """Image ready to be shown: file name and ImagePyramid"""
+    sig_image_ready = pyqtSignal(str, object)
+    """Image could not be loaded: file name and error message"""
+    sig_load_failed = pyqtSignal(str, str)
+
+    def __init__(self, *,
+                 parent: QObject=None,
+                 cache: PreviewCache=None,
+                 prefetch: int=None):
+        """
+        Parameters
+        ----------
+        parent: QObject
+            Qt parent
+        cache: PreviewCache
+            cache storing the levels built in advance
+        prefetch: int
+            images opened ahead of the current one.
+            Default `settings.SERIES_PREFETCH`.
+        """
+        super().__init__(parent)
+        self.cache = PreviewCache() if cache is None else cache
+        self.prefetch = settings.SERIES_PREFETCH if prefetch is None \
+            else prefetch
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, self.prefetch))
+        self.files = []
+        self.index = -1
+        self.page = 0  # page shown of multi-page images
+        self.ready = {}  # file name -> prefetched ImagePyramid
+        self.pending = {}  # file name -> (request id, cancel event)
+        self.wanted = None  # file being prefetched and waited for
+        self.request_id = 0
+        """Prefetched images are dropped first when memory runs short. The
+        levels of a prefetched pyramid are counted as PREFETCH, on the
+        pyramid's own account, until the image is shown."""
+        budget.account(PREFETCH, owner=self, release=self.release_prefetched)
+
+    def __len__(self):
+        return len(self.files)
+
+    @property
+    def current_file(self):
+        return self.files[self.index] if 0 <= self.index < len(self) \
+            else None
+
+    def set_files(self, files):
+        """Start a new series of `files`, dropping prefetched images"""
+        self.clear()
+        self.files = list(files)
+        self.index = -1
+
+    def set_page(self, page: int):
+        """Show page `page` of every image, dropping prefetched images of
+        other pages"""
+        if page != self.page:
+            self.clear()
+            self.page = page
+
+    def clear(self):
+        """Stop prefetching and close prefetched images"""
+        for _, cancel_event in self.pending.values():
+            cancel_event.set()
+        self.pending.clear()
+        for pyramid in self.ready.values():
+            pyramid.reader.close()
+        self.ready.clear()
+        self.wanted = None
+
+    def release_prefetched(self, num_bytes: int):
+        """Close prefetched images, farthest from the current one first,
+        until about `num_bytes` of pyramid levels are freed. They are
+        loaded again when shown."""
+        freed = 0
+        for file_name in sorted(self.ready, key=self.files.index,
+                                reverse=True):
+            if freed >= num_bytes:
+                break
+            pyramid = self.ready.pop(file_name)
+            freed += pyramid.account.num_bytes
+            pyramid.reader.close()
+
+    def go_to(self, index: int, view_height: int):
+        """
+        Make image `index` the current one and prefetch the next ones.
+
+        Parameters
+        ----------
+        index: int
+            position in `files`
+        view_height: int
+            height of the view the images are shown in
+
+        Returns
+        -------
+        `True` if the image was prefetched: `sig_image_ready` is emitted
+        now, or when prefetching is done. `False` if the caller has to load
+        it.
+        """
+        self.index = index
+        file_name = self.files[index]
+        self.wanted = None
+        found = True
+        if file_name in self.pending:
+            self.wanted = file_name
+        elif file_name not in self.ready:
+            found = False
+        self._prefetch(view_height)
+        if file_name in self.ready:
+            pyramid = self.ready.pop(file_name)
+            pyramid.account.set_kind(LEVELS)
+            self.sig_image_ready.emit(file_name, pyramid)
+        return found
+
+    def _prefetch(self, view_height: int):
+        """Drop prefetched images outside the window following the current
+        image and start the missing ones"""
+        window = self.files[self.index + 1:self.index + 1 + self.prefetch]
+        keep = set(window) | {self.files[self.index]}
+        for file_name in list(self.pending):
+            if file_name not in keep:
+                self.pending.pop(file_name)[1].set()
+        for file_name in list(self.ready):
+            if file_name not in keep:
+                self.ready.pop(file_name).reader.close()
+        for file_name in window:
+            if file_name in self.pending or file_name in self.ready:
+                continue
+            self.request_id += 1
+            cancel_event = threading.Event()
+            self.pending[file_name] = (self.request_id, cancel_event)
+            task = LoadImageTask(request_id=self.request_id,
+                                 file_name=file_name,
+                                 view_height=view_height,
+                                 cache=self.cache,
+                                 cancel_event=cancel_event,
+                                 preview=False,
+                                 page=self.page)
+            task.signals.sig_loaded.connect(self._on_loaded)
+            task.signals.sig_failed.connect(self._on_failed)
+            self.pool.start(task)
+
+    def _is_pending(self, request_id, file_name):
+        pending = self.pending.get(file_name)
+        return pending is not None and pending[0] == request_id
+
+    @pyqtSlot(int, str, object)
+    def _on_loaded(self, request_id, file_name, pyramid):
+        if not self._is_pending(request_id, file_name):
+            pyramid.reader.close()
+            return
+        del self.pending[file_name]
+        if file_name == self.wanted:
+            self.wanted = None
+            self.sig_image_ready.emit(file_name, pyramid)
+        else:
+            pyramid.account.set_kind(PREFETCH)
+            self.ready[file_name] = pyramid
+
+    @pyqtSlot(int, str, str)
+    def _on_failed(self, request_id, file_name, error):
+        if not self._is_pending(request_id, file_name):
+            return
+        del self.pending[file_name]
+        if file_name == self.wanted:
+            self.wanted = None
+            self.sig_load_failed.emit(file_name, error)
@@ -0,0 +1,215 @@
+"""
+Accounting of the memory held by decoded image buffers, against a budget
+(`settings.MEMORY_BUDGET_MB`).
+
+Owners of buffers open an `Account` of a given kind and report the bytes
+they hold. Accounts of buffers that can be rebuilt (background tiles,
+pyramid levels, prefetched images, decoded strips) come with a release
+callback: when the budget is exceeded, callbacks are called, lowest
+priority first, until the held bytes fit the budget again. Peak usage is
+recorded for named operations (`with budget.operation('crop'):`).
+"""
+import collections
+import contextlib
+import itertools
+import os
+import threading
+import weakref
+
+import settings
+
+
+"""Kinds of buffers and the priority their release callbacks are called
+with: cheapest to rebuild first"""
+SEGMENTS = 'segments'  # strips and tiles decoded by TIFF readers
+TILES = 'tiles'  # QPixmaps of the background
+PREFETCH = 'prefetch'  # images decoded ahead in series mode
+LEVELS = 'levels'  # display pyramid levels
+DECODED = 'decoded'  # whole images decoded by Qt, not releasable
+CELLS = 'cells'  # cell buffers waiting to be sampled and saved
+PRIORITIES = {SEGMENTS: 0, TILES: 0, PREFETCH: 1, LEVELS: 2}
+
+
+def physical_memory():
+    """Physical memory in bytes, or `None` if it cannot be found"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_budget():
+    """`settings.MEMORY_BUDGET_MB` in bytes, or half the physical memory
+    (4 GB if unknown) when the setting is 0"""
+    if settings.MEMORY_BUDGET_MB > 0:
+        return settings.MEMORY_BUDGET_MB * 2 ** 20
+    memory = physical_memory()
+    return memory // 2 if memory else 4 * 2 ** 30
+
+
+class Account:
+    """Bytes of one kind held by one owner"""
+    def __init__(self, budget: 'MemoryBudget', kind: str):
+        self.budget = budget
+        self.kind = kind
+        self.num_bytes = 0
+
+    def add(self, num_bytes: int):
+        """Count `num_bytes` more, releasing other buffers if the budget is
+        exceeded"""
+        self.budget._change(self, num_bytes)
+
+    def remove(self, num_bytes: int):
+        """Count `num_bytes` less"""
+        self.budget._change(self, -num_bytes)
+
+    def close(self):
+        """Count nothing held any more"""
+        self.budget._change(self, -self.num_bytes)
+
+    def set_kind(self, kind: str):
+        """Count the bytes held as `kind` from now on, e.g. when a
+        prefetched image is shown. The release priority is unchanged."""
+        self.budget._set_kind(self, kind)
+
+
+class MemoryBudget:
+    """
+    Bytes held per kind of buffer, release callbacks and peak usage of
+    operations. Thread-safe; release callbacks are only called from the
+    thread that registered them, unless registered with `any_thread`, so
+    that Qt objects are freed by the GUI thread. They are called without
+    the budget lock held, by the thread whose `Account.add` exceeded the
+    budget, so they may take locks of their own.
+    """
+    def __init__(self, *, max_bytes: int=None):
+        """
+        Parameters
+        ----------
+        max_bytes: int
+            budget in bytes. Default `default_budget()`.
+        """
+        self.max_bytes = default_budget() if max_bytes is None \
+            else max_bytes
+        self.held = collections.Counter()  # kind -> bytes
+        self.total = 0
+        self.peaks = {}  # operation name -> peak bytes of the last run
+        self._active = []  # [name, peak] of running operations
+        self._releasers = {}  # id -> (priority, thread, WeakMethod)
+        self._ids = itertools.count()
+        self._lock = threading.RLock()
+        self._releasing = False
+        self._warned = False
+
+    def account(self, kind: str, *, owner=None, release=None,
+                any_thread: bool=False):
+        """
+        Open an account of `kind` buffers.
+
+        Parameters
+        ----------
+        kind: str
+            one of the kinds above
+        owner:
+            object holding the buffers. The account is closed when `owner`
+            is garbage collected.
+        release: callable
+            bound method of `owner`, `release(num_bytes)` frees about
+            `num_bytes` of buffers. Called when the budget is exceeded,
+            in the order of `PRIORITIES[kind]`.
+        any_thread: bool
+            `release` may be called from any thread
+
+        Returns
+        -------
+        Account
+        """
+        account = Account(self, kind)
+        if owner is not None:
+            weakref.finalize(owner, account.close)
+        if release is not None:
+            key = next(self._ids)
+            thread = None if any_thread else threading.get_ident()
+            with self._lock:
+                self._releasers[key] = (PRIORITIES.get(kind, 0), thread,
+                                        weakref.WeakMethod(release))
+            weakref.finalize(release.__self__, self._releasers.pop, key,
+                             None)
+        return account
+
+    def _change(self, account: Account, num_bytes: int):
+        with self._lock:
+            account.num_bytes += num_bytes
+            self.held[account.kind] += num_bytes
+            self.total += num_bytes
+            for operation in self._active:
+                operation[1] = max(operation[1], self.total)
+            exceeded = num_bytes > 0 and self.total > self.max_bytes
+        if exceeded:
+            self._release()
+
+    def _set_kind(self, account: Account, kind: str):
+        with self._lock:
+            self.held[account.kind] -= account.num_bytes
+            self.held[kind] += account.num_bytes
+            account.kind = kind
+
+    def _release(self):
+        """Call release callbacks until the budget is met. The callbacks
+        are collected under the lock and called after releasing it; one
+        thread releases at a time."""
+        thread = threading.get_ident()
+        with self._lock:
+            if self._releasing:
+                return
+            self._releasing = True
+            releasers = [method for _, owner_thread, method in sorted(
+                             self._releasers.values(),
+                             key=lambda item: item[0])
+                         if owner_thread in (None, thread)]
+        try:
+            for method in releasers:
+                excess = self.total - self.max_bytes
+                if excess <= 0:
+                    break
+                release = method()
+                if release is not None:
+                    release(excess)
+        finally:
+            with self._lock:
+                self._releasing = False
+                exceeded = self.total > self.max_bytes
+                warn = exceeded and not self._warned
+                self._warned = exceeded
+                summary = self.summary() if warn else None
+        if warn:
+            print('Memory budget exceeded: {:.0f} MB held of {:.0f} MB '
+                  '({})'.format(self.total / 2 ** 20,
+                                self.max_bytes / 2 ** 20, summary))
+
+    @contextlib.contextmanager
+    def operation(self, name: str):
+        """Context recording the peak bytes held while it runs in
+        `peaks[name]`"""
+        with self._lock:
+            operation = [name, self.total]
+            self._active.append(operation)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active = [active for active in self._active
+                                if active is not operation]
+                self.peaks[name] = operation[1]
+
+    def summary(self):
+        """Held bytes per kind, as text"""
+        with self._lock:
+                return ', '.join(
+                '{} {:.0f} MB'.format(kind, num_bytes / 2 ** 20)
+                for kind, num_bytes in sorted(self.held.items())
+                if num_bytes)
+
+
+"""Budget shared by the whole program"""
+budget = MemoryBudget()
@@ -1,155 +1,345 @@
-import sys
+import threading
+import numpy as np
 from PyQt5.QtCore import Qt, QSize, QRect, QPointF, pyqtSlot, QRectF
 from PyQt5.QtGui import QMouseEvent, QPixmap, QIcon, QTransform, QPolygonF, \
-    QPainterPath, QPainter, QImage
-from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene
+    QPainterPath, QPainter, QImage, QImageReader
+from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, \
+    QGraphicsPixmapItem
+
+from affine_crop import crop_cell
+from export_engine import CellJob
+from grid_geometry import cell_corners
+from image_conversion import default_window, qimage_to_array
+from image_pyramid import ImagePyramid
+from memory_budget import budget, DECODED
+from preview_cache import PreviewCache
+from tiled_background import TiledBackgroundItem
+from tiff_reader import ImageReader, UnsupportedImageError, open_reader
+from tiff_writer import TiffWriter
+from tracing import span, traced
+
+
+class QtImageReader(ImageReader):
+    """
+    Fallback reader for files that `TiffReader` cannot decode (e.g. JPEG
+    compressed TIFFs). The whole page is decoded by `QImageReader` the
+    first time a region is read; reduced previews are decoded at their own
+    size without keeping the full image.
+    """
+    gray_formats = (QImage.Format_Grayscale8, QImage.Format_Mono,
+                    QImage.Format_MonoLSB)
+
+    def __init__(self, file_name: str, page: int=0):
+        super().__init__()
+        self.file_name = file_name
+        self.page = page
+        self._array = None
+        self._lock = threading.Lock()
+        image_reader = self._image_reader()
+        self._num_pages = max(1, image_reader.imageCount())
+        size = image_reader.size()
+        image_format = image_reader.imageFormat()
+        if size.isValid() and image_format not in (QImage.Format_Invalid,
+                                                   QImage.Format_Indexed8):
+            """The header tells the size and whether the image is gray"""
+            self.height, self.width = size.height(), size.width()
+            self.samples = 1 if image_format in QtImageReader.gray_formats \
+                else 4
+        else:
+            image = self._read(image_reader)
+            if image.isGrayscale():
+                image = image.convertToFormat(QImage.Format_Grayscale8)
+            self._set_array(qimage_to_array(image))
+            self.height, self.width = self._array.shape[:2]
+            self.samples = 1 if self._array.ndim == 2 \
+                else self._array.shape[2]
+        self.band_height = self.height
+
+    def _image_reader(self):
+        """`QImageReader` positioned on the page"""
+        image_reader = QImageReader(self.file_name)
+        if self.page and not image_reader.jumpToImage(self.page):
+            raise UnsupportedImageError(
+                'Page {} not found in {}'.format(self.page, self.file_name))
+        return image_reader
+
+    def _read(self, image_reader: QImageReader):
+        image = image_reader.read()
+        if image.isNull():
+            raise UnsupportedImageError('Qt cannot read ' + self.file_name)
+        return image
+
+    def _to_array(self, image: QImage):
+        """Pixels of `image` with `self.samples` samples"""
+        image = image.convertToFormat(
+            QImage.Format_Grayscale8 if self.samples == 1
+            else QImage.Format_RGBA8888)
+        return qimage_to_array(image)
+
+    def _set_array(self, array: np.ndarray):
+        self._array = array
+        budget.account(DECODED, owner=self).add(array.nbytes)
+
+    def _decoded(self):
+        """The full-resolution pixels, decoded on first use"""
+        with self._lock:
+            if self._array is None:
+                self._set_array(self._to_array(
+                    self._read(self._image_reader())))
+            return self._array
+
+    def read_reduced(self, step: int):
+        """Let the image plugin decode at the reduced size, unless the
+        full image is already decoded"""
+        step = max(1, int(step))
+        if step == 1 or self._array is not None:
+            return super().read_reduced(step)
+        width = -(-self.width // step)
+        height = -(-self.height // step)
+        image_reader = self._image_reader()
+        image_reader.setScaledSize(QSize(width, height))
+        array = self._to_array(self._read(image_reader))
+        return array, (self.width / array.shape[1],
+                       self.height / array.shape[0])
+
+    def read_region(self, x: int, y: int, width: int, height: int):
+        array = self._decoded()
+        out = np.zeros((height, width) + array.shape[2:], np.uint8)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        if x0 < x1 and y0 < y1:
+            out[y0 - y:y1 - y, x0 - x:x1 - x] = array[y0:y1, x0:x1]
+        return out
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+
+def open_pyramid(file_name: str, cache: PreviewCache, page: int=0):
+    """
+    Open page `page` of `file_name` and return an `ImagePyramid` over it,
+    seeded with the levels found in `cache`. Safe to call from a worker
+    thread.
+    """
+    with span('load', file=file_name, page=page):
+        pyramid = ImagePyramid(open_reader(file_name, page))
+        pyramid.add_levels(cache.load(file_name, page))
+    return pyramid
 
 
 class BackgroundImage:
     """"
-    Handle an bg_image/bg_image files: show bg_image in scene, rotate,
+    Handle an bg_image/bg_image files: show bg_image in scene,
     cropped a region, etc.
     """
     def __init__(self):
         self.img_file = None
-        self.image = None  # QImage
+        self.page = 0  # page of `img_file` shown
+        self.reader = None  # ImageReader
+        self.pyramid = None  # ImagePyramid over `self.reader`
+        self.background_item = None  # QGraphicsItem shown in scene
+        self.preview_cache = PreviewCache()
+        self.cached_levels = set()  # pyramid levels already on disk
         self.scaling_factor = None  # from displayed to original
+        """(low, high) pixel values shown as black and white, and whether
+        the user chose it rather than `default_window`"""
+        self.window = None
+        self.manual_window = False
+        self.writer = TiffWriter()  # compression of cropped cells
 
-        self.rotation = None
-        self.rotated_image = None
-        self.angle = None
-
+    @traced('display')
     def show_in_scene(self, view):
         """
-            Rescale QPixmap to scene and show it.
+            Show the image as a `TiledBackgroundItem` scaled to the view
+            height. Tiles are decoded from the pyramid level matching the
+            zoom, when they become visible.
 
         Parameters
         ----------
         view:
-            QGraphicsScene
+            GridView
 
         Returns
         -------
 
         """
+        with budget.operation('display'):
+            """Build the level shown at the initial zoom, so that it is
+            cached and the first paint does not read the full-resolution
+            image"""
+            level = self.pyramid.get_level(
+                self.pyramid.level_for_height(view.height()))
+            if not self.manual_window:
+                self.window = default_window(level)
+            item = TiledBackgroundItem(pyramid=self.pyramid,
+                                       window=self.window)
+            self._set_background_item(view, item, self.reader.height)
+            self.update_preview_cache()
 
-        pixmap = QPixmap.fromImage(self.image)
-        pixmap_scaled = pixmap.scaledToHeight(view.height())
-        view.scene.addPixmap(pixmap_scaled)
-        orig_size = pixmap.size()
-        scaled_size = pixmap_scaled.size()
-        self.scaling_factor = scaled_size.height() / orig_size.height()
-
-    def image_from_file(self, file_name):
+    @traced('display.preview')
+    def show_preview(self, view, preview: QImage, scale_x: float,
+                     scale_y: float, full_height: int):
         """
-        Load a TIFF bg_image from file `file_name`
-        as a QImage and set it to `self.image`.
+        Show `preview`, a reduced-resolution copy of the image, scaled to
+        fit the view. Replace the image shown before, if any.
 
         Parameters
         ----------
-        file_name: str
-            full path of bg_image file
+        view:
+            GridView
+        preview: QImage
+            preview image
+        scale_x: float
+            full-resolution pixels spanned by a preview pixel horizontally
+        scale_y: float
+            full-resolution pixels spanned by a preview pixel vertically
+        full_height: int
+            height of the full-resolution image
 
         Returns
         -------
 
         """
-        self.image = QImage(file_name)
+        item = QGraphicsPixmapItem(QPixmap.fromImage(preview))
+        item.setTransformationMode(Qt.SmoothTransformation)
+        self._set_background_item(view, item, full_height, scale_x, scale_y)
 
-    def rotate_image(self, angle):
-        print('rotate_image is called')
-        self.rotation = QTransform()
-        self.rotation.rotateRadians(angle)
-        self.angle = angle
-        self.rotated_image = self.image.transformed(self.rotation)
+    def set_window(self, window: tuple=None):
+        """
+        Change the contrast of the image shown. Only the visible tiles are
+        re-mapped; the pixels cropped are never changed.
 
-    def map_item(self, item):
+        Parameters
+        ----------
+        window: tuple
+            `(low, high)` pixel values shown as black and white. `None`
+            goes back to `default_window` of the level shown.
         """
-        Map item to rotated reference.
-        :param item
-            item in un-rotated coordinates
+        self.manual_window = window is not None
+        if window is None:
+            window = default_window(self.pyramid.get_level(
+                self.pyramid.level_for_height(self.reader.height *
+                                              self.scaling_factor)))
+        self.window = window
+        if isinstance(self.background_item, TiledBackgroundItem):
+            self.background_item.set_window(window)
+
+    def _set_background_item(self, view, item, full_height, scale_x=1.,
+                             scale_y=1.):
+        """Replace the background item by `item`, an item `scale_x` by
+        `scale_y` full-resolution pixels per unit, scaled to the view
+        height"""
+        if isinstance(self.background_item, TiledBackgroundItem):
+            self.background_item.close()
+        if self.background_item is not None:
+            view.scene.removeItem(self.background_item)
+        self.background_item = item
+        self.scaling_factor = view.height() / full_height
+        """Previews rarely divide the image size exactly: stretch each
+        axis so that the preview covers the full-resolution image"""
+        item.setTransform(QTransform.fromScale(scale_x, scale_y))
+        item.setScale(self.scaling_factor)
+        item.setZValue(-1)  # below grids
+        view.scene.addItem(item)
 
-        :return:
-            item in rotated coordinates
+    def update_preview_cache(self):
+        """Save pyramid levels built since the image was opened"""
+        if set(self.pyramid.levels) - self.cached_levels:
+            self.preview_cache.store(self.img_file, self.pyramid.levels,
+                                     self.page)
+            self.cached_levels = set(self.pyramid.levels)
+
+    def image_from_file(self, file_name, page=0):
         """
+        Open page `page` of a TIFF bg_image from file `file_name` and set
+        `self.reader`. Only the file header and the page directory are
+        parsed: pixels are decoded on demand.
 
-        if self.rotation is not None:
-            return self.rotation.map(item)
-        else:
-            return None
+        Parameters
+        ----------
+        file_name: str
+            full path of bg_image file
+        page: int
+            page of a multi-page file
 
-    def del_rotated_image(self):
-        del self.rotated_image
+        Returns
+        -------
 
-    def crop_region(self, coords, angle, file_name):
         """
+        self.set_pyramid(file_name,
+                         open_pyramid(file_name, self.preview_cache, page))
 
-        :param coords:
-        :param angle:
-        :param file_name:
-        :return:
+    def set_pyramid(self, file_name, pyramid: ImagePyramid):
         """
+        Make `pyramid`, opened from `file_name`, the current image. Levels
+        already in `pyramid` are assumed to be in the preview cache.
 
-        print('angle', angle)
+        Parameters
+        ----------
+        file_name: str
+            full path of bg_image file
+        pyramid: ImagePyramid
+            pyramid returned by `open_pyramid`
+
+        Returns
+        -------
+
+        """
+        if self.reader is not None:
+            self.reader.close()
+        self.img_file = file_name
+        self.pyramid = pyramid
+        self.reader = pyramid.reader
+        self.page = self.reader.page
+        self.cached_levels = set(pyramid.levels)
+
+    @traced('crop')
+    def crop_region(self, coords, angle, file_name):
+        """
+        Crop the grid cell with corners `coords` and save it to
+        `file_name`.tif. The cell is sampled straight from the source image
+        with the affine map sending the output rectangle onto the cell, so
+        that the image is never rotated as a whole.
+
+        Parameters
+        ----------
+        coords: list
+            `[tl, bl, br, tr]` cell corners (QPointF) in scene coordinates
+        angle: float
+            grid angle. The cell orientation is implied by `coords`.
+        file_name: str
+            output path without extension
 
-        tl, bl, br, tr = coords
-        print('Original coords', tl, br)
+        Returns
+        -------
 
+        """
         """Scale polygon coordinates to original image size"""
-        scaled_coords = []
-        for coord in coords:
-            scaled_coords.append(coord / self.scaling_factor)
-        tl, bl, br, tr = scaled_coords
-        print('Scaled coords', tl, br)
-
-        """Cast polygon coordinates to rotated image reference"""
-        if self.rotation is not None:
-            rotated_coords = []
-            for scaled_coord in scaled_coords:
-                rotated_coords.append(self.map_item(scaled_coord))
-            tl, bl, br, tr = rotated_coords
-        else:
-            tl, bl, br, tr = scaled_coords
-
-        print('Rotated coords', tl, br)
-
-        corner = self.map_item(QPointF(0, 0))
-        print('new corner', corner)
-
-        """Find rectangle to be cropped"""
-        scaled_rect = QRectF(tl, br).toRect()
-        # TODO rotation do not account for translating coordinate system.
-        # TODO FIX THAT!
-        # TODO there are large images in history. Images should never be outputted
-        # TODO to git directory. Also, I need to remove that from history.
-        # w = self.rotated_image.width()
-        # h = self.rotated_image.height()
-        # scaled_rect = QRectF(QPointF(0, 0), QPointF(w, h)).toRect()
-        height = scaled_rect.height()
-        width = scaled_rect.width()
-        scaled_rect_size = QSize(width, height)
+        corners = np.array([[coord.x(), coord.y()] for coord in coords]) \
+            / self.scaling_factor
 
         try:
-            """Create small image to paste grid square into"""
-            cropped_image = self.rotated_image.copy(scaled_rect)
-
-            """Use a `QPainter` to draw on `destination_image`"""
-            bg_format = self.image.format()
-            destination_image = QImage(scaled_rect_size, bg_format)
-            destination_image.fill(Qt.transparent)  # fill it w transparent bg
-            painter = QPainter(destination_image)
-            painter.drawImage(
-                QRect(0, 0, width, height),
-                cropped_image
-            )
-            painter.end()  # generate an error if I don't call it
-
-        except TypeError as err:
-            print('No bg_image loaded?', err)
+            cell = crop_cell(self.reader, corners)
         except AttributeError as err:
-            print('Could not copy pixmap?', err)
-        except:
-            print("Unexpected error:", sys.exc_info()[0])
-            raise
+            print('No bg_image loaded?', err)
         else:
-            destination_image.save(file_name + '.tif')
+            self.writer.write(cell, file_name)
+
+    def cell_jobs(self, image_coordinates, paths):
+        """
+        Convert grid cells to export jobs.
+
+        Parameters
+        ----------
+        image_coordinates: NumPy Array
+            cells in scene coordinates, as `AdjustableGrid.image_coordinates`
+        paths: list
+            output path (without extension) of each cell
+
+        Returns
+        -------
+        List of `CellJob` with corners in full-resolution pixels
+        """
+        corners = cell_corners(image_coordinates) / self.scaling_factor
+        return [CellJob(cell, path) for cell, path in zip(corners, paths)]
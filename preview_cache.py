@@ -0,0 +1,128 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+import settings
+
+
+class PreviewCache:
+    """
+    On-disk cache of the display pyramid levels of an image. An entry is a
+    directory named after the file identity (absolute path, size and
+    modification time) holding one `.npy` file per level. The modification
+    time of the entry directory records its last use and drives LRU
+    eviction once the cache exceeds `max_bytes`.
+    """
+    def __init__(self, *,
+                 directory: str=None,
+                 max_bytes: int=None):
+        """
+        Parameters
+        ----------
+        directory: str
+            cache location. Default `settings.CACHE_DIR`.
+        max_bytes: int
+            size cap. Default `settings.CACHE_MAX_MB`.
+        """
+        self.directory = settings.CACHE_DIR if directory is None \
+            else directory
+        self.max_bytes = settings.CACHE_MAX_MB * 2 ** 20 if max_bytes is None \
+            else max_bytes
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(file_name: str, page: int=0):
+        """Identity of page `page` of `file_name`: changes whenever the
+        file is replaced or modified."""
+        stat = os.stat(file_name)
+        identity = '{}|{}|{}'.format(os.path.abspath(file_name),
+                                     stat.st_size, stat.st_mtime_ns)
+        if page:
+            identity += '|page{}'.format(page)
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+    def _entry(self, file_name: str, page: int=0):
+        return os.path.join(self.directory, self.key(file_name, page))
+
+    def load(self, file_name: str, page: int=0):
+        """
+        Return the cached levels of `file_name`.
+
+        Parameters
+        ----------
+        file_name: str
+            full path of the image file
+        page: int
+            page of a multi-page file
+
+        Returns
+        -------
+        Dictionary mapping level index to NumPy array (empty on a miss)
+        """
+        if not self.enabled:
+            return {}
+        entry = self._entry(file_name, page)
+        levels = {}
+        try:
+            for name in os.listdir(entry):
+                if name.startswith('level_') and name.endswith('.npy'):
+                    level = int(name[len('level_'):-len('.npy')])
+                    levels[level] = np.load(os.path.join(entry, name))
+            os.utime(entry)  # mark as recently used
+        except (OSError, ValueError) as err:
+            if not isinstance(err, FileNotFoundError):
+                print('Discarding unreadable cache entry', entry, err)
+                shutil.rmtree(entry, ignore_errors=True)
+            return {}
+        return levels
+
+    def store(self, file_name: str, levels: dict, page: int=0):
+        """
+        Save `levels` (level index -> NumPy array) for page `page` of
+        `file_name`, then evict least recently used entries until the cache
+        fits `max_bytes`.
+        """
+        if not self.enabled or not levels:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self._entry(file_name, page)
+        """Write to a temporary directory and rename it, so that readers
+        never see partial entries"""
+        tmp_entry = tempfile.mkdtemp(dir=self.directory, prefix='.tmp_')
+        try:
+            for level, array in levels.items():
+                np.save(os.path.join(tmp_entry, 'level_{}.npy'.format(level)),
+                        array)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp_entry, entry)
+        except OSError as err:
+            print('Could not write cache entry', entry, err)
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache size is at
+        most `max_bytes`."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, size, path))
+            except OSError:
+                continue
+            total += size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
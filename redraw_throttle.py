@@ -0,0 +1,54 @@
+from PyQt5.QtCore import QTimer
+
+import settings
+
+
+class RedrawThrottle:
+    """
+    Merge the redraw requests of fast mouse events: at most one call per
+    frame of `settings.REDRAW_RATE`, with the arguments of the latest
+    request. The first request after an idle frame is served at once, so
+    redraws do not lag behind slow mouse movements.
+    """
+    def __init__(self, *, rate: int=None):
+        """
+        Parameters
+        ----------
+        rate: int
+            calls per second. Default `settings.REDRAW_RATE`, 0 calls on
+            every request.
+        """
+        rate = settings.REDRAW_RATE if rate is None else rate
+        self.pending = None  # (function, args) of the latest request
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(round(1000 / rate) if rate > 0 else 0)
+        self.timer.timeout.connect(self._call_pending)
+        self.enabled = rate > 0
+
+    def request(self, function, *args):
+        """Call `function(*args)` now, or at the end of the current frame
+        if another request is served in the meantime"""
+        self.pending = (function, args)
+        if not self.enabled or not self.timer.isActive():
+            self._call_pending()
+
+    def flush(self):
+        """Serve the pending request now, e.g. when the mouse is
+        released"""
+        self.timer.stop()
+        self._call_pending()
+
+    def cancel(self):
+        """Drop the pending request"""
+        self.pending = None
+        self.timer.stop()
+
+    def _call_pending(self):
+        if self.pending is None:
+            return
+        function, args = self.pending
+        self.pending = None
+        function(*args)
+        if self.enabled:
+            self.timer.start()  # a new frame starts
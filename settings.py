@@ -0,0 +1,50 @@
+"""
+Application-wide settings. Every value can be overridden by the
+environment variable of the same name prefixed by `ALIT_`, e.g.
+`ALIT_CACHE_DIR=/scratch/alit python main.py`.
+"""
+import os
+
+
+def _setting(name, default, cast=str):
+    """Return `ALIT_<name>` from the environment cast by `cast`, or
+    `default` if the variable is not set."""
+    value = os.environ.get('ALIT_' + name)
+    if value is None or value == '':
+        return default
+    return cast(value)
+
+
+"""Directory storing display pyramids of previously opened images"""
+CACHE_DIR = _setting(
+    'CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'alit'))
+"""Size cap of `CACHE_DIR` in MB. Least recently used entries are evicted
+first. 0 disables the cache."""
+CACHE_MAX_MB = _setting('CACHE_MAX_MB', 512, int)
+"""Memory used by decoded background tiles, in MB"""
+TILE_CACHE_MB = _setting('TILE_CACHE_MB', 256, int)
+"""Workers used to crop and save grid cells. 0 means one per CPU core."""
+EXPORT_WORKERS = _setting('EXPORT_WORKERS', 0, int)
+"""`thread` or `process` pool for crop export"""
+EXPORT_EXECUTOR = _setting('EXPORT_EXECUTOR', 'thread')
+"""`batch` reads the image once for a whole grid, `cell` reads each cell
+independently"""
+EXPORT_MODE = _setting('EXPORT_MODE', 'batch')
+"""Compression of exported cells: `none`, `deflate`, and with imagecodecs
+`lzw` or `packbits`"""
+EXPORT_COMPRESSION = _setting('EXPORT_COMPRESSION', 'none')
+"""Deflate level of exported cells, 1 (fastest) to 9 (smallest)"""
+EXPORT_COMPRESSION_LEVEL = _setting('EXPORT_COMPRESSION_LEVEL', 6, int)
+"""Images after the current one decoded in advance in series mode"""
+SERIES_PREFETCH = _setting('SERIES_PREFETCH', 2, int)
+"""Grid redraws per second while the mouse draws, drags or rotates a grid.
+Mouse events arriving faster are merged. 0 redraws on every event."""
+REDRAW_RATE = _setting('REDRAW_RATE', 60, int)
+"""Chrome trace file (JSON) written at exit, with the time spent loading,
+showing, cropping and saving images and laying out grids. Open it in
+chrome://tracing or ui.perfetto.dev. Empty disables tracing."""
+TRACE = _setting('TRACE', '')
+"""Memory held by decoded images, tiles and cell buffers, in MB. Tiles,
+prefetched images and pyramid levels are released when it is exceeded.
+0 means half of the physical memory."""
+MEMORY_BUDGET_MB = _setting('MEMORY_BUDGET_MB', 0, int)
@@ -57,6 +57,11 @@ setup(
         ],
         'test': [
             'ddt',
+            'pytest',
+            'tifffile',
+        ],
+        'codecs': [
+            'imagecodecs',
         ],
         'doc': [
             'numpydoc',
@@ -0,0 +1,107 @@
+"""
+Cells cropped by `affine_crop` against NumPy slices of the source image,
+for grids drawn in every direction.
+"""
+import numpy as np
+import pytest
+
+from affine_crop import crop_cell, batch_crop
+from tiff_reader import TiffReader
+from tiff_writer import TiffWriter
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (300, 400, 3), np.uint8)
+
+
+@pytest.fixture
+def reader(tmp_path, image):
+    path = str(tmp_path / 'image')
+    TiffWriter(compression='deflate').write(image, path)
+    reader = TiffReader(path + '.tif')
+    yield reader
+    reader.close()
+
+
+def drag(corners, direction):
+    """
+    Corners `[tl, bl, br, tr]` of the cell `corners` of a grid drawn
+    left to right and top to bottom, as they are when the grid is drawn in
+    `direction` instead
+    """
+    tl, bl, br, tr = np.asarray(corners, dtype=np.float64)
+    return {'right-down': [tl, bl, br, tr],
+            'left-down': [tr, br, bl, tl],
+            'right-up': [bl, tl, tr, br],
+            'left-up': [br, tr, tl, bl]}[direction]
+
+
+def rotated(corners, phi, centre):
+    """`corners` turned clockwise by `phi` radians around `centre`"""
+    rotation = np.array([[np.cos(phi), -np.sin(phi)],
+                         [np.sin(phi), np.cos(phi)]])
+    return (np.asarray(corners, dtype=np.float64) - centre) @ rotation.T \
+        + centre
+
+
+DIRECTIONS = ['right-down', 'left-down', 'right-up', 'left-up']
+CELL = [(10, 20), (10, 120), (110, 120), (110, 20)]
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS)
+def test_aligned(reader, image, direction):
+    cell = crop_cell(reader, drag(CELL, direction))
+    np.testing.assert_array_equal(cell, image[20:120, 10:110])
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS)
+def test_aligned_outside(reader, image, direction):
+    corners = [(350, -10), (350, 40), (450, 40), (450, -10)]
+    expected = np.zeros((50, 100, 3), np.uint8)
+    expected[10:, :50] = image[:40, 350:]
+    cell = crop_cell(reader, drag(corners, direction))
+    np.testing.assert_array_equal(cell, expected)
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS)
+def test_quarter_turn(reader, image, direction):
+    """A grid turned by 90 degrees samples pixel centres exactly"""
+    corners = rotated(CELL, np.pi / 2, np.array([60., 70.]))
+    cell = crop_cell(reader, drag(corners, direction))
+    np.testing.assert_array_equal(
+        cell, np.rot90(image[20:120, 10:110]))
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS[1:])
+def test_rotated(reader, direction):
+    corners = rotated(CELL, .3, np.array([60., 70.]))
+    np.testing.assert_array_equal(
+        crop_cell(reader, drag(corners, direction)),
+        crop_cell(reader, corners))
+
+
+def test_rotated_upright(reader, image):
+    """A small rotation stays close to the unrotated cell"""
+    centre = np.array([60., 70.])
+    cell = crop_cell(reader, drag(rotated(CELL, 1e-4, centre), 'left-up'))
+    assert cell.shape == (100, 100, 3)
+    difference = cell.astype(int) - image[20:120, 10:110]
+    assert np.abs(difference).max() <= 3
+
+
+@pytest.mark.parametrize('cells', [
+    [CELL],
+    [rotated(CELL, .3, np.array([60., 70.]))],
+    [[(350, -10), (350, 40), (450, 40), (450, -10)],
+     [(-30, 280), (-30, 330), (20, 330), (20, 280)]],
+    [drag(CELL, direction) for direction in DIRECTIONS],
+    [drag(rotated(CELL, phi, np.array([200., 150.])), direction)
+     for phi in (.3, 2., -2.5) for direction in DIRECTIONS]],
+    ids=['aligned', 'rotated', 'outside', 'right-to-left', 'mixed'])
+def test_batch_crop(reader, cells):
+    cropped = dict(batch_crop(reader, cells))
+    assert sorted(cropped) == list(range(len(cells)))
+    for ix, corners in enumerate(cells):
+        np.testing.assert_array_equal(cropped[ix], crop_cell(reader, corners))
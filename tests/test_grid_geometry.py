@@ -0,0 +1,86 @@
+"""
+Vectorized grid geometry against reference loops, the comprehensions
+`grid_geometry` used before.
+"""
+import numpy as np
+import pytest
+
+from grid_geometry import grid_points, cell_quads, cell_coordinates, \
+    cell_corners
+
+
+def reference_points(tl, br, angle, num_rows, num_cols):
+    tl_x, tl_y = tl
+    br_x, br_y = br
+    length = np.hypot(br_x - tl_x, br_y - tl_y)
+    theta = np.arctan2(br_y - tl_y, br_x - tl_x) - angle
+    l1 = length * np.cos(theta)
+    l2 = length * np.sin(theta)
+    xs = np.array([[n * l1 * np.cos(angle) / num_cols -
+                    m * l2 * np.sin(angle) / num_rows + tl_x
+                    for m in range(num_rows + 1)]
+                   for n in range(num_cols + 1)])
+    ys = np.array([[n * l1 * np.sin(angle) / num_cols +
+                    m * l2 * np.cos(angle) / num_rows + tl_y
+                    for m in range(num_rows + 1)]
+                   for n in range(num_cols + 1)])
+    return np.dstack((xs, ys))
+
+
+def reference_cells(grid_pts, num_rows, num_cols):
+    return np.array([[[grid_pts[n, m], grid_pts[n, m + 1]],
+                      [grid_pts[n + 1, m], grid_pts[n + 1, m + 1]]]
+                     for n in range(num_cols) for m in range(num_rows)])
+
+
+GRIDS = [
+    ((120., 80.), (2300., 1640.), 0., 8, 12),
+    ((120., 80.), (2300., 1640.), .01, 16, 24),
+    ((0., 0.), (500., 30.), -.4, 1, 7),
+    ((0., 0.), (30., 500.), .7, 9, 1),
+    ((10., 10.), (20., 20.), 0., 1, 1),
+    ((2300., 1640.), (120., 80.), 0., 5, 3),  # negative spans
+    ((500., 40.), (20., 700.), 2.5, 4, 6),
+    ((50., 900.), (800., 100.), -3., 3, 11),
+]
+
+
+@pytest.mark.parametrize('tl, br, angle, num_rows, num_cols', GRIDS)
+def test_grid_points(tl, br, angle, num_rows, num_cols):
+    grid_pts = grid_points(tl, br, angle, num_rows, num_cols)
+    assert grid_pts.shape == (num_cols + 1, num_rows + 1, 2)
+    np.testing.assert_allclose(
+        grid_pts, reference_points(tl, br, angle, num_rows, num_cols),
+        rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('tl, br, angle, num_rows, num_cols', GRIDS)
+def test_cell_coordinates(tl, br, angle, num_rows, num_cols):
+    grid_pts = grid_points(tl, br, angle, num_rows, num_cols)
+    cells = cell_coordinates(grid_pts, num_rows, num_cols)
+    expected = reference_cells(grid_pts, num_rows, num_cols)
+    assert cells.shape == (num_rows * num_cols, 2, 2, 2)
+    np.testing.assert_array_equal(cells, expected)
+    np.testing.assert_array_equal(
+        cell_quads(grid_pts).reshape(-1, 2, 2, 2), expected)
+    np.testing.assert_array_equal(
+        cell_corners(cells),
+        expected[:, (0, 0, 1, 1), (0, 1, 1, 0)])
+
+
+def test_cell_quads_views():
+    """Cells are read-only views sharing the corners of the grid points,
+    also when those are not contiguous"""
+    grid_pts = grid_points((0., 0.), (40., 30.), .2, 3, 4)
+    quads = cell_quads(grid_pts)
+    assert not quads.flags.writeable
+    assert np.shares_memory(quads, grid_pts)
+    transposed = np.transpose(grid_points((0., 0.), (30., 40.), .2, 4, 3),
+                              (1, 0, 2))
+    np.testing.assert_array_equal(
+        cell_quads(transposed).reshape(-1, 2, 2, 2),
+        reference_cells(transposed, 3, 4))
+    cells = cell_coordinates(grid_pts, 3, 4)
+    cells[0] = 0
+    np.testing.assert_array_equal(quads[1, 0], reference_cells(
+        grid_pts, 3, 4)[3])
@@ -0,0 +1,109 @@
+"""
+Grid templates written and read back, and malformed template files.
+"""
+import json
+
+import numpy as np
+import pytest
+
+import tile_cli
+from grid_template import GridTemplate, save_templates, load_templates, \
+    FORMAT
+
+
+TEMPLATES = [
+    GridTemplate(tl=(120.5, 80.), br=(2300., 1640.25), phi=.01,
+                 num_rows=8, num_cols=12, name='Grid  (8x12)'),
+    GridTemplate(tl=(900., 700.), br=(100., 50.), phi=-2.1, num_rows=1,
+                 num_cols=3, sign_x=-1, sign_y=-1, name='reversed'),
+]
+
+
+def write_json(path, data):
+    with open(path, 'w') as file:
+        json.dump(data, file)
+    return str(path)
+
+
+def template_file(path, grids, **fields):
+    data = {'format': FORMAT, 'version': 1, 'image_size': [2400, 1700],
+            'grids': grids}
+    data.update(fields)
+    return write_json(path, data)
+
+
+def test_round_trip(tmp_path):
+    file_name = str(tmp_path / 'layout.json')
+    save_templates(file_name, TEMPLATES, image_size=(2400, 1700))
+    templates, image_size = load_templates(file_name)
+    assert image_size == (2400, 1700)
+    assert [template.to_dict() for template in templates] == \
+        [template.to_dict() for template in TEMPLATES]
+    for template, expected in zip(templates, TEMPLATES):
+        np.testing.assert_array_equal(template.cell_corners(),
+                                      expected.cell_corners())
+        assert [job.path for job in template.jobs('out')] == \
+            [job.path for job in expected.jobs('out')]
+
+
+def test_round_trip_without_image_size(tmp_path):
+    file_name = str(tmp_path / 'layout.json')
+    save_templates(file_name, TEMPLATES[:1])
+    templates, image_size = load_templates(file_name)
+    assert image_size is None
+    assert templates[0].to_dict() == TEMPLATES[0].to_dict()
+
+
+def test_defaults(tmp_path):
+    """Angle, signs and name may be left out"""
+    file_name = template_file(tmp_path / 'layout.json', [
+        {'tl': [0, 0], 'br': [10, 20], 'num_rows': 2, 'num_cols': 1}])
+    [template], _ = load_templates(file_name)
+    assert (template.phi, template.sign_x, template.sign_y,
+            template.name) == (0., 1, 1, '')
+
+
+GRID = TEMPLATES[0].to_dict()
+
+
+@pytest.mark.parametrize('data', [
+    [],
+    {'version': 1, 'grids': []},
+    {'format': FORMAT, 'version': 2, 'grids': []},
+    {'format': FORMAT, 'version': '1', 'grids': []},
+    {'format': FORMAT, 'version': 1},
+    {'format': FORMAT, 'version': 1, 'grids': {}},
+    {'format': FORMAT, 'version': 1, 'grids': [], 'image_size': 5},
+    {'format': FORMAT, 'version': 1, 'grids': [[1, 2]]},
+    {'format': FORMAT, 'version': 1,
+     'grids': [{key: value for key, value in GRID.items() if key != 'br'}]},
+    {'format': FORMAT, 'version': 1,
+     'grids': [{key: value for key, value in GRID.items()
+                if key != 'num_rows'}]},
+    {'format': FORMAT, 'version': 1, 'grids': [dict(GRID, tl=[1, 2, 3])]},
+    {'format': FORMAT, 'version': 1, 'grids': [dict(GRID, tl='12')]},
+    {'format': FORMAT, 'version': 1, 'grids': [dict(GRID, br=['a', 2])]},
+    {'format': FORMAT, 'version': 1, 'grids': [dict(GRID, phi=None)]},
+    {'format': FORMAT, 'version': 1, 'grids': [dict(GRID, num_cols=0)]},
+    {'format': FORMAT, 'version': 1, 'grids': [dict(GRID, name=3)]},
+])
+def test_malformed(tmp_path, data):
+    with pytest.raises(ValueError):
+        load_templates(write_json(tmp_path / 'layout.json', data))
+
+
+def test_not_json(tmp_path):
+    file_name = tmp_path / 'layout.json'
+    file_name.write_text('{"format": ')
+    with pytest.raises(ValueError):
+        load_templates(str(file_name))
+
+
+def test_cli_reports_malformed_template(tmp_path, capsys):
+    grid = {key: value for key, value in GRID.items() if key != 'num_cols'}
+    file_name = template_file(tmp_path / 'layout.json', [grid])
+    status = tile_cli.main(['image.tif', '--template', file_name,
+                            '--output', str(tmp_path / 'out')])
+    assert status == 2
+    assert 'Can\'t read template:' in capsys.readouterr().err
+    assert not (tmp_path / 'out').exists()
@@ -0,0 +1,58 @@
+"""
+`LoadImageTask` run in the calling thread, with the pyramid replaced by
+stubs.
+"""
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt5')
+import image_loader  # noqa: E402
+from image_pyramid import BuildCancelled  # noqa: E402
+from preview_cache import PreviewCache  # noqa: E402
+
+
+class Reader:
+    height = 400
+    closed = False
+
+    def read_reduced(self, step):
+        return np.zeros((400 // step, 300 // step), np.uint8), (step, step)
+
+    def close(self):
+        self.closed = True
+
+
+class Pyramid:
+    """Pyramid whose level build raises `error`"""
+    def __init__(self, error):
+        self.reader = Reader()
+        self.levels = {}
+        self.error = error
+
+    def level_for_height(self, height):
+        return 1
+
+    def get_level(self, level, is_cancelled):
+        raise self.error
+
+
+@pytest.mark.parametrize('error', [RuntimeError('corrupt strip'),
+                                   MemoryError(), BuildCancelled()])
+def test_reader_closed_on_error(tmp_path, monkeypatch, error):
+    pyramid = Pyramid(error)
+    monkeypatch.setattr(image_loader, 'open_pyramid',
+                        lambda file_name, cache, page: pyramid)
+    task = image_loader.LoadImageTask(
+        request_id=1, file_name='image.tif', view_height=200,
+        cache=PreviewCache(directory=str(tmp_path), max_bytes=0),
+        cancel_event=threading.Event(), preview=False)
+    failed, loaded = [], []
+    task.signals.sig_failed.connect(lambda *args: failed.append(args))
+    task.signals.sig_loaded.connect(lambda *args: loaded.append(args))
+    task.run()
+    assert pyramid.reader.closed
+    assert not loaded
+    assert failed == ([] if isinstance(error, BuildCancelled) else
+                      [(1, 'image.tif', str(error))])
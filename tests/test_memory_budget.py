@@ -0,0 +1,189 @@
+"""
+`MemoryBudget` accounting, release callbacks and operation peaks, on
+budgets of their own rather than the shared `budget`.
+"""
+import gc
+import threading
+
+import pytest
+
+from memory_budget import MemoryBudget, CELLS, LEVELS, PREFETCH, TILES
+
+
+class Owner:
+    """Buffers that can be released, logging the calls"""
+    def __init__(self, budget, kind, held, log, *, any_thread=False):
+        self.kind = kind
+        self.held = held
+        self.log = log
+        self.account = budget.account(kind, owner=self, release=self.release,
+                                      any_thread=any_thread)
+        self.account.add(held)
+
+    def release(self, num_bytes):
+        self.log.append((self.kind, num_bytes))
+        freed = min(num_bytes, self.held)
+        self.held -= freed
+        self.account.remove(freed)
+
+
+def test_add_and_remove():
+    budget = MemoryBudget(max_bytes=100)
+    cells = budget.account(CELLS)
+    tiles = budget.account(TILES)
+    cells.add(30)
+    tiles.add(20)
+    cells.remove(10)
+    assert (cells.num_bytes, tiles.num_bytes, budget.total) == (20, 20, 40)
+    assert budget.held[CELLS] == 20 and budget.held[TILES] == 20
+    cells.close()
+    assert cells.num_bytes == 0 and budget.total == 20
+    assert budget.summary() == 'tiles 0 MB'
+
+
+def test_set_kind():
+    budget = MemoryBudget(max_bytes=100)
+    account = budget.account(PREFETCH)
+    account.add(40)
+    account.set_kind(LEVELS)
+    assert budget.held[PREFETCH] == 0 and budget.held[LEVELS] == 40
+    account.close()
+    assert budget.held[LEVELS] == 0 and budget.total == 0
+
+
+def test_closed_with_owner():
+    budget = MemoryBudget(max_bytes=100)
+    owner = Owner(budget, LEVELS, 60, [])
+    assert budget.total == 60
+    del owner
+    gc.collect()
+    assert budget.total == 0
+    assert not budget._releasers
+
+
+def test_release_by_priority():
+    budget = MemoryBudget(max_bytes=100)
+    log = []
+    levels = Owner(budget, LEVELS, 40, log)
+    prefetch = Owner(budget, PREFETCH, 30, log)
+    tiles = Owner(budget, TILES, 20, log)
+    cells = budget.account(CELLS)
+    cells.add(20)
+    """10 bytes over: the tiles are enough"""
+    assert log == [(TILES, 10)]
+    cells.add(25)
+    """25 over: the 10 bytes of tiles left, then prefetched images"""
+    assert log[1:] == [(TILES, 25), (PREFETCH, 15)]
+    assert budget.total == 100
+    assert (levels.held, prefetch.held, tiles.held) == (40, 15, 0)
+
+
+def test_release_not_on_removal():
+    budget = MemoryBudget(max_bytes=100)
+    log = []
+    owner = Owner(budget, TILES, 30, log)
+    budget.max_bytes = 10
+    owner.account.remove(5)
+    assert log == [] and budget.total == 25
+
+
+def test_release_thread():
+    """Callbacks run on the thread that registered them, unless
+    registered with `any_thread`"""
+    budget = MemoryBudget(max_bytes=100)
+    log = []
+    gui = Owner(budget, TILES, 50, log)
+    worker = Owner(budget, LEVELS, 50, log, any_thread=True)
+    cells = budget.account(CELLS)
+    thread = threading.Thread(target=cells.add, args=(10,))
+    thread.start()
+    thread.join()
+    assert log == [(LEVELS, 10)]
+    cells.add(10)
+    assert log[1:] == [(TILES, 10)]
+    assert (gui.held, worker.held) == (40, 40)
+
+
+def test_warn_once(capsys):
+    """Warned once while releasing does not meet the budget, and again
+    after it was met"""
+    budget = MemoryBudget(max_bytes=10)
+    log = []
+    owner = Owner(budget, TILES, 5, log)
+    cells = budget.account(CELLS)
+    cells.add(20)
+    cells.add(1)
+    assert log == [(TILES, 15), (TILES, 11)] and budget.total == 21
+    assert capsys.readouterr().out.count('Memory budget exceeded') == 1
+    cells.remove(15)
+    owner.held += 5
+    owner.account.add(5)
+    assert budget.total == 10
+    assert capsys.readouterr().out == ''
+    cells.add(5)
+    assert budget.total == 11
+    assert capsys.readouterr().out.count('Memory budget exceeded') == 1
+
+
+def test_callbacks_run_without_budget_lock():
+    """A release callback taking its owner's lock does not deadlock with
+    a thread holding that lock and counting bytes"""
+    budget = MemoryBudget(max_bytes=100)
+    lock = threading.Lock()
+    releasing = threading.Event()
+
+    class LockedOwner(Owner):
+        def release(self, num_bytes):
+            releasing.set()
+            with lock:
+                super().release(num_bytes)
+
+    log = []
+    owner = LockedOwner(budget, LEVELS, 80, log, any_thread=True)
+    cells = budget.account(CELLS)
+    locked = threading.Event()
+
+    def add_locked():
+        """Count bytes holding `lock` while the callback waits for it"""
+        with lock:
+            locked.set()
+            releasing.wait(5)
+            owner.account.add(1)
+
+    threads = [threading.Thread(target=add_locked, daemon=True),
+               threading.Thread(target=cells.add, args=(40,), daemon=True)]
+    threads[0].start()
+    assert locked.wait(5)
+    threads[1].start()
+    for thread in threads:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+    assert log == [(LEVELS, 20)]
+
+
+def test_operation_peaks():
+    budget = MemoryBudget(max_bytes=1000)
+    cells = budget.account(CELLS)
+    cells.add(10)
+    with budget.operation('crop'):
+        cells.add(50)
+        with budget.operation('save'):
+            cells.add(30)
+            cells.remove(80)
+            cells.add(5)
+        cells.remove(5)
+    assert budget.peaks == {'crop': 90, 'save': 90}
+    with budget.operation('crop'):
+        pass
+    assert budget.peaks['crop'] == 10
+
+
+def test_operation_peak_on_error():
+    budget = MemoryBudget(max_bytes=1000)
+    cells = budget.account(CELLS)
+    with pytest.raises(RuntimeError):
+        with budget.operation('crop'):
+            cells.add(70)
+            raise RuntimeError
+    assert budget.peaks['crop'] == 70
+    assert not budget._active
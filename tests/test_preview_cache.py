@@ -0,0 +1,149 @@
+"""
+`PreviewCache` keys, atomic writes and LRU eviction, in a temporary
+directory.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from preview_cache import PreviewCache
+
+
+LEVELS = {2: np.arange(64, dtype=np.uint8).reshape(8, 8),
+          3: np.arange(16, dtype=np.uint8).reshape(4, 4)}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PreviewCache(directory=str(tmp_path / 'cache'),
+                        max_bytes=2 ** 20)
+
+
+def image_file(tmp_path, name='image.tif', content=b'II*\0' + bytes(60)):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def entries(cache):
+    return sorted(os.listdir(cache.directory))
+
+
+def assert_levels_equal(levels, expected):
+    assert sorted(levels) == sorted(expected)
+    for level, array in expected.items():
+        np.testing.assert_array_equal(levels[level], array)
+
+
+def test_key(tmp_path):
+    file_name = image_file(tmp_path)
+    key = PreviewCache.key(file_name)
+    assert PreviewCache.key(file_name) == key
+    assert PreviewCache.key(file_name, 1) != key
+    stat = os.stat(file_name)
+    os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    touched = PreviewCache.key(file_name)
+    assert touched != key
+    """Same modification time, other size"""
+    stat = os.stat(file_name)
+    with open(file_name, 'ab') as file:
+        file.write(b'\0')
+    os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert PreviewCache.key(file_name) not in (key, touched)
+
+
+def test_store_and_load(tmp_path, cache):
+    file_name = image_file(tmp_path)
+    assert cache.load(file_name) == {}
+    cache.store(file_name, LEVELS)
+    assert_levels_equal(cache.load(file_name), LEVELS)
+    assert cache.load(file_name, 1) == {}
+
+
+def test_modified_file_misses(tmp_path, cache):
+    file_name = image_file(tmp_path)
+    cache.store(file_name, LEVELS)
+    image_file(tmp_path, content=b'MM\0*' + bytes(100))
+    assert cache.load(file_name) == {}
+
+
+def test_disabled(tmp_path):
+    cache = PreviewCache(directory=str(tmp_path / 'cache'), max_bytes=0)
+    file_name = image_file(tmp_path)
+    cache.store(file_name, LEVELS)
+    assert not os.path.exists(cache.directory)
+    assert cache.load(file_name) == {}
+
+
+def test_failed_store_keeps_previous_entry(tmp_path, cache, monkeypatch):
+    """An entry is replaced by a rename once fully written: a write
+    failing half way leaves the previous entry and no temporary files"""
+    file_name = image_file(tmp_path)
+    cache.store(file_name, LEVELS)
+    save = np.save
+    saved = []
+
+    def failing_save(path, array):
+        if saved:
+            raise OSError('disk full')
+        saved.append(path)
+        save(path, array)
+
+    monkeypatch.setattr(np, 'save', failing_save)
+    cache.store(file_name, {2: LEVELS[2] + 1, 3: LEVELS[3] + 1})
+    assert len(saved) == 1
+    assert entries(cache) == [PreviewCache.key(file_name)]
+    assert_levels_equal(cache.load(file_name), LEVELS)
+
+
+def test_failed_rename(tmp_path, cache, monkeypatch):
+    file_name = image_file(tmp_path)
+
+    def failing_replace(source, destination):
+        raise OSError('read-only')
+
+    monkeypatch.setattr(os, 'replace', failing_replace)
+    cache.store(file_name, LEVELS)
+    assert entries(cache) == []
+    assert cache.load(file_name) == {}
+
+
+def test_unreadable_entry_is_discarded(tmp_path, cache):
+    file_name = image_file(tmp_path)
+    cache.store(file_name, LEVELS)
+    entry = os.path.join(cache.directory, PreviewCache.key(file_name))
+    with open(os.path.join(entry, 'level_2.npy'), 'wb') as file:
+        file.write(b'not an array')
+    assert cache.load(file_name) == {}
+    assert entries(cache) == []
+
+
+def test_evict_least_recently_used(tmp_path):
+    """Entries are evicted by the modification time of their directory,
+    which `load` refreshes"""
+    level = {0: np.zeros((100, 100), np.uint8)}  # 10 kB per entry
+    cache = PreviewCache(directory=str(tmp_path / 'cache'),
+                         max_bytes=35000)
+    files = [image_file(tmp_path, 'image_{}.tif'.format(ix))
+             for ix in range(4)]
+    for ix, file_name in enumerate(files[:3]):
+        cache.store(file_name, level)
+        entry = os.path.join(cache.directory, PreviewCache.key(file_name))
+        os.utime(entry, (1e9 + ix, 1e9 + ix))
+    assert len(entries(cache)) == 3
+    """Use the oldest entry: the second oldest is evicted instead"""
+    assert cache.load(files[0])
+    cache.store(files[3], level)
+    assert entries(cache) == sorted(
+        PreviewCache.key(file_name)
+        for file_name in (files[0], files[2], files[3]))
+    assert cache.load(files[1]) == {}
+
+
+def test_evict_skips_temporary_entries(tmp_path, cache):
+    """Entries being written by another process are not evicted"""
+    os.makedirs(os.path.join(cache.directory, '.tmp_writing'))
+    cache.max_bytes = 1
+    cache.evict()
+    assert entries(cache) == ['.tmp_writing']
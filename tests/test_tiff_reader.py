@@ -0,0 +1,45 @@
+"""
+`TiffReader` resources and the `open_reader` fallback to Qt.
+"""
+import numpy as np
+import pytest
+
+from tiff_reader import TiffReader, open_reader
+from tiff_writer import TiffWriter
+
+
+@pytest.mark.parametrize('compression', ['none', 'deflate'])
+def test_close_unmaps(tmp_path, compression):
+    image = np.arange(120 * 90, dtype=np.uint16).reshape(120, 90)
+    path = str(tmp_path / 'image')
+    TiffWriter(compression=compression).write(image, path)
+    reader = TiffReader(path + '.tif')
+    np.testing.assert_array_equal(reader.read_region(10, 20, 30, 40),
+                                  image[20:60, 10:40])
+    np.testing.assert_array_equal(reader.read_strided(3), image[::3, ::3])
+    reader.close()
+    assert reader._mm.closed
+    assert reader._file.closed
+
+
+def test_open_reader_tiff(tmp_path, recwarn):
+    path = str(tmp_path / 'image')
+    TiffWriter().write(np.zeros((8, 8), np.uint8), path)
+    reader = open_reader(path + '.tif')
+    assert isinstance(reader, TiffReader)
+    reader.close()
+    assert not recwarn.list
+
+
+def test_open_reader_falls_back_to_qt(tmp_path):
+    QtGui = pytest.importorskip('PyQt5.QtGui')
+    image = QtGui.QImage(16, 12, QtGui.QImage.Format_RGB32)
+    image.fill(QtGui.QColor(10, 20, 30))
+    path = str(tmp_path / 'image.png')
+    assert image.save(path)
+    with pytest.warns(UserWarning, match='Falling back to QImage'):
+        reader = open_reader(path)
+    assert not isinstance(reader, TiffReader)
+    assert (reader.width, reader.height) == (16, 12)
+    assert tuple(reader.read_region(0, 0, 2, 2)[0, 0, :3]) == (10, 20, 30)
+    reader.close()
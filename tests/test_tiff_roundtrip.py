@@ -0,0 +1,148 @@
+"""
+Round trips of `TiffReader`, `TiffWriter` and the codecs against tifffile,
+the reference TIFF implementation.
+"""
+import numpy as np
+import pytest
+
+import tiff_codecs
+from tiff_reader import TiffReader
+from tiff_writer import TiffWriter, COMPRESSIONS
+
+tifffile = pytest.importorskip('tifffile')
+
+"""tifffile compression names of the compressions `TiffReader` decodes"""
+READ_COMPRESSIONS = {tiff_codecs.COMPRESSION_NONE: None,
+                     tiff_codecs.COMPRESSION_LZW: 'lzw',
+                     tiff_codecs.COMPRESSION_DEFLATE: 'zlib',
+                     tiff_codecs.COMPRESSION_PACKBITS: 'packbits'}
+
+
+def random_image(shape, dtype, seed=0):
+    """Noise with runs, so that every codec has something to compress"""
+    rng = np.random.default_rng(seed)
+    if np.dtype(dtype).kind == 'f':
+        image = rng.random(shape).astype(dtype)
+    else:
+        image = rng.integers(0, np.iinfo(dtype).max, shape, dtype,
+                             endpoint=True)
+    image[shape[0] // 4:shape[0] // 2] = 7
+    return image
+
+
+@pytest.mark.parametrize('compression', [
+    compression for compression in READ_COMPRESSIONS
+    if compression in tiff_codecs.SUPPORTED_COMPRESSIONS])
+@pytest.mark.parametrize('dtype, shape', [
+    (np.uint8, (301, 257)), (np.uint16, (301, 257)),
+    (np.uint8, (130, 97, 3)), (np.uint16, (77, 50, 4)),
+    (np.float32, (40, 33))])
+@pytest.mark.parametrize('layout', ['strips', 'tiles', 'planar'])
+@pytest.mark.parametrize('byteorder', ['<', '>'])
+def test_read(tmp_path, compression, dtype, shape, layout, byteorder):
+    name = READ_COMPRESSIONS[compression]
+    if name == 'packbits' and np.dtype(dtype).kind == 'f':
+        pytest.skip('tifffile does not write PackBits floats')
+    if layout == 'planar' and len(shape) == 2:
+        pytest.skip('single-sample images have no planar configuration')
+    image = random_image(shape, dtype)
+    options = dict(compression=name, byteorder=byteorder,
+                   bigtiff=byteorder == '>')
+    if layout == 'tiles':
+        options['tile'] = (32, 48)
+    else:
+        options['rowsperstrip'] = 13
+    if name in ('lzw', 'zlib') and np.dtype(dtype).kind == 'u':
+        options['predictor'] = True
+    data = image
+    if layout == 'planar':
+        options['planarconfig'] = 'separate'
+        data = np.moveaxis(image, 2, 0)
+    path = str(tmp_path / 'image.tif')
+    tifffile.imwrite(path, data, photometric='rgb' if len(shape) == 3
+                     else 'minisblack', **options)
+
+    reader = TiffReader(path)
+    try:
+        assert reader.shape == image.shape
+        np.testing.assert_array_equal(
+            reader.read_region(0, 0, reader.width, reader.height), image)
+        """Regions reaching outside the image are padded with zeros"""
+        expected = np.zeros((50, 60) + shape[2:], dtype)
+        inside = image[20:70, :55]
+        expected[:inside.shape[0], 5:5 + inside.shape[1]] = inside
+        np.testing.assert_array_equal(reader.read_region(-5, 20, 60, 50),
+                                      expected)
+        for step in (1, 3, 4, 40):
+            np.testing.assert_array_equal(reader.read_strided(step),
+                                          image[::step, ::step])
+    finally:
+        reader.close()
+
+
+def test_pages_and_reduced_images(tmp_path):
+    image = random_image((1001, 1501, 3), np.uint8)
+    reduced = [image[::2 ** k, ::2 ** k] for k in (1, 2, 3)]
+    path = str(tmp_path / 'pyramid.tif')
+    with tifffile.TiffWriter(path) as writer:
+        writer.write(image, subifds=len(reduced), tile=(128, 128),
+                     photometric='rgb')
+        for level in reduced:
+            writer.write(level, subfiletype=1, tile=(128, 128),
+                         photometric='rgb')
+        writer.write(image[..., 0], photometric='minisblack')
+
+    reader = TiffReader(path)
+    try:
+        assert reader.num_pages == 2
+        array, scale = reader.read_reduced(4)
+        np.testing.assert_array_equal(array, reduced[1])
+        assert scale == (1501 / 376, 1001 / 251)
+        np.testing.assert_array_equal(reader.reduced_image(126, 188),
+                                      reduced[2])
+    finally:
+        reader.close()
+    reader = TiffReader(path, 1)
+    try:
+        np.testing.assert_array_equal(
+            reader.read_region(0, 0, reader.width, reader.height),
+            image[..., 0])
+        assert reader.reduced_image(501, 751) is None
+    finally:
+        reader.close()
+
+
+@pytest.mark.parametrize('compression', sorted(COMPRESSIONS))
+@pytest.mark.parametrize('dtype, shape', [
+    (np.uint8, (301, 257)), (np.uint16, (120, 90, 3)),
+    (np.float32, (40, 33))])
+def test_write(tmp_path, compression, dtype, shape):
+    image = random_image(shape, dtype)
+    path = str(tmp_path / 'cell')
+    TiffWriter(compression=compression).write(image, path)
+    np.testing.assert_array_equal(tifffile.imread(path + '.tif'), image)
+    reader = TiffReader(path + '.tif')
+    try:
+        np.testing.assert_array_equal(
+            reader.read_region(0, 0, reader.width, reader.height), image)
+    finally:
+        reader.close()
+
+
+@pytest.mark.skipif(tiff_codecs.COMPRESSION_PACKBITS not in
+                    tiff_codecs.ENCODED_COMPRESSIONS,
+                    reason='PackBits is encoded by imagecodecs')
+@pytest.mark.parametrize('rows', [
+    np.zeros((1, 1), np.uint8),
+    np.frombuffer(b'abc' * 1000, np.uint8).reshape(10, 300),
+    np.frombuffer(bytes(range(256)) * 3 + b'\x05' * 300,
+                  np.uint8).reshape(2, 534)])
+def test_packbits(monkeypatch, rows):
+    """Runs are encoded row by row, and decoded with or without
+    imagecodecs"""
+    encoded = tiff_codecs.compress(rows, tiff_codecs.COMPRESSION_PACKBITS)
+    assert tiff_codecs.decompress(
+        encoded, tiff_codecs.COMPRESSION_PACKBITS) == rows.tobytes()
+    monkeypatch.setattr(tiff_codecs, 'imagecodecs', None)
+    assert tiff_codecs.decompress(
+        encoded, tiff_codecs.COMPRESSION_PACKBITS) == rows.tobytes()
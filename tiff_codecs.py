@@ -0,0 +1,152 @@
+import zlib
+import numpy as np
+try:
+    import imagecodecs  # C codecs for LZW and PackBits
+except ImportError:
+    imagecodecs = None
+
+
+"""TIFF compression tags"""
+COMPRESSION_NONE = 1
+COMPRESSION_LZW = 5
+COMPRESSION_DEFLATE = 8
+COMPRESSION_ADOBE_DEFLATE = 32946
+COMPRESSION_PACKBITS = 32773
+
+"""Compressions understood by `decompress`. LZW is only decoded by
+imagecodecs: in pure Python it is about 100 times slower than Qt, so
+without imagecodecs LZW pages are left to `QtImageReader`."""
+SUPPORTED_COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_DEFLATE,
+                          COMPRESSION_ADOBE_DEFLATE, COMPRESSION_PACKBITS) \
+    + ((COMPRESSION_LZW,) if imagecodecs is not None else ())
+"""Compressions encoded by `compress`. LZW and PackBits need imagecodecs:
+pure Python encoders hold the GIL for seconds per cell."""
+ENCODED_COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_DEFLATE) + (
+    (COMPRESSION_LZW, COMPRESSION_PACKBITS) if imagecodecs is not None
+    else ())
+
+
+def packbits_decode(data: bytes):
+    """
+    Decode PackBits run-length encoded data, with imagecodecs if it is
+    installed.
+
+    Parameters
+    ----------
+    data: bytes
+        compressed strip or tile
+
+    Returns
+    -------
+    Decoded bytes
+    """
+    if imagecodecs is not None:
+        return imagecodecs.packbits_decode(data)
+    out = bytearray()
+    pos = 0
+    length = len(data)
+    while pos < length:
+        header = data[pos]
+        pos += 1
+        if header < 128:
+            """Literal run of header + 1 bytes"""
+            out += data[pos:pos + header + 1]
+            pos += header + 1
+        elif header > 128:
+            """Repeat next byte 257 - header times"""
+            out += data[pos:pos + 1] * (257 - header)
+            pos += 1
+        # header == 128 is a no-op
+    return bytes(out)
+
+
+def compress(data, compression: int, level: int=6):
+    """
+    Compress a strip.
+
+    Parameters
+    ----------
+    data: NumPy Array
+        uncompressed strip of shape (rows, ...). PackBits runs are
+        encoded row by row.
+    compression: int
+        value of the TIFF Compression tag
+    level: int
+        deflate level (1-9)
+
+    Returns
+    -------
+    Encoded bytes
+    """
+    if compression == COMPRESSION_NONE:
+        return bytes(data)
+    if compression in (COMPRESSION_DEFLATE, COMPRESSION_ADOBE_DEFLATE):
+        return zlib.compress(data, level)
+    if compression in ENCODED_COMPRESSIONS:
+        rows = np.ascontiguousarray(data).reshape(len(data), -1).view(
+            np.uint8)
+        if compression == COMPRESSION_LZW:
+            return imagecodecs.lzw_encode(rows)
+        return imagecodecs.packbits_encode(rows)
+    raise ValueError('Unsupported TIFF compression {}'.format(compression))
+
+
+def decompress(data, compression: int):
+    """
+    Decompress a strip or tile.
+
+    Parameters
+    ----------
+    data: buffer
+        raw bytes as stored in the file
+    compression: int
+        value of the TIFF Compression tag
+
+    Returns
+    -------
+    Decoded buffer
+    """
+    if compression == COMPRESSION_NONE:
+        return data
+    if compression == COMPRESSION_LZW and imagecodecs is not None:
+        return imagecodecs.lzw_decode(data)
+    if compression in (COMPRESSION_DEFLATE, COMPRESSION_ADOBE_DEFLATE):
+        return zlib.decompress(data)
+    if compression == COMPRESSION_PACKBITS:
+        return packbits_decode(bytes(data))
+    raise ValueError('Unsupported TIFF compression {}'.format(compression))
+
+
+def undo_horizontal_predictor(array: np.ndarray):
+    """
+    Undo TIFF horizontal differencing (Predictor = 2) in place.
+
+    Parameters
+    ----------
+    array: NumPy Array
+        segment with shape (rows, cols, samples)
+
+    Returns
+    -------
+    Array with the predictor removed
+    """
+    np.cumsum(array, axis=1, dtype=array.dtype, out=array)
+    return array
+
+
+def apply_horizontal_predictor(array: np.ndarray):
+    """
+    Apply TIFF horizontal differencing (Predictor = 2).
+
+    Parameters
+    ----------
+    array: NumPy Array
+        integer strip with shape (rows, cols, samples)
+
+    Returns
+    -------
+    New array of differences
+    """
+    diff = array.copy()
+    diff[:, 1:] -= array[:, :-1]
+    return diff
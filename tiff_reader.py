@@ -0,0 +1,747 @@
+import mmap
+import struct
+import threading
+import warnings
+from collections import OrderedDict
+from math import gcd
+import numpy as np
+
+from memory_budget import budget, SEGMENTS
+from tiff_codecs import decompress, undo_horizontal_predictor, \
+    SUPPORTED_COMPRESSIONS
+from tracing import traced
+
+
+class UnsupportedImageError(Exception):
+    """Raised when a reader cannot decode a given file."""
+    pass
+
+
+class ImageReader:
+    """
+    Base class for random-access image readers. A reader exposes the size
+    of the full-resolution image and decodes only the regions that are
+    requested. Pixel data are returned as NumPy arrays of shape
+    (height, width) for single-channel images and (height, width, samples)
+    otherwise.
+    """
+    def __init__(self):
+        self.file_name = None
+        self.width = 0
+        self.height = 0
+        self.samples = 1  # samples (channels) per pixel
+        self.dtype = np.dtype(np.uint8)
+        self.band_height = 1  # rows decoded at once by the backend
+        self.page = 0  # page (channel, z-plane, timepoint) being read
+
+    @property
+    def shape(self):
+        """Shape of the full-resolution array"""
+        if self.samples == 1:
+            return self.height, self.width
+        return self.height, self.width, self.samples
+
+    def read_region(self, x: int, y: int, width: int, height: int):
+        """
+        Decode the rectangle with top left corner (`x`, `y`) and size
+        `width` x `height`. Pixels outside the image are set to zero.
+
+        Parameters
+        ----------
+        x: int
+            left edge in full-resolution pixels
+        y: int
+            top edge in full-resolution pixels
+        width: int
+            region width
+        height: int
+            region height
+
+        Returns
+        -------
+        NumPy array
+        """
+        raise NotImplementedError
+
+    def iter_bands(self, y_start: int=0, y_stop: int=None,
+                   min_rows: int=64, align: int=1, *,
+                   x_start: int=0, x_stop: int=None):
+        """
+        Iterate over bands of rows, in file order. Each band is aligned to
+        the backend `band_height` so that every strip or tile row is decoded
+        exactly once.
+
+        Parameters
+        ----------
+        y_start: int
+            first row
+        y_stop: int
+            last row (excluded). Default is the image height.
+        min_rows: int
+            minimum number of rows per band
+        align: int
+            band height is also a multiple of `align`
+        x_start: int
+            first column
+        x_stop: int
+            last column (excluded). Default is the image width.
+
+        Returns
+        -------
+        Generator of `(y, band)` tuples
+        """
+        y_stop = self.height if y_stop is None else min(y_stop, self.height)
+        x_stop = self.width if x_stop is None else min(x_stop, self.width)
+        unit = self.band_height * align // gcd(self.band_height, align)
+        rows = max(1, -(-min_rows // unit)) * unit
+        y = y_start - y_start % self.band_height
+        while y < y_stop:
+            band_stop = min(y + rows, y_stop)
+            band_start = max(y, y_start)
+            yield band_start, self.read_region(x_start, band_start,
+                                               x_stop - x_start,
+                                               band_stop - band_start)
+            y += rows
+
+    def read_strided(self, step: int):
+        """
+        Nearest-neighbour downsample by an integer `step`, streaming the
+        image band by band so that memory stays proportional to the output.
+
+        Parameters
+        ----------
+        step: int
+            keep one pixel every `step` pixels along both axes
+
+        Returns
+        -------
+        NumPy array
+        """
+        step = max(1, int(step))
+        out_height = -(-self.height // step)
+        out_width = -(-self.width // step)
+        out = np.empty((out_height, out_width) + self.shape[2:], self.dtype)
+        for y, band in self.iter_bands(min_rows=step):
+            first = (-y) % step
+            sampled = band[first::step, ::step]
+            out_y = (y + first) // step
+            out[out_y:out_y + sampled.shape[0]] = sampled
+        return out
+
+    def read_reduced(self, step: int):
+        """
+        Image downscaled by about `step`, at least `ceil(size / step)`
+        pixels wide and high, read as cheaply as the backend allows.
+
+        Parameters
+        ----------
+        step: int
+            downscaling factor
+
+        Returns
+        -------
+        `(array, (scale_x, scale_y))`, where the scales are the
+        full-resolution pixels spanned by a pixel of `array`
+        """
+        step = max(1, int(step))
+        return self.read_strided(step), (float(step), float(step))
+
+    def reduced_image(self, height: int, width: int):
+        """
+        Reduced-resolution copy of the image of size `height` x `width`
+        stored in the file, or `None` if there is none.
+        """
+        return None
+
+    @property
+    def num_pages(self):
+        """Number of pages in the file"""
+        return 1
+
+    def close(self):
+        """Release file handles"""
+        pass
+
+
+class TiffReader(ImageReader):
+    """
+    Memory-mapped reader for striped or tiled TIFF and BigTIFF files. Only
+    the header and the image file directory of the selected page are
+    parsed on construction; strips and tiles are decoded on demand by
+    `read_region`. The IFD chain is walked lazily, reading only directory
+    sizes and subfile types, so that opening a page of a large multi-page
+    file does not touch the other pages.
+
+    Decoded strips and tiles that a read only partly covers horizontally
+    are kept in a small cache, so that reading neighbouring regions (e.g.
+    the display tiles of one strip) decodes each of them once. Readers are
+    thread-safe.
+    """
+    segment_cache_bytes = 2 ** 26  # decoded strips and tiles kept
+    """Tag codes"""
+    NEW_SUBFILE_TYPE = 254
+    IMAGE_WIDTH = 256
+    IMAGE_LENGTH = 257
+    BITS_PER_SAMPLE = 258
+    COMPRESSION = 259
+    PHOTOMETRIC = 262
+    STRIP_OFFSETS = 273
+    SAMPLES_PER_PIXEL = 277
+    ROWS_PER_STRIP = 278
+    STRIP_BYTE_COUNTS = 279
+    PLANAR_CONFIG = 284
+    PREDICTOR = 317
+    COLOR_MAP = 320
+    TILE_WIDTH = 322
+    TILE_LENGTH = 323
+    TILE_OFFSETS = 324
+    TILE_BYTE_COUNTS = 325
+    SUB_IFDS = 330
+    SAMPLE_FORMAT = 339
+
+    """TIFF field type -> NumPy type code"""
+    field_types = {1: 'u1', 2: 'u1', 3: 'u2', 4: 'u4', 5: 'u4', 6: 'i1',
+                   7: 'u1', 8: 'i2', 9: 'i4', 10: 'i4', 11: 'f4', 12: 'f8',
+                   13: 'u4', 16: 'u8', 17: 'i8', 18: 'u8'}
+
+    def __init__(self, file_name: str, page: int=0, *,
+                 subfile_offset: int=None):
+        """
+        Parameters
+        ----------
+        file_name: str
+            TIFF or BigTIFF file
+        page: int
+            page to read. Reduced-resolution subfiles are not counted as
+            pages.
+        subfile_offset: int
+            IFD offset of a reduced-resolution subfile of `page` to read
+            instead of the page itself
+        """
+        super().__init__()
+        self.file_name = file_name
+        """Strip/tile index -> decoded array, least recently used first"""
+        self._segments = OrderedDict()
+        self._segments_bytes = 0
+        self._segments_lock = threading.Lock()
+        self.segments_account = budget.account(
+            SEGMENTS, owner=self, release=self.release_segments,
+            any_thread=True)
+        self._file = open(file_name, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise UnsupportedImageError('Empty file: ' + file_name)
+        try:
+            self._parse_header()
+            self.page = page
+            if subfile_offset is None:
+                subfile_offset = self._page_offset(page)
+            self._set_layout(self._read_ifd(subfile_offset))
+        except (struct.error, IndexError, KeyError, ValueError) as err:
+            self.close()
+            raise UnsupportedImageError(
+                'Cannot parse TIFF {}: {}'.format(file_name, err))
+        except UnsupportedImageError:
+            self.close()
+            raise
+
+    def _parse_header(self):
+        """Read byte order, TIFF flavour and first IFD offset"""
+        byte_order = self._mm[:2]
+        if byte_order == b'II':
+            self._byte_order = '<'
+        elif byte_order == b'MM':
+            self._byte_order = '>'
+        else:
+            raise UnsupportedImageError('Not a TIFF file')
+        bo = self._byte_order
+        (version,) = struct.unpack(bo + 'H', self._mm[2:4])
+        if version == 42:
+            """Classic TIFF: 32-bit offsets"""
+            self._offset_format = 'I'
+            self._count_format = 'H'
+            self._entry_size = 12
+            (self._first_ifd,) = struct.unpack(bo + 'I', self._mm[4:8])
+        elif version == 43:
+            """BigTIFF: 64-bit offsets"""
+            offset_size, _ = struct.unpack(bo + 'HH', self._mm[4:8])
+            if offset_size != 8:
+                raise UnsupportedImageError(
+                    'Unsupported BigTIFF offset size {}'.format(offset_size))
+            self._offset_format = 'Q'
+            self._count_format = 'Q'
+            self._entry_size = 20
+            (self._first_ifd,) = struct.unpack(bo + 'Q', self._mm[8:16])
+        else:
+            raise UnsupportedImageError('Unsupported TIFF version '
+                                        '{}'.format(version))
+        self._offset_size = struct.calcsize(self._offset_format)
+        self._page_offsets = []  # IFD offsets of the pages found so far
+        """(page, IFD offset) of the reduced-resolution images following a
+        page in the chain"""
+        self._reduced_offsets = []
+        self._subfiles = None  # reduced images of the page, found on demand
+        self._ifd_walker = self._walk_ifds()
+
+    def _ifd_entries(self, offset: int):
+        """Number of entries of the IFD at `offset` and offset of the first
+        entry"""
+        count_size = struct.calcsize(self._count_format)
+        (num_entries,) = struct.unpack(
+            self._byte_order + self._count_format,
+            self._mm[offset:offset + count_size])
+        return num_entries, offset + count_size
+
+    def _walk_ifds(self):
+        """Generator of `(offset, reduced)` for the IFDs of the chain, where
+        `reduced` flags reduced-resolution subfiles"""
+        bo = self._byte_order
+        offset = self._first_ifd
+        seen = set()
+        while 0 < offset < len(self._mm) and offset not in seen:
+            seen.add(offset)
+            num_entries, first_entry = self._ifd_entries(offset)
+            reduced = False
+            for ix in range(num_entries):
+                entry = first_entry + ix * self._entry_size
+                tag, field_type = struct.unpack(bo + 'HH',
+                                                self._mm[entry:entry + 4])
+                if tag == TiffReader.NEW_SUBFILE_TYPE:
+                    value = entry + 4 + self._offset_size
+                    (subfile_type,) = struct.unpack(
+                        bo + ('H' if field_type == 3 else 'I'),
+                        self._mm[value:value + (2 if field_type == 3 else 4)])
+                    reduced = bool(subfile_type & 1)
+                    break
+                if tag > TiffReader.NEW_SUBFILE_TYPE:
+                    break  # entries are sorted by tag
+            yield offset, reduced
+            next_pointer = first_entry + num_entries * self._entry_size
+            (offset,) = struct.unpack(
+                bo + self._offset_format,
+                self._mm[next_pointer:next_pointer + self._offset_size])
+
+    def _next_ifd(self):
+        """Walk one more IFD of the chain. Return `False` at the end."""
+        try:
+            offset, reduced = next(self._ifd_walker)
+        except StopIteration:
+            return False
+        if reduced:
+            self._reduced_offsets.append((len(self._page_offsets) - 1,
+                                          offset))
+        else:
+            self._page_offsets.append(offset)
+        return True
+
+    def _page_offset(self, page: int):
+        """IFD offset of `page`, walking the chain as far as needed"""
+        while len(self._page_offsets) <= page:
+            if not self._next_ifd():
+                raise UnsupportedImageError(
+                    'Page {} not found in {}'.format(page, self.file_name))
+        return self._page_offsets[page]
+
+    def _reduced_subfiles(self):
+        """
+        Reduced-resolution images of the page: its SubIFDs, and the
+        reduced subfiles between it and the next page in the IFD chain.
+
+        Returns
+        -------
+        List of `(offset, height, width)`
+        """
+        if self._subfiles is None:
+            while len(self._page_offsets) <= self.page + 1 and \
+                    self._next_ifd():
+                pass
+            offsets = self._subifd_offsets + [
+                offset for page, offset in self._reduced_offsets
+                if page == self.page]
+            self._subfiles = []
+            for offset in offsets:
+                tags = self._read_ifd(offset)
+                self._subfiles.append(
+                    (offset, int(tags[TiffReader.IMAGE_LENGTH][0]),
+                     int(tags[TiffReader.IMAGE_WIDTH][0])))
+        return self._subfiles
+
+    def _open_subfile(self, offset: int):
+        """`TiffReader` of the reduced image at `offset`, or `None` if its
+        pixels differ in type from the page"""
+        try:
+            reader = TiffReader(self.file_name, self.page,
+                                subfile_offset=offset)
+        except UnsupportedImageError as err:
+            warnings.warn('Ignoring reduced-resolution image: {}'.format(err))
+            return None
+        if reader.samples != self.samples or reader.dtype != self.dtype:
+            reader.close()
+            return None
+        return reader
+
+    def read_reduced(self, step: int):
+        """
+        Image downscaled by about `step`. The smallest reduced-resolution
+        image of the page that is large enough is read if the file has
+        one, otherwise the page is sampled by `read_strided`.
+        """
+        step = max(1, int(step))
+        target_height = -(-self.height // step)
+        target_width = -(-self.width // step)
+        for offset, height, width in sorted(self._reduced_subfiles(),
+                                            key=lambda subfile: subfile[1]):
+            if height < target_height or width < target_width:
+                continue
+            reader = self._open_subfile(offset)
+            if reader is None:
+                continue
+            """Sample the reduced image if it is still much larger"""
+            sub_step = max(1, min(height // target_height,
+                                  width // target_width))
+            try:
+                array = reader.read_strided(sub_step)
+            finally:
+                reader.close()
+            return array, (sub_step * self.width / width,
+                           sub_step * self.height / height)
+        return super().read_reduced(step)
+
+    def reduced_image(self, height: int, width: int):
+        """
+        Reduced-resolution image of the page within one pixel of
+        `height` x `width`, cropped or padded by repeating its edges to
+        that exact size. `None` if the file has none.
+        """
+        for offset, sub_height, sub_width in self._reduced_subfiles():
+            if abs(sub_height - height) > 1 or abs(sub_width - width) > 1:
+                continue
+            reader = self._open_subfile(offset)
+            if reader is None:
+                continue
+            try:
+                array = reader.read_region(0, 0, min(width, sub_width),
+                                           min(height, sub_height))
+            finally:
+                reader.close()
+            padding = [(0, height - array.shape[0]),
+                       (0, width - array.shape[1])] + \
+                [(0, 0)] * (array.ndim - 2)
+            return np.pad(array, padding, mode='edge')
+        return None
+
+    def _walk_all(self):
+        while self._next_ifd():
+            pass
+
+    @property
+    def num_pages(self):
+        """Number of pages, walking the whole IFD chain once"""
+        self._walk_all()
+        return len(self._page_offsets)
+
+    def describe_page(self, page: int):
+        """
+        Size and sample type of `page`, read from its IFD without decoding
+        pixel data.
+
+        Returns
+        -------
+        Dictionary with keys 'width', 'height', 'samples', 'bits',
+        'sample_format' and 'compression'
+        """
+        tags = self._read_ifd(self._page_offset(page))
+
+        def scalar(tag, default):
+            return int(tags[tag][0]) if tag in tags else default
+
+        return {'width': scalar(TiffReader.IMAGE_WIDTH, 0),
+                'height': scalar(TiffReader.IMAGE_LENGTH, 0),
+                'samples': scalar(TiffReader.SAMPLES_PER_PIXEL, 1),
+                'bits': scalar(TiffReader.BITS_PER_SAMPLE, 1),
+                'sample_format': scalar(TiffReader.SAMPLE_FORMAT, 1),
+                'compression': scalar(TiffReader.COMPRESSION, 1)}
+
+    def _read_ifd(self, offset: int):
+        """
+        Parse the image file directory at `offset`.
+
+        Returns
+        -------
+        Dictionary mapping tag codes to NumPy arrays of values, copied out
+        of the memory map so that `close` can unmap it
+        """
+        bo = self._byte_order
+        num_entries, first_entry = self._ifd_entries(offset)
+        field_size = self._offset_size
+        tags = {}
+        for ix in range(num_entries):
+            entry = first_entry + ix * self._entry_size
+            tag, field_type = struct.unpack(bo + 'HH',
+                                            self._mm[entry:entry + 4])
+            (count,) = struct.unpack(
+                bo + self._offset_format, self._mm[entry + 4:
+                                                   entry + 4 + field_size])
+            if field_type not in TiffReader.field_types:
+                continue
+            dtype = np.dtype(bo + TiffReader.field_types[field_type])
+            if field_type in (5, 10):
+                count *= 2  # rationals are pairs
+            value_field = entry + 4 + field_size
+            if dtype.itemsize * count <= field_size:
+                value_offset = value_field
+            else:
+                (value_offset,) = struct.unpack(
+                    bo + self._offset_format,
+                    self._mm[value_field:value_field + field_size])
+            tags[tag] = np.frombuffer(self._mm, dtype, count,
+                                      value_offset).copy()
+        return tags
+
+    def _set_layout(self, tags):
+        """Validate tags and derive the strip/tile layout"""
+        def scalar(tag, default=None):
+            if tag in tags:
+                return int(tags[tag][0])
+            if default is None:
+                raise KeyError('missing TIFF tag {}'.format(tag))
+            return default
+
+        self.width = scalar(TiffReader.IMAGE_WIDTH)
+        self.height = scalar(TiffReader.IMAGE_LENGTH)
+        self._stored_samples = scalar(TiffReader.SAMPLES_PER_PIXEL, 1)
+        self._compression = scalar(TiffReader.COMPRESSION, 1)
+        self._photometric = scalar(TiffReader.PHOTOMETRIC, 1)
+        self._planar = scalar(TiffReader.PLANAR_CONFIG, 1)
+        self._predictor = scalar(TiffReader.PREDICTOR, 1)
+        bits = scalar(TiffReader.BITS_PER_SAMPLE, 1)
+        sample_format = scalar(TiffReader.SAMPLE_FORMAT, 1)
+
+        if self._compression not in SUPPORTED_COMPRESSIONS:
+            raise UnsupportedImageError(
+                'Unsupported compression {}'.format(self._compression))
+        if self._predictor not in (1, 2):
+            raise UnsupportedImageError(
+                'Unsupported predictor {}'.format(self._predictor))
+        kind = {1: 'u', 2: 'i', 3: 'f'}.get(sample_format)
+        if bits not in (8, 16, 32) or kind is None or \
+                (kind == 'f' and bits != 32):
+            raise UnsupportedImageError(
+                'Unsupported sample type: {} bits, format {}'.format(
+                    bits, sample_format))
+        self._stored_dtype = np.dtype(
+            self._byte_order + kind + str(bits // 8))
+
+        """Strips are treated as tiles as wide as the image"""
+        if TiffReader.TILE_OFFSETS in tags:
+            self._segment_width = scalar(TiffReader.TILE_WIDTH)
+            self._segment_height = scalar(TiffReader.TILE_LENGTH)
+            self._offsets = tags[TiffReader.TILE_OFFSETS]
+            self._byte_counts = tags[TiffReader.TILE_BYTE_COUNTS]
+        else:
+            self._segment_width = self.width
+            self._segment_height = min(
+                scalar(TiffReader.ROWS_PER_STRIP, self.height), self.height)
+            self._offsets = tags[TiffReader.STRIP_OFFSETS]
+            self._byte_counts = tags[TiffReader.STRIP_BYTE_COUNTS]
+        self._subifd_offsets = [int(offset) for offset in
+                                tags.get(TiffReader.SUB_IFDS, [])]
+        self._across = -(-self.width // self._segment_width)
+        self._down = -(-self.height // self._segment_height)
+        self._per_plane = self._across * self._down
+        planes = self._stored_samples if self._planar == 2 else 1
+        if len(self._offsets) < self._per_plane * planes:
+            raise UnsupportedImageError('Truncated strip/tile table')
+        self.band_height = self._segment_height
+
+        """Samples and type returned to the caller"""
+        self._color_map = None
+        if self._photometric == 3:
+            if TiffReader.COLOR_MAP not in tags:
+                raise UnsupportedImageError('Palette image without colormap')
+            self._color_map = (tags[TiffReader.COLOR_MAP].reshape(3, -1)
+                               >> 8).astype(np.uint8).T
+            self.samples = 3
+            self.dtype = np.dtype(np.uint8)
+        else:
+            self.samples = self._stored_samples
+            self.dtype = self._stored_dtype.newbyteorder('=')
+
+    def _decode(self, index: int, samples: int, rows: int):
+        """
+        Decode strip/tile `index` into an array of shape
+        (rows, segment_width, samples). Uncompressed data are returned as a
+        read-only view of the memory map.
+        """
+        offset = int(self._offsets[index])
+        byte_count = int(self._byte_counts[index])
+        num_items = rows * self._segment_width * samples
+        if self._compression == 1:
+            segment = np.frombuffer(self._mm, self._stored_dtype, num_items,
+                                    offset)
+        else:
+            raw = np.frombuffer(self._mm, np.uint8, byte_count, offset)
+            decoded = decompress(raw, self._compression)
+            segment = np.frombuffer(decoded, self._stored_dtype, num_items)
+        segment = segment.reshape(rows, self._segment_width, samples)
+        if self._predictor == 2:
+            segment = undo_horizontal_predictor(segment.copy())
+        return segment
+
+    def _segment(self, seg_row: int, seg_col: int, keep: bool=False):
+        """Decoded strip/tile at position (`seg_row`, `seg_col`) of the
+        segment grid, with all samples interleaved. `keep` caches it for
+        the next reads."""
+        if self._segment_width == self.width:
+            """Last strip may be shorter than the others"""
+            rows = min(self._segment_height,
+                       self.height - seg_row * self._segment_height)
+        else:
+            rows = self._segment_height
+        index = seg_row * self._across + seg_col
+        if self._compression == 1 and self._predictor == 1 and \
+                self._planar == 1:
+            """View of the memory map, nothing to cache"""
+            return self._decode(index, self._stored_samples, rows)
+        with self._segments_lock:
+            segment = self._segments.get(index)
+            if segment is not None:
+                self._segments.move_to_end(index)
+                return segment
+        if self._planar == 1:
+            segment = self._decode(index, self._stored_samples, rows)
+        else:
+            planes = [self._decode(plane * self._per_plane + index, 1, rows)
+                      for plane in range(self._stored_samples)]
+            segment = np.concatenate(planes, axis=2)
+        if keep:
+            segment.flags.writeable = False  # shared by the callers
+            self._cache_segment(index, segment)
+        return segment
+
+    def _cache_segment(self, index: int, segment: np.ndarray):
+        with self._segments_lock:
+            added = 0
+            if index not in self._segments:
+                self._segments[index] = segment
+                self._segments_bytes += segment.nbytes
+                added = segment.nbytes
+            freed = self._evict(self._segments_bytes -
+                                TiffReader.segment_cache_bytes)
+        """Counted out of the lock: `add` may call `release_segments`,
+        which takes it"""
+        self.segments_account.add(added)
+        self.segments_account.remove(freed)
+
+    def _evict(self, num_bytes: int):
+        """Drop least recently used segments, but the last one, until
+        `num_bytes` are freed. Return the bytes freed."""
+        freed = 0
+        while freed < num_bytes and len(self._segments) > 1:
+            _, segment = self._segments.popitem(last=False)
+            freed += segment.nbytes
+        self._segments_bytes -= freed
+        return freed
+
+    def release_segments(self, num_bytes: int):
+        """Drop cached segments until about `num_bytes` are freed"""
+        with self._segments_lock:
+            freed = self._evict(num_bytes)
+        self.segments_account.remove(freed)
+
+    @traced('decode')
+    def read_region(self, x: int, y: int, width: int, height: int):
+        out = np.zeros((height, width, self._stored_samples),
+                       self._stored_dtype.newbyteorder('='))
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        if x0 < x1 and y0 < y1:
+            seg_w = self._segment_width
+            seg_h = self._segment_height
+            for seg_row in range(y0 // seg_h, (y1 - 1) // seg_h + 1):
+                for seg_col in range(x0 // seg_w, (x1 - 1) // seg_w + 1):
+                    sy, sx = seg_row * seg_h, seg_col * seg_w
+                    """Regions beside this one need the rest of the
+                    segment"""
+                    partial = x0 > sx or x1 < min(sx + seg_w, self.width)
+                    segment = self._segment(seg_row, seg_col, partial)
+                    iy0, iy1 = max(y0, sy), min(y1, sy + segment.shape[0])
+                    ix0, ix1 = max(x0, sx), min(x1, sx + segment.shape[1])
+                    out[iy0 - y:iy1 - y, ix0 - x:ix1 - x] = \
+                        segment[iy0 - sy:iy1 - sy, ix0 - sx:ix1 - sx]
+        return self._postprocess(out)
+
+    def read_strided(self, step: int):
+        """
+        Nearest-neighbour downsample by an integer `step`, decoding only
+        the strips or tiles holding sampled rows. Uncompressed segments are
+        views of the memory map, so that only the sampled rows are read
+        from disk.
+        """
+        step = max(1, int(step))
+        out = np.empty((-(-self.height // step), -(-self.width // step),
+                        self._stored_samples),
+                       self._stored_dtype.newbyteorder('='))
+        seg_w = self._segment_width
+        seg_h = self._segment_height
+        for seg_row in range(self._down):
+            sy = seg_row * seg_h
+            first_y = (-sy) % step
+            rows = min(seg_h, self.height - sy)
+            if first_y >= rows:
+                continue  # no sampled row in this strip or tile row
+            out_y = (sy + first_y) // step
+            for seg_col in range(self._across):
+                sx = seg_col * seg_w
+                first_x = (-sx) % step
+                cols = min(seg_w, self.width - sx)
+                if first_x >= cols:
+                    continue
+                sampled = self._segment(seg_row, seg_col)[
+                    first_y:rows:step, first_x:cols:step]
+                out_x = (sx + first_x) // step
+                out[out_y:out_y + sampled.shape[0],
+                    out_x:out_x + sampled.shape[1]] = sampled
+        return self._postprocess(out)
+
+    def _postprocess(self, array: np.ndarray):
+        """Apply photometric interpretation and drop the singleton sample
+        axis"""
+        if self._color_map is not None:
+            return self._color_map[array[..., 0]]
+        if self._photometric == 0 and array.dtype.kind == 'u':
+            """WhiteIsZero"""
+            array = np.iinfo(array.dtype).max - array
+        if self._stored_samples == 1:
+            return array[..., 0]
+        return array
+
+    def close(self):
+        with self._segments_lock:
+            self._segments.clear()
+            self._segments_bytes = 0
+        self.segments_account.close()
+        try:
+            self._mm.close()
+        except (AttributeError, BufferError):
+            """A read still running in another thread views the map: it is
+            unmapped once that read is done"""
+            pass
+        self._file.close()
+
+
+def open_reader(file_name: str, page: int=0):
+    """
+    Return the best `ImageReader` for page `page` of `file_name`: a
+    memory-mapped `TiffReader` when possible, otherwise a `QtImageReader`,
+    importing Qt only then.
+    """
+    try:
+        return TiffReader(file_name, page)
+    except UnsupportedImageError as err:
+        warnings.warn('Falling back to QImage: {}'.format(err), stacklevel=2)
+        from my_image import QtImageReader
+        return QtImageReader(file_name, page)
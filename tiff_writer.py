@@ -0,0 +1,263 @@
+import queue
+import struct
+import threading
+import numpy as np
+
+import settings
+from tiff_codecs import COMPRESSION_NONE, COMPRESSION_LZW, \
+    COMPRESSION_DEFLATE, COMPRESSION_PACKBITS, ENCODED_COMPRESSIONS, \
+    compress, apply_horizontal_predictor
+from tracing import traced
+
+
+"""Compression names accepted by `TiffWriter`: 'lzw' and 'packbits' only
+when imagecodecs is installed"""
+COMPRESSIONS = {name: compression for name, compression in (
+    ('none', COMPRESSION_NONE), ('lzw', COMPRESSION_LZW),
+    ('deflate', COMPRESSION_DEFLATE), ('packbits', COMPRESSION_PACKBITS))
+    if compression in ENCODED_COMPRESSIONS}
+
+
+class TiffWriter:
+    """
+    Write NumPy arrays as baseline little-endian TIFF files, split in
+    strips of about `strip_bytes` uncompressed bytes. Arrays keep their
+    dtype: 16-bit and float images are not reduced to 8 bits.
+
+    Instances are picklable, so that `write` can be handed to process pool
+    workers.
+    """
+    strip_bytes = 2 ** 16
+
+    """Tags written to every file"""
+    TAG_IMAGE_WIDTH = 256
+    TAG_IMAGE_LENGTH = 257
+    TAG_BITS_PER_SAMPLE = 258
+    TAG_COMPRESSION = 259
+    TAG_PHOTOMETRIC = 262
+    TAG_STRIP_OFFSETS = 273
+    TAG_SAMPLES_PER_PIXEL = 277
+    TAG_ROWS_PER_STRIP = 278
+    TAG_STRIP_BYTE_COUNTS = 279
+    TAG_PLANAR_CONFIG = 284
+    TAG_PREDICTOR = 317
+    TAG_EXTRA_SAMPLES = 338
+    TAG_SAMPLE_FORMAT = 339
+
+    TYPE_SHORT = 3
+    TYPE_LONG = 4
+
+    def __init__(self, *,
+                 compression: str=None,
+                 level: int=None,
+                 predictor: bool=True):
+        """
+        Parameters
+        ----------
+        compression: str
+            a key of `COMPRESSIONS`: 'none', 'deflate', and with
+            imagecodecs 'lzw' or 'packbits'.
+            Default `settings.EXPORT_COMPRESSION`.
+        level: int
+            deflate level, 1 (fast) to 9 (small).
+            Default `settings.EXPORT_COMPRESSION_LEVEL`.
+        predictor: bool
+            apply horizontal differencing to integer images compressed
+            with LZW or deflate, which usually makes them smaller
+        """
+        compression = settings.EXPORT_COMPRESSION if compression is None \
+            else compression
+        if compression not in COMPRESSIONS:
+            raise ValueError('Unsupported TIFF compression {} (choose from '
+                             '{})'.format(compression,
+                                          ', '.join(sorted(COMPRESSIONS))))
+        self.compression = compression
+        self.level = settings.EXPORT_COMPRESSION_LEVEL if level is None \
+            else level
+        self.predictor = predictor
+
+    @traced('save')
+    def write(self, array: np.ndarray, path: str):
+        """
+        Write `array`, of shape (height, width) or (height, width, samples),
+        to `path`.tif.
+
+        Parameters
+        ----------
+        array: NumPy Array
+            image
+        path: str
+            output path without extension
+
+        Returns
+        -------
+
+        """
+        array = np.asarray(array)
+        if array.dtype == bool:
+            array = array.astype(np.uint8)
+        array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+        if array.ndim == 2:
+            array = array[..., np.newaxis]
+        height, width, samples = array.shape
+        compression = COMPRESSIONS[self.compression]
+        predictor = self.predictor and array.dtype.kind in 'ui' and \
+            compression in (COMPRESSION_LZW, COMPRESSION_DEFLATE)
+
+        row_bytes = max(1, width * samples * array.dtype.itemsize)
+        rows_per_strip = max(1, min(height,
+                                    TiffWriter.strip_bytes // row_bytes))
+        offsets = []
+        byte_counts = []
+        with open(path + '.tif', 'wb') as file:
+            file.write(b'II*\x00\x00\x00\x00\x00')  # IFD offset set below
+            for y in range(0, height, rows_per_strip):
+                strip = array[y:y + rows_per_strip]
+                if predictor:
+                    strip = apply_horizontal_predictor(strip)
+                data = compress(np.ascontiguousarray(strip), compression,
+                                self.level)
+                offsets.append(file.tell())
+                byte_counts.append(len(data))
+                file.write(data)
+                if file.tell() % 2:
+                    file.write(b'\x00')  # word alignment
+            ifd_offset = file.tell()
+            file.write(self._ifd(ifd_offset, array, compression, predictor,
+                                 rows_per_strip, offsets, byte_counts))
+            file.seek(4)
+            file.write(struct.pack('<I', ifd_offset))
+
+    def _ifd(self, ifd_offset, array, compression, predictor,
+             rows_per_strip, offsets, byte_counts):
+        """Encode the image file directory written at `ifd_offset`"""
+        height, width, samples = array.shape
+        bits = array.dtype.itemsize * 8
+        sample_format = {'u': 1, 'i': 2, 'f': 3}[array.dtype.kind]
+        if samples >= 3:
+            photometric = 2  # RGB
+            extra_samples = samples - 3
+        else:
+            photometric = 1  # min is black
+            extra_samples = samples - 1
+        """Unassociated alpha for RGBA and gray + alpha"""
+        extra = [2] if extra_samples == 1 else [0] * extra_samples
+        short = TiffWriter.TYPE_SHORT
+        long = TiffWriter.TYPE_LONG
+        entries = [
+            (TiffWriter.TAG_IMAGE_WIDTH, long, [width]),
+            (TiffWriter.TAG_IMAGE_LENGTH, long, [height]),
+            (TiffWriter.TAG_BITS_PER_SAMPLE, short, [bits] * samples),
+            (TiffWriter.TAG_COMPRESSION, short, [compression]),
+            (TiffWriter.TAG_PHOTOMETRIC, short, [photometric]),
+            (TiffWriter.TAG_STRIP_OFFSETS, long, offsets),
+            (TiffWriter.TAG_SAMPLES_PER_PIXEL, short, [samples]),
+            (TiffWriter.TAG_ROWS_PER_STRIP, long, [rows_per_strip]),
+            (TiffWriter.TAG_STRIP_BYTE_COUNTS, long, byte_counts),
+            (TiffWriter.TAG_PLANAR_CONFIG, short, [1]),
+        ]
+        if predictor:
+            entries.append((TiffWriter.TAG_PREDICTOR, short, [2]))
+        if extra:
+            entries.append((TiffWriter.TAG_EXTRA_SAMPLES, short, extra))
+        entries.append((TiffWriter.TAG_SAMPLE_FORMAT, short,
+                        [sample_format] * samples))
+
+        """Values longer than 4 bytes follow the IFD"""
+        ifd_size = 2 + 12 * len(entries) + 4
+        values = bytearray()
+        ifd = bytearray(struct.pack('<H', len(entries)))
+        for tag, kind, value in entries:
+            fmt = '<{}{}'.format(len(value), 'H' if kind == short else 'I')
+            data = struct.pack(fmt, *value)
+            if len(data) <= 4:
+                field = data.ljust(4, b'\x00')
+            else:
+                field = struct.pack('<I', ifd_offset + ifd_size + len(values))
+                values += data
+                if len(values) % 2:
+                    values.append(0)
+            ifd += struct.pack('<HHI', tag, kind, len(value)) + field
+        ifd += b'\x00\x00\x00\x00'  # no next IFD
+        return bytes(ifd + values)
+
+
+class EncodeQueue:
+    """
+    Bounded queue of jobs run by background threads, used to encode and
+    write cell images while the caller keeps cropping. `submit` blocks
+    while `max_pending` jobs are waiting, so that a fast producer cannot
+    pile up cell buffers in memory.
+    """
+    def __init__(self, *,
+                 workers: int=1,
+                 max_pending: int=None):
+        """
+        Parameters
+        ----------
+        workers: int
+            number of writer threads
+        max_pending: int
+            jobs waiting for a thread before `submit` blocks.
+            Default: twice the number of threads.
+        """
+        max_pending = 2 * workers if max_pending is None else max_pending
+        self._jobs = queue.Queue(maxsize=max(1, max_pending))
+        self._results = queue.Queue()
+        self._submitted = 0
+        self._collected = 0
+        self._threads = [threading.Thread(target=self._work, daemon=True)
+                         for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            function, args = job
+            try:
+                self._results.put((True, function(*args)))
+            except Exception as err:
+                self._results.put((False, err))
+
+    def submit(self, function, *args):
+        """Queue `function(*args)`, waiting for room if the queue is full"""
+        self._jobs.put((function, args))
+        self._submitted += 1
+
+    def _result(self, block: bool):
+        success, result = self._results.get(block=block)
+        self._collected += 1
+        if not success:
+            raise result
+        return result
+
+    def completed(self):
+        """Generator of the results of jobs finished so far. Exceptions
+        raised by a job are raised again here."""
+        while self._collected < self._submitted:
+            try:
+                yield self._result(block=False)
+            except queue.Empty:
+                return
+
+    def join(self):
+        """Generator of the results of all remaining jobs, waiting for
+        them to finish"""
+        while self._collected < self._submitted:
+            yield self._result(block=True)
+
+    def close(self):
+        """Drop jobs not started yet and stop the threads once the running
+        jobs are done"""
+        try:
+            while True:
+                self._jobs.get_nowait()
+        except queue.Empty:
+            pass
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
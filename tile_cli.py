@@ -0,0 +1,145 @@
+"""
+Crop the cells of a grid from an image without starting the GUI, e.g.
+
+    python tile_cli.py plate.tif --tl 120 80 --br 2300 1640 --angle 0.01 \
+        --rows 8 --cols 12 --output plate_wells
+
+writes `plate_wells/A1.tif`, `plate_wells/A2.tif`, ... as the 'Crop Grid'
+button does. With a grid template saved by the GUI, the same grids are
+cropped from any number of images:
+
+    python tile_cli.py plates/*.tif --template layout.json --output wells
+
+writes `wells/<image name>/<grid name>/A1.tif`, ... Qt is not imported
+unless an image is not a TIFF file that `TiffReader` can decode.
+"""
+import argparse
+import os
+import sys
+import time
+
+from export_engine import export_cells
+from grid_template import GridTemplate, load_templates
+from memory_budget import budget
+from tiff_reader import UnsupportedImageError, open_reader
+from tiff_writer import TiffWriter, COMPRESSIONS
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Crop the cells of a grid from an image.')
+    parser.add_argument('images', nargs='+', metavar='image',
+                        help='source images')
+    parser.add_argument('--template',
+                        help='grid template saved by the GUI, replaces '
+                             '--tl, --br, --angle, --rows and --cols')
+    parser.add_argument('--tl', nargs=2, type=float,
+                        metavar=('X', 'Y'), help='top left grid corner')
+    parser.add_argument('--br', nargs=2, type=float,
+                        metavar=('X', 'Y'), help='bottom right grid corner')
+    parser.add_argument('--angle', type=float, default=0.,
+                        help='clockwise angle of the top edge in radians '
+                             '(default: 0)')
+    parser.add_argument('--rows', type=int, help='grid rows')
+    parser.add_argument('--cols', type=int, help='grid columns')
+    parser.add_argument('--page', type=int, default=0,
+                        help='page of multi-page images (default: 0)')
+    parser.add_argument('--scaling-factor', type=float, default=1.,
+                        help='displayed pixels per image pixel of the '
+                             'corners, as shown by the GUI (default: 1, '
+                             'corners in image pixels)')
+    parser.add_argument('-o', '--output', required=True,
+                        help='output directory. Cells of several images '
+                             'go to one subdirectory per image, and cells '
+                             'of a template to one per grid. Cell '
+                             'directories must not exist.')
+    parser.add_argument('--compression', choices=sorted(COMPRESSIONS),
+                        help='TIFF compression (default: '
+                             '$ALIT_EXPORT_COMPRESSION or none)')
+    parser.add_argument('--level', type=int,
+                        help='deflate level, 1 to 9')
+    parser.add_argument('--workers', type=int,
+                        help='crop workers, 0 for one per core')
+    parser.add_argument('--executor', choices=('thread', 'process'))
+    parser.add_argument('--mode', choices=('batch', 'cell'))
+    return parser.parse_args(argv)
+
+
+def output_directory(root: str, image: str, grid_name: str, *,
+                     per_image: bool, per_grid: bool):
+    """Directory receiving the cells of grid `grid_name` of `image`"""
+    directory = root
+    if per_image:
+        directory = os.path.join(
+            directory, os.path.splitext(os.path.basename(image))[0])
+    if per_grid:
+        directory = os.path.join(directory, grid_name)
+    return directory
+
+
+def main(argv=None):
+    """Command-line entry point. Return the exit status."""
+    args = parse_args(argv)
+    if args.template is not None:
+        try:
+            templates, _ = load_templates(args.template)
+        except (OSError, ValueError) as err:
+            print('Can\'t read template:', err, file=sys.stderr)
+            return 2
+    elif None in (args.tl, args.br, args.rows, args.cols):
+        print('Give a grid with --tl, --br, --rows and --cols, or a '
+              '--template', file=sys.stderr)
+        return 2
+    else:
+        scale = args.scaling_factor
+        templates = [GridTemplate(tl=(args.tl[0] / scale, args.tl[1] / scale),
+                                  br=(args.br[0] / scale, args.br[1] / scale),
+                                  phi=args.angle,
+                                  num_rows=args.rows,
+                                  num_cols=args.cols)]
+    for template in templates:
+        if template.num_cols <= 0 or template.num_rows <= 0:
+            print('Grid must have at least one row and one column',
+                  file=sys.stderr)
+            return 2
+
+    writer = TiffWriter(compression=args.compression, level=args.level)
+    status = 0
+    for image in args.images:
+        for template in templates:
+            directory = output_directory(
+                args.output, image, template.name,
+                per_image=len(args.images) > 1,
+                per_grid=args.template is not None)
+            if os.path.exists(directory):
+                print('Can\'t crop image: folder already exist', directory,
+                      file=sys.stderr)
+                status = 1
+                continue
+            os.makedirs(directory)
+            start = time.perf_counter()
+            try:
+                done = sum(1 for _ in export_cells(
+                    image, template.jobs(directory),
+                    save=writer.write,
+                    workers=args.workers,
+                    executor=args.executor,
+                    mode=args.mode,
+                    open_reader=open_reader,
+                    page=args.page))
+            except (OSError, UnsupportedImageError) as err:
+                print('Can\'t crop image:', image, err, file=sys.stderr)
+                status = 1
+                continue
+            """No peak for process workers, whose memory is not
+            accounted"""
+            peak = budget.peaks.get('crop')
+            print('{} cells written to {} in {:.2f} s{}'.format(
+                done, directory, time.perf_counter() - start,
+                '' if peak is None else
+                ', peak memory {:.0f} MB'.format(peak / 2 ** 20)))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+from collections import OrderedDict
+from math import floor, log2
+from PyQt5.QtCore import Qt, QObject, QRectF, QRunnable, QThreadPool, \
+    pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+import settings
+from image_conversion import array_to_qimage, display_array, qimage_view
+from image_pyramid import ImagePyramid
+from memory_budget import budget, TILES
+from tracing import span, traced
+
+
+class TileCache:
+    """Least recently used cache of decoded tiles, bounded in bytes."""
+    def __init__(self, max_bytes: int=None):
+        self.max_bytes = settings.TILE_CACHE_MB * 2 ** 20 \
+            if max_bytes is None else max_bytes
+        self.num_bytes = 0
+        self._tiles = OrderedDict()  # key -> (QPixmap, bytes)
+        self.account = budget.account(TILES, owner=self,
+                                      release=self.release)
+
+    def get(self, key):
+        """Return the tile stored under `key`, or `None`"""
+        try:
+            self._tiles.move_to_end(key)
+        except KeyError:
+            return None
+        return self._tiles[key][0]
+
+    def put(self, key, pixmap: QPixmap):
+        """Store `pixmap` under `key`, evicting least recently used tiles
+        if the cache is full"""
+        num_bytes = pixmap.width() * pixmap.height() * 4
+        if key in self._tiles:
+            self._remove_bytes(self._tiles.pop(key)[1])
+        self._tiles[key] = (pixmap, num_bytes)
+        self.num_bytes += num_bytes
+        self.account.add(num_bytes)
+        self.release(self.num_bytes - self.max_bytes)
+
+    def release(self, num_bytes: int):
+        """Evict least recently used tiles, but the last one stored, until
+        about `num_bytes` are freed"""
+        freed = 0
+        while freed < num_bytes and len(self._tiles) > 1:
+            _, (_, evicted_bytes) = self._tiles.popitem(last=False)
+            self._remove_bytes(evicted_bytes)
+            freed += evicted_bytes
+
+    def _remove_bytes(self, num_bytes: int):
+        self.num_bytes -= num_bytes
+        self.account.remove(num_bytes)
+
+    def clear(self):
+        self._tiles.clear()
+        self._remove_bytes(self.num_bytes)
+
+
+class TileSignals(QObject):
+    """Signals of the `TileTask`s of a `TiledBackgroundItem`"""
+    """Tile key (level, tile_x, tile_y), window generation and pixels"""
+    sig_tile_ready = pyqtSignal(object, int, QImage)
+
+
+class TileTask(QRunnable):
+    """Decode a tile off the GUI thread, as a `QImage`: `QPixmap`s can only
+    be made by the GUI thread"""
+    def __init__(self, *,
+                 item: 'TiledBackgroundItem',
+                 key: tuple,
+                 generation: int):
+        super().__init__()
+        self.pyramid = item.pyramid
+        self.window = item.window
+        self.signals = item.signals
+        self.key = key
+        self.generation = generation
+
+    def run(self):
+        """Executed by the thread pool"""
+        level, tile_x, tile_y = self.key
+        array = TiledBackgroundItem.tile_pixels(self.pyramid, level, tile_x,
+                                                tile_y)
+        self.signals.sig_tile_ready.emit(
+            self.key, self.generation, array_to_qimage(array, self.window))
+
+
+class TiledBackgroundItem(QGraphicsItem):
+    """
+    Background image drawn as a mosaic of tiles. Item coordinates are
+    full-resolution image pixels. When painted, the item picks the pyramid
+    level matching the current zoom and draws only the tiles overlapping
+    the exposed area. Tiles cut from pyramid levels in memory are made on
+    the fly; tiles that need decoding the image are made by a thread pool,
+    and the closest coarser level in memory is painted in their place
+    until they are ready. Pixel values are mapped to 8 bits through the
+    display window when tiles are made, so that changing the contrast only
+    re-maps the visible tiles.
+    """
+    tile_size = 256  # tile side in pyramid level pixels
+
+    def __init__(self, *,
+                 pyramid: ImagePyramid,
+                 cache: TileCache=None,
+                 window: tuple=None):
+        """
+        Parameters
+        ----------
+        pyramid: ImagePyramid
+            image shown
+        cache: TileCache
+            cache of the tiles. Default a new `TileCache`.
+        window: tuple
+            `(low, high)` pixel values shown as black and white, see
+            `display_array`
+        """
+        super().__init__()
+        self.pyramid = pyramid
+        self.cache = TileCache() if cache is None else cache
+        self.window = window
+        self.pool = QThreadPool()
+        self.signals = TileSignals()
+        self.signals.sig_tile_ready.connect(self._tile_ready)
+        self._pending = set()  # keys of the tiles being decoded
+        """Increased when the window changes, so that tiles decoded with
+        the previous one are dropped"""
+        self._generation = 0
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.pyramid.reader.width,
+                      self.pyramid.reader.height)
+
+    def set_window(self, window: tuple):
+        """Show pixel values through `window`; tiles are made again when
+        they are painted"""
+        self.window = window
+        self._generation += 1
+        self.pool.clear()
+        self._pending.clear()
+        self.cache.clear()
+        self.update()
+
+    def close(self):
+        """Drop the tiles waiting to be decoded, when the item is removed
+        from the scene"""
+        self.pool.clear()
+        self._generation += 1
+
+    def level_for_detail(self, level_of_detail: float):
+        """Return the coarsest level whose pixels are not larger than a
+        screen pixel at `level_of_detail` (screen pixels per item pixel)"""
+        if level_of_detail >= 1:
+            return 0
+        level = int(floor(log2(1. / level_of_detail)))
+        return min(level, self.pyramid.num_levels - 1)
+
+    @staticmethod
+    def tile_pixels(pyramid: ImagePyramid, level: int, tile_x: int,
+                    tile_y: int):
+        """Pixels of the tile at column `tile_x` and row `tile_y` of
+        `level`"""
+        size = TiledBackgroundItem.tile_size
+        height, width = pyramid.level_shape(level)
+        with span('display.tile', level=level):
+            return pyramid.read_region(
+                level, tile_x * size, tile_y * size,
+                min(size, width - tile_x * size),
+                min(size, height - tile_y * size))
+
+    def tile(self, level: int, tile_x: int, tile_y: int):
+        """
+        Return the tile at column `tile_x` and row `tile_y` of `level` as a
+        `QPixmap`. Tiles that are not cached are made at once if `level`
+        can be cut from a level in memory; otherwise they are decoded in
+        the background and `None` is returned until they are ready.
+        """
+        key = (level, tile_x, tile_y)
+        pixmap = self.cache.get(key)
+        if pixmap is not None:
+            return pixmap
+        if not self.pyramid.in_memory(level):
+            if key not in self._pending:
+                self._pending.add(key)
+                self.pool.start(TileTask(item=self, key=key,
+                                         generation=self._generation))
+            return None
+        """`fromImage` copies the pixels: a view is enough"""
+        pixels = display_array(self.tile_pixels(self.pyramid, *key),
+                               self.window)
+        pixmap = QPixmap.fromImage(qimage_view(pixels))
+        self.cache.put(key, pixmap)
+        return pixmap
+
+    def _tile_ready(self, key, generation, image):
+        """Cache a tile decoded in the background and paint it"""
+        if generation != self._generation:
+            return
+        self._pending.discard(key)
+        self.cache.put(key, QPixmap.fromImage(image))
+        self.update(self._tile_rect(*key))
+
+    def _tile_rect(self, level: int, tile_x: int, tile_y: int):
+        """Item rectangle covered by a full tile of `level`"""
+        extent = TiledBackgroundItem.tile_size << level
+        return QRectF(tile_x * extent, tile_y * extent, extent, extent)
+
+    def _paint_placeholder(self, painter: QPainter, level: int,
+                           tile_x: int, tile_y: int):
+        """Paint the area of a tile being decoded from the closest coarser
+        level in memory, if any"""
+        coarser = [ix for ix in self.pyramid.levels if ix > level]
+        if not coarser:
+            return
+        coarse_level = min(coarser)
+        shift = coarse_level - level
+        coarse_x, coarse_y = tile_x >> shift, tile_y >> shift
+        pixmap = self.tile(coarse_level, coarse_x, coarse_y)
+        factor = 1 << coarse_level
+        coarse_rect = QRectF(coarse_x * TiledBackgroundItem.tile_size * factor,
+                             coarse_y * TiledBackgroundItem.tile_size * factor,
+                             pixmap.width() * factor,
+                             pixmap.height() * factor)
+        target = self._tile_rect(level, tile_x, tile_y).intersected(
+            coarse_rect)
+        source = QRectF((target.left() - coarse_rect.left()) / factor,
+                        (target.top() - coarse_rect.top()) / factor,
+                        target.width() / factor, target.height() / factor)
+        painter.save()
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawPixmap(target, pixmap, source)
+        painter.restore()
+
+    @traced('display.paint')
+    def paint(self, painter: QPainter,
+              option: QStyleOptionGraphicsItem,
+              widget=None):
+        """Draw the tiles overlapping the exposed rectangle"""
+        level_of_detail = option.levelOfDetailFromTransform(
+            painter.worldTransform())
+        level = self.level_for_detail(level_of_detail)
+        factor = 1 << level
+        size = TiledBackgroundItem.tile_size
+        height, width = self.pyramid.level_shape(level)
+
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        first_x = max(0, int(exposed.left() / factor) // size)
+        first_y = max(0, int(exposed.top() / factor) // size)
+        last_x = min((width - 1) // size,
+                     int(exposed.right() / factor) // size)
+        last_y = min((height - 1) // size,
+                     int(exposed.bottom() / factor) // size)
+
+        painter.setRenderHint(QPainter.SmoothPixmapTransform,
+                              level_of_detail < 1. / factor)
+        for tile_y in range(first_y, last_y + 1):
+            for tile_x in range(first_x, last_x + 1):
+                pixmap = self.tile(level, tile_x, tile_y)
+                if pixmap is None:
+                    self._paint_placeholder(painter, level, tile_x, tile_y)
+                    continue
+                target = QRectF(tile_x * size * factor,
+                                tile_y * size * factor,
+                                pixmap.width() * factor,
+                                pixmap.height() * factor)
+                painter.drawPixmap(target, pixmap,
+                                   QRectF(pixmap.rect()))
@@ -0,0 +1,133 @@
+"""
+Spans of the time spent in loading, display, crop and save stages and grid
+operations, written as a Chrome trace (the JSON read by chrome://tracing
+and ui.perfetto.dev) when the program exits. Enabled by `settings.TRACE`,
+the path of the trace file, e.g.
+
+    ALIT_TRACE=/tmp/alit_trace.json python main.py
+
+Stages are marked by decorating functions with `traced`, or by wrapping
+blocks in `with span(name):`. When tracing is disabled, `traced` returns
+the function itself and `span` a shared no-op context, so instrumented code
+runs as before.
+"""
+import atexit
+import collections
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import settings
+
+
+"""Spans kept: the oldest are dropped in long sessions"""
+MAX_EVENTS = 1000000
+
+enabled = bool(settings.TRACE)
+_events = collections.deque(maxlen=MAX_EVENTS)
+_thread_names = {}  # thread id -> thread name
+_pid = os.getpid()
+
+
+class _Span:
+    """Context recording the time spent in it"""
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name: str, args: dict=None):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        thread = threading.current_thread()
+        _thread_names[thread.ident] = thread.name
+        _events.append((self.name, self.args, self.start, end,
+                        thread.ident))
+        return False
+
+
+class _NoSpan:
+    """Context doing nothing, used when tracing is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **args):
+    """
+    Return a context recording a span `name` with arguments `args`, shown
+    by the trace viewer when the span is selected.
+    """
+    if not enabled:
+        return _NO_SPAN
+    return _Span(name, args or None)
+
+
+def traced(name: str=None):
+    """
+    Decorator recording a span for every call of the decorated function,
+    named `name` or the qualified name of the function.
+    """
+    def decorate(function):
+        if not enabled:
+            return function
+        label = function.__qualname__ if name is None else name
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _Span(label):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def trace_events():
+    """Recorded spans as Chrome trace events, timestamps in microseconds"""
+    events = [dict(name='thread_name', ph='M', pid=_pid, tid=tid,
+                   args=dict(name=name))
+              for tid, name in list(_thread_names.items())]
+    for name, args, start, end, tid in list(_events):
+        event = dict(name=name, cat='alit', ph='X', pid=_pid, tid=tid,
+                     ts=start * 1e6, dur=(end - start) * 1e6)
+        if args:
+            event['args'] = {key: str(value) if not isinstance(
+                value, (int, float, str, bool)) else value
+                for key, value in args.items()}
+        events.append(event)
+    return events
+
+
+def write_trace(path: str=None):
+    """Write the recorded spans to `path`, default `settings.TRACE`"""
+    path = settings.TRACE if path is None else path
+    try:
+        with open(path, 'w') as file:
+            json.dump(dict(traceEvents=trace_events(),
+                           displayTimeUnit='ms'), file)
+    except OSError as err:
+        print('Can\'t write trace:', err)
+
+
+def _write_at_exit():
+    """Write the trace of the main process. Process pool workers import
+    this module too, and must not overwrite it."""
+    if multiprocessing.parent_process() is None:
+        write_trace()
+
+
+if enabled:
+    atexit.register(_write_at_exit)